@@ -125,6 +125,20 @@ def cleanup():
     except Exception as e:
         print(f"⚠️ Error deteniendo programador: {e}")
 
+    try:
+        from services.history_writer import history_writer
+        written = history_writer.close()
+        print(f"✅ Historial de precios pendiente escrito ({written} entradas)")
+    except Exception as e:
+        print(f"⚠️ Error escribiendo historial pendiente: {e}")
+
+    try:
+        from services.api_scraper import supermarket_api
+        supermarket_api.close()
+        print("✅ Sesiones HTTP cerradas")
+    except Exception as e:
+        print(f"⚠️ Error cerrando sesiones HTTP: {e}")
+
 # NUEVA RUTA: Limpiar productos duplicados
 @app.route('/api/admin/clean-duplicates', methods=['GET', 'POST'])
 def clean_duplicates():
@@ -1,8 +1,12 @@
-from flask import jsonify, request
+from flask import jsonify, request, Response
 from services.api_scraper import supermarket_api
 from models.product_model import product_model
+from services.search_index import SEARCH_BACKEND
+from services.query_cache import query_cache
+import json
 import threading
 import time
+import re
 
 class ProductController:
     """
@@ -94,10 +98,14 @@ class ProductController:
     def search_saved_products(self):
         """
         Busca productos guardados en la base de datos, sin límite
+        
+        Con ?stream=ndjson (o Accept: application/x-ndjson) o ?stream=json la respuesta
+        se envía por partes a medida que se leen los productos
         """
         try:
             query = request.args.get('query', '').strip().lower()
             sort_by = request.args.get('sort_by', 'price')
+            supermarket = request.args.get('supermarket')
 
             if not query or len(query) < 2:
                 return jsonify({
@@ -105,21 +113,49 @@ class ProductController:
                     "error": "Parámetro 'query' es requerido y debe tener al menos 2 caracteres"
                 }), 400
 
-            # Buscar productos que contengan el término en el nombre
-            productos = list(product_model.products_collection.find({
-                "name": {"$regex": query, "$options": "i"}
-            }).sort(sort_by, 1))
+            # Respuesta por streaming: sin lista en memoria ni caché
+            stream_format = request.args.get('stream', '').lower()
+            if not stream_format and 'application/x-ndjson' in request.headers.get('Accept', ''):
+                stream_format = 'ndjson'
+            if stream_format in ('ndjson', 'json'):
+                productos = product_model.iter_saved_products(query, supermarket=supermarket, sort_by=sort_by)
+                return self._stream_products(productos, query, stream_format)
 
-            # Serializar _id
-            for prod in productos:
-                prod["_id"] = str(prod["_id"])
+            # Resultado en caché mientras ningún guardado toque productos con estos términos
+            cached, stamp = query_cache.lookup("saved", query, sort_by, supermarket)
+            if cached is not None:
+                return jsonify(cached), 200
 
-            return jsonify({
+            # Índice invertido local (PRODUCT_SEARCH_BACKEND=local): todas las palabras,
+            # cada una en nombre, marca o categorías
+            productos = []
+            if SEARCH_BACKEND == "local":
+                productos = product_model.search_saved_products(
+                    query, supermarket=supermarket, limit=None, sort_by=sort_by
+                )
+            term_based = bool(productos)
+
+            # Palabras incompletas ("lec") o índice no disponible: buscar el término en el nombre
+            if not productos:
+                filtro = {"name": {"$regex": query, "$options": "i"}}
+                if supermarket:
+                    filtro["supermarket_key"] = supermarket
+                productos = list(product_model.products_collection.find(filtro).sort(sort_by, 1))
+
+                # Serializar _id
+                for prod in productos:
+                    prod["_id"] = str(prod["_id"])
+
+            respuesta = {
                 "success": True,
                 "query": query,
                 "products_count": len(productos),
                 "products": productos
-            }), 200
+            }
+            # Las coincidencias parciales pueden cambiar con cualquier producto nuevo
+            query_cache.store(stamp, respuesta, term_based=term_based)
+
+            return jsonify(respuesta), 200
 
         except Exception as e:
             print(f"❌ Error buscando productos guardados: {e}")
@@ -129,6 +165,91 @@ class ProductController:
                 "message": str(e)
             }), 500
 
+    def _stream_products(self, productos, query, stream_format):
+        """
+        Respuesta por partes sobre un generador de productos
+        - ndjson: un producto por línea y una última línea {"success", "query", "products_count"}
+        - json: el mismo documento que la respuesta normal, escrito como arreglo por partes
+        """
+        def serialize(producto):
+            return json.dumps(producto, ensure_ascii=False, default=str)
+
+        def generate_ndjson():
+            count = 0
+            try:
+                for producto in productos:
+                    count += 1
+                    yield serialize(producto) + "\n"
+                yield serialize({"success": True, "query": query, "products_count": count}) + "\n"
+            except Exception as e:
+                print(f"❌ Error en streaming de productos: {e}")
+                yield serialize({"success": False, "error": "Error interno del servidor", "products_count": count}) + "\n"
+
+        def generate_json():
+            count = 0
+            yield '{"success": true, "query": ' + serialize(query) + ', "products": ['
+            try:
+                for producto in productos:
+                    yield ("," if count else "") + serialize(producto)
+                    count += 1
+            except Exception as e:
+                # El estado HTTP ya se envió: se cierra el documento y se informa el corte
+                print(f"❌ Error en streaming de productos: {e}")
+                yield '], "products_count": ' + str(count) + ', "truncated": true}'
+                return
+            yield '], "products_count": ' + str(count) + '}'
+
+        if stream_format == 'ndjson':
+            return Response(generate_ndjson(), mimetype='application/x-ndjson')
+        return Response(generate_json(), mimetype='application/json')
+
+    def autocomplete(self):
+        """
+        Sugerencias de nombres y marcas mientras se escribe (una consulta por tecla)
+        """
+        try:
+            query = request.args.get('query', '').strip()
+            limit = int(request.args.get('limit', 8))
+            suggestion_type = request.args.get('type')
+
+            if limit < 1 or limit > 20:
+                return jsonify({
+                    "success": False,
+                    "error": "Límite inválido",
+                    "message": "El límite debe estar entre 1 y 20"
+                }), 400
+
+            if suggestion_type and suggestion_type not in ("product", "brand"):
+                return jsonify({
+                    "success": False,
+                    "error": "Parámetro 'type' inválido",
+                    "message": "Valores permitidos: product, brand"
+                }), 400
+
+            suggestions = product_model.get_autocomplete_suggestions(query, limit, suggestion_type) if query else []
+
+            return jsonify({
+                "success": True,
+                "query": query,
+                "suggestions": suggestions,
+                "count": len(suggestions)
+            }), 200
+
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": "Parámetro inválido",
+                "message": str(e)
+            }), 400
+
+        except Exception as e:
+            print(f"❌ Error obteniendo sugerencias: {e}")
+            return jsonify({
+                "success": False,
+                "error": "Error interno del servidor",
+                "message": str(e)
+            }), 500
+
     def get_price_comparison(self):
         """
         Compara precios del mismo producto entre supermercados (máximo 4, uno por supermercado)
@@ -141,11 +262,18 @@ class ProductController:
                     "error": "Parámetro 'product_name' es requerido"
                 }), 400
 
-            # PROBLEMA SOLUCIONADO: Buscar productos con nombre EXACTO
-            # El código anterior tenía un error con la variable brand_name que no existía
-            productos = list(product_model.products_collection.find({
-                "name": {"$regex": f"^{re.escape(product_name)}$", "$options": "i"}
-            }))
+            cached, stamp = query_cache.lookup("compare", product_name)
+            if cached is not None:
+                return jsonify(cached), 200
+
+            # Mismo producto en todos los supermercados: una consulta indexada por canonical_id
+            productos = product_model.find_products_by_canonical_name(product_name)
+
+            # Productos aún sin canonical_id: búsqueda anterior por nombre EXACTO
+            if not productos:
+                productos = list(product_model.products_collection.find({
+                    "name": {"$regex": f"^{re.escape(product_name)}$", "$options": "i"}
+                }))
 
             # Si no encuentra coincidencias exactas, buscar por similitud alta
             if not productos:
@@ -171,12 +299,15 @@ class ProductController:
 
             resultado = list(productos_por_supermercado.values())
 
-            return jsonify({
+            respuesta = {
                 "success": True,
                 "product_name": product_name,
                 "products_count": len(resultado),
                 "products": resultado
-            }), 200
+            }
+            query_cache.store(stamp, respuesta)
+
+            return jsonify(respuesta), 200
 
         except Exception as e:
             print(f"❌ Error en comparación de precios: {e}")
@@ -470,15 +601,15 @@ class ProductController:
         try:
             print(f"🔄 Búsqueda en segundo plano iniciada: {search_id}")
             
-            # Realizar búsqueda
-            products_data = supermarket_api.search_products(
+            # Recorrer resultados página por página y guardarlos a medida que llegan
+            pages = supermarket_api.stream_products(
                 query=query,
                 supermarket=supermarket,
-                limit=limit
+                max_products=limit
             )
             
             # Guardar en base de datos
-            save_result = product_model.save_products(products_data, query)
+            save_result = product_model.save_products(pages, query)
             
             print(f"✅ Búsqueda en segundo plano completada: {search_id}")
             print(f"   - Productos guardados: {save_result.get('saved_count', 0)}")
@@ -567,20 +698,55 @@ class ProductController:
     def get_all_saved_products(self):
         """
         Obtiene todos los productos guardados en la base de datos con paginación
+        
+        Con ?cursor= (vacío para la primera página) la paginación es por cursor: cada página
+        cuesta lo mismo que la primera y el total sólo se calcula con include_total=true.
+        Sin cursor se mantiene la paginación por número de página
         """
         try:
             # Obtener parámetros de paginación
+            cursor = request.args.get('cursor')
             page = int(request.args.get('page', 1))
             limit = int(request.args.get('limit', 100))
             sort_by = request.args.get('sort_by', 'scraped_at')
             supermarket = request.args.get('supermarket')
+            include_total = request.args.get('include_total', 'false').lower() == 'true'
             
             # Validar parámetros
             if page < 1:
                 page = 1
             if limit < 1 or limit > 100:
                 limit = 50
+            
+            filters = {
+                "supermarket": supermarket,
+                "sort_by": sort_by
+            }
+            
+            if cursor is not None:
+                result = product_model.get_products_page(
+                    cursor=cursor or None,
+                    limit=limit,
+                    sort_by=sort_by,
+                    supermarket=supermarket
+                )
                 
+                pagination = {
+                    "products_per_page": limit,
+                    "next_cursor": result["next_cursor"],
+                    "has_next": result["next_cursor"] is not None
+                }
+                if include_total:
+                    pagination["total_products"] = product_model.estimate_products_count(supermarket)
+                    pagination["total_is_estimate"] = True
+                
+                return jsonify({
+                    "success": True,
+                    "products": result["products"],
+                    "pagination": pagination,
+                    "filters": filters
+                }), 200
+            
             # Obtener productos
             products = product_model.get_all_products(
                 page=page,
@@ -589,8 +755,8 @@ class ProductController:
                 supermarket=supermarket
             )
             
-            # Obtener total de productos para paginación
-            total_products = product_model.get_total_products_count(supermarket)
+            # Total aproximado para paginación (metadatos o conteo en caché, no uno por página)
+            total_products = product_model.estimate_products_count(supermarket)
             total_pages = (total_products + limit - 1) // limit
             
             return jsonify({
@@ -600,14 +766,12 @@ class ProductController:
                     "current_page": page,
                     "total_pages": total_pages,
                     "total_products": total_products,
+                    "total_is_estimate": True,
                     "products_per_page": limit,
                     "has_next": page < total_pages,
                     "has_prev": page > 1
                 },
-                "filters": {
-                    "supermarket": supermarket,
-                    "sort_by": sort_by
-                }
+                "filters": filters
             }), 200
             
         except ValueError as e:
@@ -710,8 +874,7 @@ class ProductController:
                     else:
                         print(f"   ❌ {term}: Error guardando")
                     
-                    # Pausa entre términos para no sobrecargar las APIs
-                    time.sleep(2)
+                    # Sin pausa fija: el rate limiter de supermarket_api regula cada tienda
                     
                 except Exception as e:
                     print(f"   ❌ Error procesando {term}: {e}")
@@ -724,6 +887,7 @@ class ProductController:
             print(f"   - Productos nuevos: {total_saved}")
             print(f"   - Productos actualizados: {total_updated}")
             print(f"   - Total procesados: {total_saved + total_updated}")
+            print(f"   - Rate limit por supermercado: {supermarket_api.get_rate_limit_stats()}")
             
         except Exception as e:
             print(f"❌ Error en actualización de base de datos: {e}")
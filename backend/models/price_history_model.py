@@ -0,0 +1,248 @@
+from services.db import db
+from pymongo.errors import CollectionInvalid
+from datetime import datetime
+import os
+
+# Colección anterior (fechas como texto ISO, dos formas de documento)
+LEGACY_COLLECTION = "price_history"
+TIMESERIES_COLLECTION = "price_history_ts"
+
+
+class PriceHistory:
+    """
+    Historial de precios en una colección time-series de MongoDB
+
+    Documento compacto (una sola forma):
+        ts                 fecha BSON (timeField)
+        product_unique_id  producto (metaField: las entradas de un producto quedan en los mismos buckets)
+        price              precio observado (en un cambio, el precio nuevo)
+        old_price          sólo en cambios de precio
+        supermarket_key    sólo en cambios de precio
+        source             sólo en cambios de precio
+    La diferencia y el porcentaje se calculan al leer
+    """
+
+    def __init__(self):
+        self.retention_days = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", 45))
+        self.collection = self._ensure_collection()
+
+    def _ensure_collection(self):
+        """
+        Crea la colección time-series si no existe (si el servidor no soporta
+        time-series, se usa una colección normal con el mismo esquema e índice)
+        """
+        try:
+            db.create_collection(
+                TIMESERIES_COLLECTION,
+                timeseries={
+                    "timeField": "ts",
+                    "metaField": "product_unique_id",
+                    "granularity": "hours"
+                },
+                expireAfterSeconds=self.retention_days * 24 * 3600
+            )
+            print(f"🕒 Colección time-series {TIMESERIES_COLLECTION} creada")
+        except CollectionInvalid:
+            pass  # Ya existe
+        except Exception as e:
+            print(f"⚠️ No se pudo crear {TIMESERIES_COLLECTION} como time-series: {e}")
+
+        collection = db[TIMESERIES_COLLECTION]
+
+        try:
+            collection.create_index([("product_unique_id", 1), ("ts", -1)])
+        except Exception as e:
+            print(f"⚠️ No se pudo crear índice de historial de precios: {e}")
+
+        return collection
+
+    # === ESCRITURA ===
+    def build_observation(self, product_unique_id, price, now=None):
+        """
+        Precio observado de un producto en un guardado
+        """
+        return {
+            "ts": now or datetime.now(),
+            "product_unique_id": product_unique_id,
+            "price": float(price or 0)
+        }
+
+    def build_change(self, product_unique_id, old_price, new_price, supermarket_key=None, source=None, now=None):
+        """
+        Cambio de precio detectado (precio nuevo + anterior)
+        """
+        doc = {
+            "ts": now or datetime.now(),
+            "product_unique_id": product_unique_id,
+            "price": float(new_price),
+            "old_price": float(old_price)
+        }
+        if supermarket_key:
+            doc["supermarket_key"] = supermarket_key
+        if source:
+            doc["source"] = source
+        return doc
+
+    @staticmethod
+    def from_legacy(doc):
+        """
+        Convierte un documento de la colección price_history anterior al esquema compacto
+
+        Returns:
+            dict | None: None si no tiene producto o fecha reconocible
+        """
+        product_unique_id = doc.get("product_unique_id")
+        if not product_unique_id:
+            return None
+
+        ts = None
+        for field in ["timestamp", "created_at", "date"]:
+            value = doc.get(field)
+            if isinstance(value, datetime):
+                ts = value
+                break
+            if isinstance(value, str) and value:
+                try:
+                    ts = datetime.fromisoformat(value)
+                    break
+                except ValueError:
+                    continue
+
+        if ts is None and hasattr(doc.get("_id"), "generation_time"):
+            ts = doc["_id"].generation_time
+        if ts is None:
+            return None
+        if ts.tzinfo is not None:
+            ts = ts.replace(tzinfo=None)
+
+        if "old_price" in doc and "new_price" in doc:
+            compact = {
+                "ts": ts,
+                "product_unique_id": product_unique_id,
+                "price": float(doc.get("new_price") or 0),
+                "old_price": float(doc.get("old_price") or 0)
+            }
+            if doc.get("supermarket_key"):
+                compact["supermarket_key"] = doc["supermarket_key"]
+            if doc.get("source"):
+                compact["source"] = doc["source"]
+            return compact
+
+        return {
+            "ts": ts,
+            "product_unique_id": product_unique_id,
+            "price": float(doc.get("price") or 0)
+        }
+
+    @staticmethod
+    def to_api(doc):
+        """
+        Entrada en el formato que devolvían las rutas (timestamp/date como texto,
+        diferencia y porcentaje en los cambios de precio)
+        """
+        ts = doc["ts"]
+        entry = {
+            "_id": str(doc["_id"]) if doc.get("_id") is not None else None,
+            "product_unique_id": doc.get("product_unique_id"),
+            "price": doc.get("price", 0),
+            "timestamp": ts.isoformat(),
+            "date": ts.date().isoformat()
+        }
+
+        if "old_price" in doc:
+            old_price = doc.get("old_price") or 0
+            new_price = doc.get("price") or 0
+            entry.update({
+                "old_price": old_price,
+                "new_price": new_price,
+                "price_difference": round(new_price - old_price, 2),
+                "percentage_change": round(((new_price - old_price) / old_price) * 100, 1) if old_price else 0,
+                "supermarket_key": doc.get("supermarket_key"),
+                "source": doc.get("source")
+            })
+
+        return entry
+
+    # === LECTURA ===
+    def get_entries(self, product_unique_id, since=None, limit=None, newest_first=False):
+        """
+        Entradas de un producto (rango sobre ts dentro de los buckets del producto)
+
+        Returns:
+            list: Entradas en formato de API
+        """
+        query = {"product_unique_id": product_unique_id}
+        if since:
+            query["ts"] = {"$gte": since}
+
+        cursor = self.collection.find(query).sort([("ts", -1 if newest_first else 1)])
+        if limit:
+            cursor = cursor.limit(limit)
+
+        return [self.to_api(doc) for doc in cursor]
+
+    def get_recent_changes(self, since, limit=20):
+        """
+        Cambios de precio (no observaciones) desde una fecha, más recientes primero
+        """
+        cursor = self.collection.find({
+            "ts": {"$gte": since},
+            "old_price": {"$exists": True}
+        }).sort([("ts", -1)]).limit(limit)
+
+        return [self.to_api(doc) for doc in cursor]
+
+    def count_since(self, since):
+        return self.collection.count_documents({"ts": {"$gte": since}})
+
+    def count(self):
+        return self.collection.count_documents({})
+
+    def get_changes_summary(self, since):
+        """
+        Totales de subidas/bajadas de precio desde una fecha (calculados en el servidor)
+
+        Returns:
+            dict | None
+        """
+        pipeline = [
+            {"$match": {"ts": {"$gte": since}, "old_price": {"$gt": 0}}},
+            {
+                "$addFields": {
+                    "difference": {"$subtract": ["$price", "$old_price"]},
+                    "percentage": {
+                        "$multiply": [{"$divide": [{"$subtract": ["$price", "$old_price"]}, "$old_price"]}, 100]
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "total_changes": {"$sum": 1},
+                    "price_increases": {"$sum": {"$cond": [{"$gt": ["$difference", 0]}, 1, 0]}},
+                    "price_decreases": {"$sum": {"$cond": [{"$lt": ["$difference", 0]}, 1, 0]}},
+                    "avg_percentage_change": {"$avg": "$percentage"},
+                    "max_increase": {"$max": "$percentage"},
+                    "max_decrease": {"$min": "$percentage"}
+                }
+            }
+        ]
+
+        result = list(self.collection.aggregate(pipeline))
+        return result[0] if result else None
+
+    # === MANTENIMIENTO ===
+    def delete_older_than(self, cutoff):
+        """
+        Borra entradas anteriores a cutoff (la colección time-series además expira
+        sola a los PRICE_HISTORY_RETENTION_DAYS días)
+        """
+        try:
+            return self.collection.delete_many({"ts": {"$lt": cutoff}}).deleted_count
+        except Exception as e:
+            print(f"⚠️ No se pudo limpiar historial de precios (lo hará la expiración automática): {e}")
+            return 0
+
+
+# Crear instancia global
+price_history_model = PriceHistory()
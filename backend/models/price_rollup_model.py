@@ -0,0 +1,219 @@
+from services.db import db
+from models.price_history_model import price_history_model
+from services.history_writer import history_writer
+from pymongo import UpdateOne
+from datetime import datetime, timedelta
+
+ROLLUP_STATE_ID = "price_daily"
+
+
+class PriceRollup:
+    """
+    Resúmenes diarios de precios (mín/máx/promedio/último) precalculados desde el historial
+
+    Dos alcances en la misma colección:
+        scope="product"    key=unique_id     (un producto de un supermercado)
+        scope="canonical"  key=canonical_id  + supermarket_key (mismo artículo entre supermercados)
+    Un documento por alcance/clave/día: un gráfico de 90 días lee como máximo 90 filas por serie
+    """
+
+    def __init__(self):
+        self.rollups_collection = db['price_daily_rollups']
+        self.state_collection = db['rollup_state']
+        self.products_collection = db['products']
+
+        # Las filas del historial pueden llegar hasta max_age segundos tarde (escritor por lotes)
+        self.safety_lag = timedelta(seconds=history_writer.max_age_seconds * 2)
+        self.initial_days = 90
+
+        try:
+            self.rollups_collection.create_index([("scope", 1), ("key", 1), ("supermarket_key", 1), ("date", -1)])
+        except Exception as e:
+            print(f"⚠️ No se pudieron crear índices de resúmenes diarios: {e}")
+
+    # === ACTUALIZACIÓN INCREMENTAL ===
+    def refresh(self, until=None):
+        """
+        Agrega al resumen las entradas del historial posteriores a la última actualización
+
+        Args:
+            until (datetime): Límite superior (por defecto ahora menos el margen del escritor)
+
+        Returns:
+            dict: {since, until, product_days, canonical_days}
+        """
+        until = until or (datetime.now() - self.safety_lag)
+
+        state = self.state_collection.find_one({"_id": ROLLUP_STATE_ID})
+        since = state.get("last_ts") if state else None
+        since = since or (until - timedelta(days=self.initial_days))
+
+        result = {"since": since.isoformat(), "until": until.isoformat(), "product_days": 0, "canonical_days": 0}
+
+        if since >= until:
+            return result
+
+        try:
+            # 1. Resumen por producto y día (en el servidor, sólo la ventana nueva)
+            pipeline = [
+                {"$match": {"ts": {"$gte": since, "$lt": until}, "price": {"$gt": 0}}},
+                {"$sort": {"ts": 1}},
+                {
+                    "$group": {
+                        "_id": {
+                            "unique_id": "$product_unique_id",
+                            "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ts"}}
+                        },
+                        "min": {"$min": "$price"},
+                        "max": {"$max": "$price"},
+                        "sum": {"$sum": "$price"},
+                        "count": {"$sum": 1},
+                        "last": {"$last": "$price"},
+                        "last_ts": {"$last": "$ts"}
+                    }
+                }
+            ]
+            product_days = list(price_history_model.collection.aggregate(pipeline))
+
+            if product_days:
+                # 2. Supermercado y grupo canónico de cada producto (una consulta)
+                unique_ids = list({row["_id"]["unique_id"] for row in product_days})
+                products = {
+                    product["unique_id"]: product
+                    for product in self.products_collection.find(
+                        {"unique_id": {"$in": unique_ids}},
+                        {"_id": 0, "unique_id": 1, "name": 1, "supermarket": 1,
+                         "supermarket_key": 1, "canonical_id": 1}
+                    )
+                }
+
+                operations = []
+                canonical_days = {}
+
+                for row in product_days:
+                    unique_id = row["_id"]["unique_id"]
+                    date = row["_id"]["date"]
+                    product = products.get(unique_id, {})
+
+                    operations.append(self._merge_operation(
+                        f"product:{unique_id}:{date}", "product", unique_id, date, row,
+                        {"supermarket_key": product.get("supermarket_key")}
+                    ))
+
+                    canonical_id = product.get("canonical_id")
+                    if canonical_id:
+                        group_key = (canonical_id, product.get("supermarket_key"), date)
+                        canonical_days.setdefault(group_key, {"rows": [], "product": product})
+                        canonical_days[group_key]["rows"].append(row)
+
+                # 3. Resumen por producto canónico + supermercado y día
+                for (canonical_id, supermarket_key, date), group in canonical_days.items():
+                    rows = group["rows"]
+                    newest = max(rows, key=lambda item: item["last_ts"])
+                    combined = {
+                        "min": min(item["min"] for item in rows),
+                        "max": max(item["max"] for item in rows),
+                        "sum": sum(item["sum"] for item in rows),
+                        "count": sum(item["count"] for item in rows),
+                        "last": newest["last"],
+                        "last_ts": newest["last_ts"]
+                    }
+                    operations.append(self._merge_operation(
+                        f"canonical:{canonical_id}:{supermarket_key}:{date}", "canonical", canonical_id, date, combined,
+                        {
+                            "supermarket_key": supermarket_key,
+                            "supermarket": group["product"].get("supermarket"),
+                            "product_name": group["product"].get("name")
+                        }
+                    ))
+
+                self.rollups_collection.bulk_write(operations, ordered=False)
+
+                result["product_days"] = len(product_days)
+                result["canonical_days"] = len(canonical_days)
+
+            # 4. Guardar hasta dónde se resumió
+            self.state_collection.update_one(
+                {"_id": ROLLUP_STATE_ID},
+                {"$set": {"last_ts": until, "updated_at": datetime.now().isoformat()}},
+                upsert=True
+            )
+
+            print(f"📈 Resúmenes diarios actualizados: {result['product_days']} producto-día, "
+                  f"{result['canonical_days']} grupo-día")
+
+        except Exception as e:
+            print(f"❌ Error actualizando resúmenes diarios: {e}")
+
+        return result
+
+    def _merge_operation(self, rollup_id, scope, key, date, row, extra_fields):
+        """
+        Suma una ventana nueva al documento del día (las ventanas llegan en orden,
+        así que el último precio de la ventana reemplaza al anterior)
+        """
+        return UpdateOne(
+            {"_id": rollup_id},
+            {
+                "$min": {"min": row["min"]},
+                "$max": {"max": row["max"], "last_ts": row["last_ts"]},
+                "$inc": {"sum": row["sum"], "count": row["count"]},
+                "$set": {"scope": scope, "key": key, "date": date, "last": row["last"], **extra_fields}
+            },
+            upsert=True
+        )
+
+    # === LECTURA ===
+    @staticmethod
+    def _format(doc):
+        count = doc.get("count", 0)
+        return {
+            "date": doc["date"],
+            "min": doc.get("min"),
+            "max": doc.get("max"),
+            "avg": round(doc.get("sum", 0) / count, 2) if count else 0,
+            "last": doc.get("last"),
+            "count": count,
+            "supermarket_key": doc.get("supermarket_key"),
+            "supermarket": doc.get("supermarket"),
+            "product_name": doc.get("product_name")
+        }
+
+    def get_product_daily(self, unique_id, days_back=30):
+        """
+        Días de un producto, del más antiguo al más reciente (máximo 90 filas)
+        """
+        days_back = min(days_back, 90)
+        since_date = (datetime.now() - timedelta(days=days_back)).date().isoformat()
+
+        cursor = self.rollups_collection.find({
+            "scope": "product",
+            "key": unique_id,
+            "date": {"$gte": since_date}
+        }).sort([("date", 1)]).limit(90)
+
+        return [self._format(doc) for doc in cursor]
+
+    def get_canonical_daily(self, canonical_id, supermarket_key=None, days_back=30):
+        """
+        Días del mismo artículo en cada supermercado (máximo 90 filas por supermercado)
+        Ordenados por fecha; con varios supermercados hay una fila por supermercado y día
+        """
+        days_back = min(days_back, 90)
+        since_date = (datetime.now() - timedelta(days=days_back)).date().isoformat()
+
+        query = {
+            "scope": "canonical",
+            "key": canonical_id,
+            "date": {"$gte": since_date}
+        }
+        if supermarket_key:
+            query["supermarket_key"] = supermarket_key
+
+        cursor = self.rollups_collection.find(query).sort([("date", 1)])
+
+        return [self._format(doc) for doc in cursor]
+
+
+# Crear instancia global
+price_rollup_model = PriceRollup()
@@ -1,6 +1,37 @@
 from services.db import db
+from utils.product_features import feature_extractor
+from utils.brand_matcher import brand_matcher
+from utils.product_matcher import ProductMatcher
+from utils.canonical_product import canonical_index
+from utils.price_series import PriceSeries, daily_trend
+from services.identity_cache import identity_cache
+from services.history_writer import history_writer
+from services.search_index import search_index, SEARCH_BACKEND, SAVED_SEARCH_BOOSTS, COMPARISON_BOOSTS
+from services.autocomplete_index import autocomplete_index
+from services.query_cache import query_cache
+from models.price_history_model import price_history_model
+from models.price_rollup_model import price_rollup_model
+from pymongo import InsertOne, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
 from datetime import datetime, timedelta
+import base64
+import hashlib
+import json
 import re
+import time
+
+# Ordenamientos de /api/products/all: campo y dirección (el _id desempata en la misma dirección)
+PAGE_SORT_OPTIONS = {
+    "price": ("price", 1),
+    "price_desc": ("price", -1),
+    "name": ("name", 1),
+    "scraped_at": ("scraped_at", -1),
+    "updated_at": ("updated_at", -1)
+}
+
+# Campos internos que no se envían en listados por streaming
+LISTING_PROJECTION = {"search_queries": 0, "content_hash": 0}
 
 class Product:
     """
@@ -11,49 +42,77 @@ class Product:
         # Colecciones de MongoDB
         self.products_collection = db['products']  # Productos actuales
         self.search_history_collection = db['search_history']  # Historial de búsquedas
-        self.price_history_collection = db['price_history']  # Historial de precios
+        self.price_history_collection = price_history_model.collection  # Historial de precios (time-series)
+        
+        # Conteos aproximados para la paginación
+        self._count_cache = {}  # supermarket -> (conteo, momento)
+        self.count_cache_ttl = 600
+        
+        self._ensure_indexes()
+        
+        # Diccionario de marcas: archivo data/brands.txt + marcas ya guardadas
+        brand_matcher.load_from_collection(self.products_collection)
+        
+        # Emparejadores por bloques + LSH con las mismas palabras que comparan v2 y v3
+        self.conflict_matcher = ProductMatcher(
+            feature_key=self._matching_features_v2, tokenizer=self._matching_tokens_v2
+        )
+        self.duplicate_matcher = ProductMatcher(tokenizer=self._matching_tokens_v3)
+    
+    def _ensure_indexes(self):
+        """
+        Índices que usa el guardado por lotes (consulta $in por unique_id) y la limpieza
+        (los del historial de precios los crea price_history_model)
+        """
+        try:
+            self.products_collection.create_index("unique_id")
+            self.products_collection.create_index("last_seen")
+            self.products_collection.create_index([("canonical_id", 1), ("supermarket_key", 1)])
+            
+            # Paginación por cursor: (campo, _id) con y sin filtro de supermercado
+            # (un índice sirve para ambas direcciones)
+            for field in {field for field, _ in PAGE_SORT_OPTIONS.values()}:
+                self.products_collection.create_index([(field, 1), ("_id", 1)])
+                self.products_collection.create_index([("supermarket_key", 1), (field, 1), ("_id", 1)])
+        except Exception as e:
+            print(f"⚠️ No se pudieron crear índices de productos: {e}")
     
     def save_products(self, products_data, search_query):
         """
         Guarda productos obtenidos de las APIs en la base de datos
         VERSIÓN CORREGIDA que evita alertas falsas
+        
+        products_data puede ser el diccionario de search_products o un iterable
+        de páginas (supermarket_api.stream_products); las páginas se guardan
+        a medida que llegan, sin juntar todo el catálogo en memoria
         """
         try:
             saved_count = 0
             updated_count = 0
+            unchanged_count = 0
             
-            # Recorrer productos de cada supermercado
-            for supermarket_key, supermarket_data in products_data.items():
-                if supermarket_data.get("success") and supermarket_data.get("products"):
-                    
-                    for product in supermarket_data["products"]:
-                        # Crear identificador único MEJORADO
-                        unique_id = self._generate_product_id_v2(product)
-                        
-                        # Buscar si el producto ya existe
-                        existing_product = self.products_collection.find_one({
-                            "unique_id": unique_id
-                        })
-                        
-                        if existing_product:
-                            # Actualizar producto existente SOLO si es el mismo producto
-                            updated_product = self._update_existing_product_v2(existing_product, product)
-                            if updated_product:
-                                updated_count += 1
-                        else:
-                            # Guardar nuevo producto
-                            new_product = self._create_new_product(product, unique_id, search_query)
-                            if new_product:
-                                saved_count += 1
+            if isinstance(products_data, dict):
+                batches = [products_data]
+            else:
+                batches = products_data
+            
+            for batch in batches:
+                batch_saved, batch_updated, batch_unchanged = self._save_products_batch(batch, search_query)
+                saved_count += batch_saved
+                updated_count += batch_updated
+                unchanged_count += batch_unchanged
+            
+            total_processed = saved_count + updated_count + unchanged_count
             
             # Guardar en historial de búsquedas
-            self._save_search_history(search_query, saved_count + updated_count)
+            self._save_search_history(search_query, total_processed)
             
             return {
                 "success": True,
                 "saved_count": saved_count,
                 "updated_count": updated_count,
-                "total_processed": saved_count + updated_count
+                "unchanged_count": unchanged_count,
+                "total_processed": total_processed
             }
             
         except Exception as e:
@@ -65,6 +124,242 @@ class Product:
                 "updated_count": 0
             }
 
+    def _save_products_batch(self, products_data, search_query):
+        """
+        Guarda un lote {supermarket_key: resultado} y devuelve (nuevos, actualizados, sin cambios)
+        
+        Pipeline por lotes:
+        1. Una sola consulta $in para traer los productos que ya existen
+           (los que la caché de identidades da por iguales ni siquiera se leen)
+        2. Cambios calculados en memoria (nuevos, actualizaciones, historial)
+        3. Un bulk_write(ordered=False) para productos y un insert_many para el historial
+        
+        Los productos cuyo content_hash no cambió no se reescriben ni generan historial:
+        sólo se marca last_seen/scraped_at con un único update_many
+        """
+        now = datetime.now()
+        
+        # 1. Generar IDs de todos los productos del lote
+        pending = []
+        for supermarket_key, supermarket_data in products_data.items():
+            if supermarket_data.get("success") and supermarket_data.get("products"):
+                for product in supermarket_data["products"]:
+                    pending.append((
+                        self._generate_product_id_v2(product),
+                        product,
+                        self._compute_content_hash(product)
+                    ))
+        
+        if not pending:
+            return 0, 0, 0
+        
+        # Marcas nuevas se suman al diccionario (el autómata se actualiza en la próxima búsqueda)
+        brand_matcher.add_brands({product.get("brand") for _, product, _ in pending if product.get("brand")})
+        
+        # 2. Productos sin cambios según la caché de identidades: no hace falta leerlos
+        unchanged = {}  # unique_id -> entrada de la caché
+        to_fetch = set()
+        for unique_id, product, content_hash in pending:
+            if unique_id in unchanged or unique_id in to_fetch:
+                continue
+            is_unchanged, cached = identity_cache.is_unchanged(unique_id, product.get("price", 0), product.get("name"))
+            if cached and cached.get("content_hash") == content_hash:
+                is_unchanged = True
+            if is_unchanged and self._is_comparable_v3(product):
+                unchanged[unique_id] = cached
+            else:
+                to_fetch.add(unique_id)
+        
+        # 3. Traer de una vez los productos existentes que sí pueden haber cambiado
+        known_products = {}
+        if to_fetch:
+            known_products = {
+                doc["unique_id"]: doc
+                for doc in self.products_collection.find({"unique_id": {"$in": list(to_fetch)}})
+            }
+        
+        new_docs = {}  # unique_id -> documento a insertar (aún no está en la BD)
+        updates = {}  # unique_id -> campos $set para productos existentes
+        touched = set()  # unique_id de productos sin cambios (sólo last_seen)
+        renamed = []  # nombres anteriores de productos renombrados (invalidan sus búsquedas)
+        history_docs = []
+        saved_count = 0
+        updated_count = 0
+        unchanged_count = 0
+        
+        for unique_id, product, content_hash in pending:
+            existing_product = known_products.get(unique_id)
+            
+            if existing_product is None and unique_id in unchanged:
+                # Mismo precio y nombre que la última vez: basta lo que hay en caché
+                cached = unchanged[unique_id]
+                existing_product = {
+                    "unique_id": unique_id,
+                    "name": product.get("name"),
+                    "supermarket_key": product.get("supermarket_key"),
+                    "price": cached["price"],
+                    "update_count": cached["update_count"],
+                    "content_hash": cached.get("content_hash")
+                }
+                known_products[unique_id] = existing_product
+            
+            if existing_product is None:
+                # Guardar nuevo producto
+                product_doc = self._build_new_product_doc(product, unique_id, search_query, now, content_hash)
+                new_docs[unique_id] = product_doc
+                known_products[unique_id] = product_doc
+                saved_count += 1
+                
+                if product.get("price", 0) > 0:
+                    history_docs.append(self._build_price_history_doc(unique_id, product.get("price", 0), now))
+                continue
+            
+            # VALIDACIÓN CRÍTICA: Verificar que sea realmente el mismo producto
+            if not self._is_same_product_v3(existing_product, product):
+                print(f"⚠️ PRODUCTOS DIFERENTES detectados con mismo ID:")
+                print(f"   Existente: {existing_product.get('name')}")
+                print(f"   Nuevo: {product.get('name')}")
+                
+                # Crear nuevo producto con ID único para evitar conflictos
+                alt_unique_id = unique_id + f"_alt_{int(now.timestamp())}"
+                if alt_unique_id not in known_products:
+                    alt_doc = self._build_new_product_doc(product, alt_unique_id, "conflict_resolved", now, content_hash)
+                    new_docs[alt_unique_id] = alt_doc
+                    known_products[alt_unique_id] = alt_doc
+                    if product.get("price", 0) > 0:
+                        history_docs.append(self._build_price_history_doc(alt_unique_id, product.get("price", 0), now))
+                continue
+            
+            # Mismo contenido que lo guardado: sólo registrar que se volvió a ver
+            if existing_product.get("content_hash") == content_hash:
+                if unique_id not in new_docs:
+                    touched.add(unique_id)
+                unchanged_count += 1
+                continue
+            
+            try:
+                update_fields = self._build_product_update(existing_product, product, now, content_hash)
+            except Exception as e:
+                print(f"Error actualizando producto: {e}")
+                continue
+            
+            if update_fields.get("name") != existing_product.get("name"):
+                renamed.append({"name": existing_product.get("name")})
+            
+            # Mantener la copia en memoria al día (el mismo ID puede repetirse en el lote)
+            existing_product.update(update_fields)
+            if unique_id not in new_docs:
+                updates.setdefault(unique_id, {}).update(update_fields)
+            updated_count += 1
+            
+            if update_fields["price"] > 0:
+                history_docs.append(self._build_price_history_doc(unique_id, update_fields["price"], now))
+        
+        # 4. Escribir todo en dos operaciones
+        operations = [InsertOne(doc) for doc in new_docs.values()]
+        operations += [
+            UpdateOne({"unique_id": unique_id}, {"$set": update_fields})
+            for unique_id, update_fields in updates.items()
+        ]
+        operation_ids = [[unique_id] for unique_id in list(new_docs) + list(updates)]  # índice -> unique_ids
+        
+        touched -= set(updates)
+        if touched:
+            operations.append(UpdateMany(
+                {"unique_id": {"$in": list(touched)}},
+                {"$set": {"last_seen": now.isoformat(), "scraped_at": now.isoformat()}}
+            ))
+            operation_ids.append(list(touched))
+        
+        # bulk_write sin orden aplica todo menos las operaciones que fallan: sólo esas se descartan
+        failed_ids = set()
+        for index in self._flush_product_writes(operations):
+            failed_ids.update(operation_ids[index])
+        
+        if failed_ids:
+            identity_cache.invalidate(list(failed_ids))
+        
+        # Mantener la caché y los índices coherentes con lo que quedó escrito
+        for unique_id in list(new_docs) + list(updates) + list(touched):
+            if unique_id in failed_ids:
+                continue
+            doc = known_products[unique_id]
+            identity_cache.put(
+                unique_id, doc.get("price", 0), doc.get("name"),
+                doc.get("update_count", 0), doc.get("content_hash")
+            )
+        search_index.add_many(
+            known_products[unique_id] for unique_id in list(new_docs) + list(updates)
+            if unique_id not in failed_ids
+        )
+        autocomplete_index.add_products(
+            doc for unique_id, doc in new_docs.items() if unique_id not in failed_ids
+        )
+        
+        # Búsquedas en caché con términos de productos nuevos o modificados
+        if new_docs or updates:
+            query_cache.bump_products(
+                [known_products[unique_id] for unique_id in list(new_docs) + list(updates)] + renamed
+            )
+        
+        # Sin historial para productos que no se llegaron a escribir
+        self._flush_price_history([doc for doc in history_docs if doc["product_unique_id"] not in failed_ids])
+        
+        return saved_count, updated_count, unchanged_count
+
+    def _compute_content_hash(self, product):
+        """
+        Huella de los campos scrapeados (sin marcas de tiempo)
+        Si no cambia, el producto no necesita reescribirse
+        """
+        try:
+            price = float(product.get("price", 0) or 0)
+        except (TypeError, ValueError):
+            price = product.get("price")
+        
+        content = [
+            " ".join((product.get("name") or "").split()),
+            product.get("brand"),
+            product.get("description"),
+            price,
+            product.get("original_price", 0),
+            product.get("discount_percentage", 0),
+            product.get("currency", "PEN"),
+            bool(product.get("available", False)),
+            product.get("images", []),
+            product.get("categories", []),
+            product.get("url")
+        ]
+        
+        serialized = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _flush_product_writes(self, operations):
+        """
+        Ejecuta inserciones y actualizaciones de productos en un solo bulk_write
+        
+        Returns:
+            set: Índices (en operations) de las escrituras que fallaron; vacío si se aplicaron todas
+        """
+        if not operations:
+            return set()
+        
+        try:
+            self.products_collection.bulk_write(operations, ordered=False)
+            return set()
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            print(f"⚠️ {len(errors)} de {len(operations)} escrituras de productos fallaron")
+            for error in errors[:3]:
+                print(f"   - {error.get('errmsg')}")
+            return {error["index"] for error in errors}
+
+    def _flush_price_history(self, history_docs):
+        """
+        Encola las entradas de historial de precios del lote (se insertan por lotes con insert_many)
+        """
+        history_writer.add_many(history_docs)
+
     # REEMPLAZAR ESTE MÉTODO EN TU product_model.py
 
     def _generate_product_id_v2(self, product):
@@ -127,100 +422,20 @@ class Product:
     def _extract_product_features_enhanced(self, name):
         """
         VERSIÓN MEJORADA: Extrae cantidades, unidades y tamaños con mayor precisión
+        (patrones precompilados + caché LRU en utils/product_features.py)
         """
-        features = {
-            "quantity": None,
-            "unit": None,
-            "pack_size": None,
-            "brand": None,
-            "type": None
-        }
-        
         try:
-            # Patrones MEJORADOS para cantidades/unidades
-            quantity_patterns = [
-                # Unidades específicas
-                r'(\d+)\s*(?:un|unidades?|piezas?|pcs?)\b',
-                r'paquete\s*(\d+)\s*(?:un|unidades?)',
-                r'bandeja\s*(\d+)\s*(?:un|unidades?)',
-                r'pack\s*(\d+)\s*(?:un|unidades?)',
-                r'(\d+)\s*pack',
-                
-                # Volúmenes
-                r'(\d+(?:\.\d+)?)\s*(?:ml|mililitros?)\b',
-                r'(\d+(?:\.\d+)?)\s*(?:lt?|l|litros?)\b',
-                r'caja\s*(\d+(?:\.\d+)?)\s*(?:ml|l)',
-                
-                # Pesos
-                r'(\d+(?:\.\d+)?)\s*(?:gr?|g|gramos?)\b',
-                r'(\d+(?:\.\d+)?)\s*(?:kg|kilogramos?)\b',
-                r'bolsa\s*(\d+(?:\.\d+)?)\s*(?:kg|g)',
-                
-                # Combinaciones especiales
-                r'(\d+)\s*x\s*(\d+(?:\.\d+)?)\s*(?:ml|l|g|kg)',
-                r'(\d+)\s*x\s*(\d+)\s*(?:un|unidades?)',
-            ]
-            
-            # Buscar cantidad principal
-            for pattern in quantity_patterns:
-                match = re.search(pattern, name, re.IGNORECASE)
-                if match:
-                    if 'x' in pattern:
-                        # Para patrones como "6 x 390g" o "3 x 1L"
-                        features["pack_size"] = match.group(1)
-                        features["quantity"] = match.group(2)
-                        # Extraer unidad del patrón
-                        unit_match = re.search(r'(ml|l|g|kg|un)', match.group(0), re.IGNORECASE)
-                        if unit_match:
-                            features["unit"] = unit_match.group(1).lower()
-                    else:
-                        features["quantity"] = match.group(1)
-                        # Determinar unidad basada en el patrón
-                        if 'ml' in pattern or 'mililitros' in pattern:
-                            features["unit"] = "ml"
-                        elif 'lt' in pattern or 'litros' in pattern:
-                            features["unit"] = "l"
-                        elif 'gr' in pattern or 'gramos' in pattern:
-                            features["unit"] = "g"
-                        elif 'kg' in pattern:
-                            features["unit"] = "kg"
-                        elif 'un' in pattern or 'unidades' in pattern or 'piezas' in pattern:
-                            features["unit"] = "un"
-                    break
-            
-            # Buscar tamaño de paquete si no se encontró en cantidad
-            if not features.get("pack_size"):
-                pack_patterns = [
-                    r'paquete\s*(\d+)',
-                    r'pack\s*(\d+)',
-                    r'bandeja\s*(\d+)',
-                    r'caja\s*(\d+)',
-                    r'bolsa\s*(\d+)',
-                    r'(\d+)pack'
-                ]
-                
-                for pattern in pack_patterns:
-                    match = re.search(pattern, name, re.IGNORECASE)
-                    if match:
-                        features["pack_size"] = match.group(1)
-                        break
-            
-            # Extraer marca conocida
-            brand_patterns = [
-                r'\b(GLORIA|LAIVE|NESTLE|BIMBO|BELLS?|CALERA|ARTISAN|EMSAL|PALMOLIVE|AYUDIN|SAPOLIO|ARIEL|ACE|BOLIVAR|MAGGI|PRIMOR|COSTEÑO|PILSEN|COCA\s*COLA|INCA\s*KOLA)\b'
-            ]
-            
-            for pattern in brand_patterns:
-                match = re.search(pattern, name, re.IGNORECASE)
-                if match:
-                    features["brand"] = match.group(1).lower().replace(' ', '')
-                    break
-            
-            return features
+            return feature_extractor.extract(name)
             
         except Exception as e:
             print(f"Error extrayendo características mejoradas: {e}")
-            return features
+            return {
+                "quantity": None,
+                "unit": None,
+                "pack_size": None,
+                "brand": None,
+                "type": None
+            }
 
     def _clean_product_name_enhanced(self, name):
         """
@@ -353,6 +568,14 @@ class Product:
             print(f"Error comparando productos v3: {e}")
             return False
 
+    def _is_comparable_v3(self, product):
+        """
+        True si _is_same_product_v3 puede reconocer el producto como igual a sí mismo
+        (nombre con palabras además de cantidades). Los que no, se leen de la BD para
+        que el camino con caché conserve el mismo tratamiento de conflictos
+        """
+        return self._is_same_product_v3(product, product)
+
     def _extract_product_features(self, name):
         """
         Extrae características específicas del producto (tamaño, marca, tipo)
@@ -385,17 +608,8 @@ class Product:
                     features["size"] = size_text
                     break
             
-            # Extraer marca común (primeras palabras en mayúsculas)
-            brand_patterns = [
-                r'\b([A-ZÁÉÍÓÚÜ][A-ZÁÉÍÓÚÜ\s]{2,15})\b',  # Palabras en mayúsculas
-                r'\b(AYUDIN|SAPOLIO|ARIEL|ACE|BOLIVAR|GLORIA|NESTLE|MAGGI)\b'  # Marcas conocidas
-            ]
-            
-            for pattern in brand_patterns:
-                match = re.search(pattern, name, re.IGNORECASE)
-                if match:
-                    features["brand"] = match.group(1).lower().strip()
-                    break
+            # Extraer marca conocida (diccionario Aho-Corasick con todas las marcas)
+            features["brand"] = brand_matcher.find_brand(name)
             
         except Exception as e:
             print(f"Error extrayendo características: {e}")
@@ -431,101 +645,87 @@ class Product:
             print(f"Error limpiando nombre: {e}")
             return name[:20]  # Fallback
 
-    def _update_existing_product_v2(self, existing_product, new_product):
+    def _build_product_update(self, existing_product, new_product, now=None, content_hash=None):
+        """
+        VERSIÓN CORREGIDA: Calcula los campos a actualizar de un producto existente
+        y crea la alerta de precio si corresponde (no escribe el producto)
+        
+        Returns:
+            dict: Campos para $set
+        """
+        now = now or datetime.now()
+        
+        unique_id = existing_product["unique_id"]
+        old_price = float(existing_product.get("price", 0))
+        new_price = float(new_product.get("price", 0))
+        
+        # VALIDAR CAMBIOS DE PRECIO Y CREAR ALERTAS CORRECTAMENTE
+        if old_price > 0 and new_price > 0 and old_price != new_price:
+            self._handle_price_change(existing_product, unique_id, old_price, new_price)
+        
+        # Actualizar datos del producto
+        return {
+            "name": new_product.get("name", existing_product.get("name")),
+            "brand": new_product.get("brand", existing_product.get("brand")),
+            "description": new_product.get("description", existing_product.get("description")),
+            "price": new_price,
+            "original_price": new_product.get("original_price", 0),
+            "discount_percentage": new_product.get("discount_percentage", 0),
+            "available": new_product.get("available", False),
+            "images": new_product.get("images", existing_product.get("images", [])),
+            "categories": new_product.get("categories", existing_product.get("categories", [])),
+            "url": new_product.get("url", existing_product.get("url")),
+            "scraped_at": new_product.get("scraped_at"),
+            "updated_at": now.isoformat(),
+            "last_seen": now.isoformat(),
+            "canonical_id": canonical_index.canonical_id(new_product.get("name", existing_product.get("name"))),
+            "content_hash": content_hash or self._compute_content_hash(new_product),
+            "update_count": existing_product.get("update_count", 0) + 1
+        }
+
+    def _handle_price_change(self, existing_product, unique_id, old_price, new_price):
         """
-        VERSIÓN CORREGIDA: Actualiza producto existente con validaciones estrictas
+        Crea una alerta si el cambio de precio pasa los filtros estrictos
         """
+        # Calcular cambios
+        price_difference = abs(new_price - old_price)
+        percentage_change = abs((new_price - old_price) / old_price * 100)
+        
+        # FILTROS ESTRICTOS para evitar alertas falsas
+        should_create_alert = self._should_create_price_alert(
+            old_price, new_price, price_difference, percentage_change
+        )
+        
+        if not should_create_alert:
+            print(f"Cambio de precio registrado pero no genera alerta: S/{old_price:.2f} -> S/{new_price:.2f} ({percentage_change:.1f}%)")
+            return
+        
         try:
-            # VALIDACIÓN CRÍTICA: Verificar que sea realmente el mismo producto
-            if not self._is_same_product_v3(existing_product, new_product):
-                print(f"⚠️ PRODUCTOS DIFERENTES detectados con mismo ID:")
-                print(f"   Existente: {existing_product.get('name')}")
-                print(f"   Nuevo: {new_product.get('name')}")
-                
-                # Crear nuevo producto con ID único para evitar conflictos
-                new_unique_id = self._generate_product_id_v2(new_product) + f"_alt_{int(datetime.now().timestamp())}"
-                self._create_new_product(new_product, new_unique_id, "conflict_resolved")
-                return False
+            from models.alert_model import alert_model
             
-            unique_id = existing_product["unique_id"]
-            old_price = float(existing_product.get("price", 0))
-            new_price = float(new_product.get("price", 0))
-            
-            # VALIDAR CAMBIOS DE PRECIO Y CREAR ALERTAS CORRECTAMENTE
-            if old_price > 0 and new_price > 0 and old_price != new_price:
-                
-                # Calcular cambios
-                price_difference = abs(new_price - old_price)
-                percentage_change = abs((new_price - old_price) / old_price * 100)
-                
-                # FILTROS ESTRICTOS para evitar alertas falsas
-                should_create_alert = self._should_create_price_alert(
-                    old_price, new_price, price_difference, percentage_change
-                )
-                
-                if should_create_alert:
-                    try:
-                        from models.alert_model import alert_model
-                        
-                        product_data_for_alert = {
-                            "unique_id": unique_id,
-                            "name": existing_product.get("name"),
-                            "brand": existing_product.get("brand"),
-                            "supermarket": existing_product.get("supermarket"),
-                            "supermarket_key": existing_product.get("supermarket_key"),
-                            "url": existing_product.get("url"),
-                            "categories": existing_product.get("categories", [])
-                        }
-                        
-                        alert_id = alert_model.create_price_change_alert(
-                            product_data=product_data_for_alert,
-                            old_price=old_price,
-                            new_price=new_price
-                        )
-                        
-                        if alert_id:
-                            print(f"✅ Alerta válida creada: {existing_product.get('name')} - S/{old_price:.2f} -> S/{new_price:.2f}")
-                        
-                    except ImportError:
-                        print("Warning: alert_model no disponible")
-                    except Exception as e:
-                        print(f"Error creando alerta: {e}")
-                else:
-                    print(f"Cambio de precio registrado pero no genera alerta: S/{old_price:.2f} -> S/{new_price:.2f} ({percentage_change:.1f}%)")
-            
-            # Actualizar datos del producto
-            update_doc = {
-                "$set": {
-                    "name": new_product.get("name", existing_product.get("name")),
-                    "brand": new_product.get("brand", existing_product.get("brand")),
-                    "description": new_product.get("description", existing_product.get("description")),
-                    "price": new_price,
-                    "original_price": new_product.get("original_price", 0),
-                    "discount_percentage": new_product.get("discount_percentage", 0),
-                    "available": new_product.get("available", False),
-                    "images": new_product.get("images", existing_product.get("images", [])),
-                    "categories": new_product.get("categories", existing_product.get("categories", [])),
-                    "url": new_product.get("url", existing_product.get("url")),
-                    "scraped_at": new_product.get("scraped_at"),
-                    "updated_at": datetime.now().isoformat(),
-                    "update_count": existing_product.get("update_count", 0) + 1
-                }
+            product_data_for_alert = {
+                "unique_id": unique_id,
+                "name": existing_product.get("name"),
+                "brand": existing_product.get("brand"),
+                "supermarket": existing_product.get("supermarket"),
+                "supermarket_key": existing_product.get("supermarket_key"),
+                "url": existing_product.get("url"),
+                "categories": existing_product.get("categories", [])
             }
             
-            result = self.products_collection.update_one(
-                {"unique_id": unique_id},
-                update_doc
+            alert_id = alert_model.create_price_change_alert(
+                product_data=product_data_for_alert,
+                old_price=old_price,
+                new_price=new_price
             )
             
-            # Guardar en historial de precios (independiente de alertas)
-            if new_price > 0:
-                self._save_price_history(unique_id, new_price)
-            
-            return result.modified_count > 0
+            if alert_id:
+                print(f"✅ Alerta válida creada: {existing_product.get('name')} - S/{old_price:.2f} -> S/{new_price:.2f}")
             
+        except ImportError:
+            print("Warning: alert_model no disponible")
         except Exception as e:
-            print(f"Error actualizando producto: {e}")
-            return False
+            print(f"Error creando alerta: {e}")
 
     def _is_same_product_v2(self, product1, product2):
         """
@@ -640,40 +840,12 @@ class Product:
         Búsqueda específica para comparación de precios
         """
         try:
-            pipeline = [
-                {
-                    "$search": {
-                        "index": "products_search_index",
-                        "compound": {
-                            "should": [
-                                {
-                                    "text": {
-                                        "query": query,
-                                        "path": "name",
-                                        "score": {"boost": {"value": 5}}
-                                    }
-                                },
-                                {
-                                    "text": {
-                                        "query": query,
-                                        "path": "brand",
-                                        "score": {"boost": {"value": 3}}
-                                    }
-                                }
-                            ]
-                        }
-                    }
-                },
-                {
-                    "$addFields": {
-                        "search_score": {"$meta": "searchScore"}
-                    }
-                },
-                {"$sort": {"search_score": -1, "price": 1}},
-                {"$limit": limit}
-            ]
+            products = None
+            if SEARCH_BACKEND == "local":
+                products = self._search_local_index(query, COMPARISON_BOOSTS, sort_by="relevance_price", limit=limit)
             
-            products = list(self.products_collection.aggregate(pipeline))
+            if products is None:
+                products = self._search_atlas_for_comparison(query, limit)
             
             # Procesar para comparación
             comparison_data = {}
@@ -714,13 +886,65 @@ class Product:
             print(f"Error en búsqueda para comparación: {e}")
             return {}
 
+    def _search_atlas_for_comparison(self, query, limit):
+        """
+        Búsqueda para comparación con Atlas Search (índice products_search_index)
+        """
+        pipeline = [
+            {
+                "$search": {
+                    "index": "products_search_index",
+                    "compound": {
+                        "should": [
+                            {
+                                "text": {
+                                    "query": query,
+                                    "path": "name",
+                                    "score": {"boost": {"value": 5}}
+                                }
+                            },
+                            {
+                                "text": {
+                                    "query": query,
+                                    "path": "brand",
+                                    "score": {"boost": {"value": 3}}
+                                }
+                            }
+                        ]
+                    }
+                }
+            },
+            {
+                "$addFields": {
+                    "search_score": {"$meta": "searchScore"}
+                }
+            },
+            {"$sort": {"search_score": -1, "price": 1}},
+            {"$limit": limit}
+        ]
+        
+        return list(self.products_collection.aggregate(pipeline))
+
     def search_saved_products(self, query, supermarket=None, limit=50, sort_by="price"):
         """
-        Busca productos usando Atlas Search
+        Busca productos guardados: Atlas Search (PRODUCT_SEARCH_BACKEND=atlas, por defecto)
+        o índice invertido local (PRODUCT_SEARCH_BACKEND=local), que exige todas las
+        palabras de la consulta y ordena sólo esos productos
+        
+        Args:
+            limit (int): Máximo de resultados (None = todos)
         """
         try:
             query_clean = query.strip()
             
+            if SEARCH_BACKEND == "local":
+                products = self._search_local_index(
+                    query_clean, SAVED_SEARCH_BOOSTS, supermarket=supermarket, sort_by=sort_by, limit=limit,
+                    match_all=True
+                )
+                if products is not None:
+                    return products
+            
             pipeline = [
                 {
                     "$search": {
@@ -781,7 +1005,8 @@ class Product:
                 sort_stage = {"$sort": {"scraped_at": -1, "search_score": -1}}
             
             pipeline.append(sort_stage)
-            pipeline.append({"$limit": limit})
+            if limit:
+                pipeline.append({"$limit": limit})
             
             products = list(self.products_collection.aggregate(pipeline))
             
@@ -796,44 +1021,114 @@ class Product:
             print(f"Error en Atlas Search: {e}")
             return []
 
-    def _create_new_product(self, product, unique_id, search_query):
+    def iter_saved_products(self, query, supermarket=None, sort_by="price", batch_size=500):
         """
-        Crea un nuevo producto en la base de datos
+        Misma búsqueda que /search/saved, como generador para respuestas por streaming:
+        los documentos se leen por lotes (con proyección en el servidor) y se entregan
+        uno a uno, sin juntar todos los resultados en memoria
+        
+        Yields:
+            dict: Producto (_id como ObjectId; el que serializa lo convierte)
         """
+        hits = []
+        if SEARCH_BACKEND == "local" and search_index.ensure_loaded(self.products_collection):
+            hits = search_index.search(query, SAVED_SEARCH_BOOSTS, supermarket, sort_by=sort_by, match_all=True)
+        
+        if hits:
+            # Índice local: los aciertos ya vienen ordenados, se leen de a batch_size
+            for start in range(0, len(hits), batch_size):
+                chunk = hits[start:start + batch_size]
+                documents = {}
+                for doc in self.products_collection.find(
+                    {"unique_id": {"$in": [hit["unique_id"] for hit in chunk]}}, LISTING_PROJECTION
+                ):
+                    documents.setdefault(doc["unique_id"], doc)
+                
+                for hit in chunk:
+                    product = documents.get(hit["unique_id"])
+                    if product is not None:
+                        product["search_score"] = round(hit["search_score"], 2)
+                        yield product
+            return
+        
+        # Palabras incompletas o sin índice: recorrer el cursor de la búsqueda por nombre
+        filter_query = {"name": {"$regex": query, "$options": "i"}}
+        if supermarket:
+            filter_query["supermarket_key"] = supermarket
+        
+        cursor = self.products_collection.find(filter_query, LISTING_PROJECTION).sort(sort_by, 1).batch_size(batch_size)
         try:
-            product_doc = {
-                "unique_id": unique_id,
-                "name": product.get("name"),
-                "brand": product.get("brand"),
-                "description": product.get("description"),
-                "supermarket": product.get("supermarket"),
-                "supermarket_key": product.get("supermarket_key"),
-                "price": product.get("price", 0),
-                "original_price": product.get("original_price", 0),
-                "discount_percentage": product.get("discount_percentage", 0),
-                "currency": product.get("currency", "PEN"),
-                "images": product.get("images", []),
-                "categories": product.get("categories", []),
-                "url": product.get("url"),
-                "available": product.get("available", False),
-                "scraped_at": product.get("scraped_at"),
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-                "search_queries": [search_query],
-                "update_count": 0
-            }
-            
-            result = self.products_collection.insert_one(product_doc)
-            
-            # Guardar historial de precios
-            if product.get("price", 0) > 0:
-                self._save_price_history(unique_id, product.get("price", 0))
-            
-            return result.inserted_id
-            
-        except Exception as e:
-            print(f"Error creando producto: {e}")
+            for product in cursor:
+                yield product
+        finally:
+            cursor.close()
+
+    def _search_local_index(self, query, boosts, supermarket=None, sort_by="relevance", limit=50, match_all=False):
+        """
+        Búsqueda con el índice invertido en memoria (services/search_index.py)
+        El índice ordena y limita los aciertos; de MongoDB sólo se leen los
+        productos que se devuelven (una consulta $in)
+        
+        Args:
+            match_all (bool): Exigir todas las palabras (búsqueda de guardados); la
+                              comparación usa alguna palabra + ranking BM25
+        
+        Returns:
+            list | None: Productos, o None si el índice no se pudo cargar
+        """
+        if not search_index.ensure_loaded(self.products_collection):
             return None
+        
+        hits = search_index.search(query, boosts, supermarket, sort_by=sort_by, limit=limit, match_all=match_all)
+        
+        if not hits:
+            return []
+        
+        documents = {}
+        for doc in self.products_collection.find({"unique_id": {"$in": [hit["unique_id"] for hit in hits]}}):
+            documents.setdefault(doc["unique_id"], doc)
+        
+        products = []
+        for hit in hits:
+            product = documents.get(hit["unique_id"])
+            if product is None:
+                continue
+            product["_id"] = str(product["_id"])
+            product["search_score"] = round(hit["search_score"], 2)
+            products.append(product)
+        
+        return products
+
+    def _build_new_product_doc(self, product, unique_id, search_query, now=None, content_hash=None):
+        """
+        Arma el documento de un producto nuevo (no lo inserta)
+        """
+        now = now or datetime.now()
+        
+        return {
+            "unique_id": unique_id,
+            "name": product.get("name"),
+            "brand": product.get("brand"),
+            "description": product.get("description"),
+            "supermarket": product.get("supermarket"),
+            "supermarket_key": product.get("supermarket_key"),
+            "price": product.get("price", 0),
+            "original_price": product.get("original_price", 0),
+            "discount_percentage": product.get("discount_percentage", 0),
+            "currency": product.get("currency", "PEN"),
+            "images": product.get("images", []),
+            "categories": product.get("categories", []),
+            "url": product.get("url"),
+            "available": product.get("available", False),
+            "scraped_at": product.get("scraped_at"),
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "last_seen": now.isoformat(),
+            "search_queries": [search_query],
+            "canonical_id": canonical_index.canonical_id(product.get("name")),
+            "content_hash": content_hash or self._compute_content_hash(product),
+            "update_count": 0
+        }
 
     def _save_search_history(self, search_query, results_count):
         """
@@ -870,22 +1165,11 @@ class Product:
         except Exception as e:
             print(f"Error guardando historial de búsqueda: {e}")
 
-    def _save_price_history(self, product_unique_id, price):
+    def _build_price_history_doc(self, product_unique_id, price, now=None):
         """
-        Guarda el historial de precios de un producto
+        Arma una entrada del historial de precios de un producto
         """
-        try:
-            price_doc = {
-                "product_unique_id": product_unique_id,
-                "price": price,
-                "timestamp": datetime.now().isoformat(),
-                "date": datetime.now().date().isoformat()
-            }
-            
-            self.price_history_collection.insert_one(price_doc)
-            
-        except Exception as e:
-            print(f"Error guardando historial de precios: {e}")
+        return price_history_model.build_observation(product_unique_id, price, now)
 
     # === MÉTODO DE LIMPIEZA Y CORRECCIÓN ===
     def fix_existing_product_conflicts(self):
@@ -914,25 +1198,31 @@ class Product:
             print(f"📊 Encontrados {len(conflicts)} grupos con posibles conflictos")
             
             fixed_count = 0
+            fix_timestamp = int(datetime.now().timestamp())
             
             for conflict_group in conflicts:
                 products = conflict_group["products"]
                 
-                # Verificar si realmente son productos diferentes
-                for i, product1 in enumerate(products):
-                    for j, product2 in enumerate(products[i+1:], i+1):
-                        
-                        if not self._is_same_product_v2(product1, product2):
-                            # Son productos diferentes con mismo ID - corregir
-                            new_id = self._generate_product_id_v2(product2) + f"_fix_{int(datetime.now().timestamp())}"
-                            
-                            self.products_collection.update_one(
-                                {"_id": product2["_id"]},
-                                {"$set": {"unique_id": new_id}}
-                            )
-                            
-                            print(f"✅ ID corregido: {product2.get('name')} -> {new_id}")
-                            fixed_count += 1
+                # Agrupar productos realmente iguales (sólo se comparan candidatos del mismo bloque)
+                clusters = self.conflict_matcher.cluster(products, self._is_same_product_v2)
+                
+                # El grupo del primer producto conserva el ID; cada grupo restante recibe uno nuevo
+                for cluster_number, cluster in enumerate(clusters[1:], 1):
+                    first_product = products[cluster[0]]
+                    new_id = self._generate_product_id_v2(first_product) + f"_fix_{fix_timestamp}_{cluster_number}"
+                    
+                    self.products_collection.update_many(
+                        {"_id": {"$in": [products[index]["_id"] for index in cluster]}},
+                        {"$set": {"unique_id": new_id}}
+                    )
+                    
+                    print(f"✅ ID corregido: {first_product.get('name')} (+{len(cluster) - 1}) -> {new_id}")
+                    fixed_count += len(cluster)
+            
+            if fixed_count:
+                identity_cache.clear()
+                search_index.reset()
+                query_cache.bump_all()
             
             print(f"✅ Corrección completada: {fixed_count} productos re-indexados")
             
@@ -942,6 +1232,54 @@ class Product:
             print(f"❌ Error en corrección: {e}")
             return 0
 
+    def find_duplicate_product_groups(self, supermarket=None, min_size=2):
+        """
+        Busca en todo el catálogo productos iguales (según v3) guardados con distinto unique_id
+        
+        Args:
+            supermarket (str): Limitar a un supermercado
+            min_size (int): Tamaño mínimo de grupo a reportar
+            
+        Returns:
+            list: Grupos [{unique_id, name, price, supermarket_key}]
+        """
+        try:
+            query = {"supermarket_key": supermarket} if supermarket else {}
+            products = list(self.products_collection.find(
+                query, {"_id": 0, "unique_id": 1, "name": 1, "price": 1, "supermarket_key": 1}
+            ))
+            
+            clusters = self.duplicate_matcher.cluster(products, self._is_same_product_v3)
+            groups = [
+                [products[index] for index in cluster]
+                for cluster in clusters if len(cluster) >= min_size
+            ]
+            
+            stats = self.duplicate_matcher.get_stats()
+            print(f"🔎 {len(groups)} grupos de duplicados en {len(products)} productos "
+                  f"({stats['comparisons']} comparaciones acumuladas)")
+            
+            return groups
+            
+        except Exception as e:
+            print(f"❌ Error buscando duplicados: {e}")
+            return []
+
+    def _matching_features_v2(self, product):
+        """Tamaño (sólo dígitos) y marca, tal como los compara _is_same_product_v2"""
+        features = self._extract_product_features(product.get("name", "").lower())
+        size = features.get("size")
+        return (re.sub(r'[^\d.]', '', size) if size else None, features.get("brand"))
+
+    def _matching_tokens_v2(self, product):
+        """Palabras que compara _is_same_product_v2"""
+        return self._clean_product_name(product.get("name", "").lower()).split()
+
+    def _matching_tokens_v3(self, product):
+        """Palabras que compara _is_same_product_v3 (sin números)"""
+        clean_name = self._clean_product_name_enhanced(product.get("name", "").lower())
+        return re.sub(r'\d+', '', clean_name).split()
+
     # === MANTENER MÉTODOS EXISTENTES ===
     def get_price_comparison(self, product_name, days_back=7):
         """
@@ -1042,6 +1380,26 @@ class Product:
         Obtiene el historial de precios de un producto específico
         """
         try:
+            # Resúmenes diarios del grupo canónico del producto (sin recorrer products)
+            canonical_id = canonical_index.canonical_id(product_name)
+            if canonical_id:
+                daily_rows = price_rollup_model.get_canonical_daily(canonical_id, supermarket_key, days_back)
+                if daily_rows:
+                    history_data = [
+                        {
+                            "date": row["date"],
+                            "supermarket_key": row["supermarket_key"],
+                            "supermarket_name": row["supermarket"],
+                            "product_name": row["product_name"],
+                            "price": row["avg"],
+                            "count": row["count"]
+                        }
+                        for row in daily_rows
+                    ]
+                    print(f"Historial encontrado para '{product_name}': {len(history_data)} registros (resumen diario)")
+                    return history_data
+            
+            # Sin resumen: agrupar en la consulta como antes
             date_limit = datetime.now() - timedelta(days=days_back)
             
             match_query = {
@@ -1119,29 +1477,18 @@ class Product:
             if not history_data:
                 return {"labels": [], "prices": [], "dates": []}
             
-            grouped_by_date = {}
-            for record in history_data:
-                date = record["date"]
-                if date not in grouped_by_date:
-                    grouped_by_date[date] = []
-                grouped_by_date[date].append(record["price"])
-            
-            dates = sorted(grouped_by_date.keys())
-            prices = []
-            labels = []
-            
-            for date in dates:
-                daily_prices = grouped_by_date[date]
-                avg_price = sum(daily_prices) / len(daily_prices)
-                prices.append(round(avg_price, 2))
-                
-                date_obj = datetime.strptime(date, "%Y-%m-%d")
-                labels.append(date_obj.strftime("%d %b"))
+            # Promedio diario entre supermercados (vectorizado)
+            trend = daily_trend(PriceSeries.from_records(history_data, time_field="date"))
+            
+            labels = [datetime.strptime(date, "%Y-%m-%d").strftime("%d %b") for date in trend["dates"]]
             
             return {
                 "labels": labels,
-                "prices": prices,
-                "dates": dates,
+                "prices": trend["prices"],
+                "dates": trend["dates"],
+                "moving_average": trend["moving_average"],
+                "change_percentage": trend["change_percentage"],
+                "volatility": trend["volatility"],
                 "data_points": len(history_data)
             }
             
@@ -1151,37 +1498,100 @@ class Product:
 
     def get_all_products(self, page=1, limit=50, sort_by="scraped_at", supermarket=None):
         """
-        Obtiene todos los productos guardados con paginación
+        Obtiene todos los productos guardados con paginación por número de página (skip)
+        Para recorrer el catálogo a costo constante por página, usar get_products_page con cursor
         """
         try:
-            filter_query = {}
-            if supermarket:
-                filter_query["supermarket_key"] = supermarket
-            
-            sort_options = {
-                "price": [("price", 1)],
-                "price_desc": [("price", -1)],
-                "name": [("name", 1)],
-                "scraped_at": [("scraped_at", -1)],
-                "updated_at": [("updated_at", -1)]
-            }
-            
-            sort_order = sort_options.get(sort_by, [("scraped_at", -1)])
-            skip = (page - 1) * limit
-            
-            products = list(self.products_collection.find(
-                filter_query
-            ).sort(sort_order).skip(skip).limit(limit))
-            
-            for product in products:
-                product["_id"] = str(product["_id"])
-            
-            return products
+            return self.get_products_page(None, limit, sort_by, supermarket, skip=(page - 1) * limit)["products"]
             
         except Exception as e:
             print(f"Error obteniendo todos los productos: {e}")
             return []
 
+    def get_products_page(self, cursor=None, limit=50, sort_by="scraped_at", supermarket=None, skip=0):
+        """
+        Página de productos por cursor (keyset): filtra por (campo de orden, _id) a partir del
+        último producto de la página anterior, así cada página usa el índice desde esa posición
+        
+        Args:
+            cursor (str): Cursor devuelto por la página anterior (None = primera página)
+        
+        Returns:
+            dict: {products, next_cursor (None si no hay más)}
+        
+        Raises:
+            ValueError: Si el cursor no es válido para este ordenamiento
+        """
+        field, direction = PAGE_SORT_OPTIONS.get(sort_by, PAGE_SORT_OPTIONS["scraped_at"])
+        
+        filter_query = {}
+        if supermarket:
+            filter_query["supermarket_key"] = supermarket
+        
+        if cursor:
+            value, last_id = self._decode_page_cursor(cursor, field, direction)
+            filter_query.update(self._keyset_filter(field, direction, value, last_id))
+        
+        query = self.products_collection.find(filter_query).sort([(field, direction), ("_id", direction)])
+        if skip:
+            query = query.skip(skip)
+        
+        # Uno de más para saber si hay página siguiente
+        products = list(query.limit(limit + 1))
+        
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            last_product = products[-1]
+            next_cursor = self._encode_page_cursor(field, direction, last_product.get(field), last_product["_id"])
+        
+        for product in products:
+            product["_id"] = str(product["_id"])
+        
+        return {"products": products, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _encode_page_cursor(field, direction, value, last_id):
+        """Cursor opaco: base64 de [campo, dirección, valor, _id]"""
+        raw = json.dumps([field, direction, value, str(last_id)], default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decode_page_cursor(cursor, field, direction):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            cursor_field, cursor_direction, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+            last_id = ObjectId(last_id)
+        except Exception:
+            raise ValueError("Cursor de paginación inválido")
+        
+        if cursor_field != field or cursor_direction != direction:
+            raise ValueError("El cursor corresponde a otro ordenamiento")
+        
+        return value, last_id
+
+    @staticmethod
+    def _keyset_filter(field, direction, value, last_id):
+        """
+        Productos después de (value, last_id) en el orden (campo, _id)
+        Los productos sin el campo (null) van primero en orden ascendente y últimos en descendente
+        """
+        after = "$gt" if direction == 1 else "$lt"
+        
+        if value is None:
+            same_value = {field: None, "_id": {after: last_id}}
+            if direction == 1:
+                return {"$or": [same_value, {field: {"$ne": None}}]}
+            return same_value
+        
+        conditions = [
+            {field: {after: value}},
+            {field: value, "_id": {after: last_id}}
+        ]
+        if direction == -1:
+            conditions.append({field: None})
+        return {"$or": conditions}
+
     def get_total_products_count(self, supermarket=None):
         """
         Obtiene el total de productos en la base de datos
@@ -1197,6 +1607,27 @@ class Product:
             print(f"Error contando productos: {e}")
             return 0
 
+    def estimate_products_count(self, supermarket=None):
+        """
+        Total aproximado para paginación: metadatos de la colección sin filtro, o un conteo
+        por supermercado guardado en memoria unos minutos (no un count_documents por página)
+        """
+        try:
+            if not supermarket:
+                return self.products_collection.estimated_document_count()
+            
+            cached = self._count_cache.get(supermarket)
+            if cached and time.time() - cached[1] < self.count_cache_ttl:
+                return cached[0]
+            
+            count = self.products_collection.count_documents({"supermarket_key": supermarket})
+            self._count_cache[supermarket] = (count, time.time())
+            return count
+            
+        except Exception as e:
+            print(f"Error estimando cantidad de productos: {e}")
+            return 0
+
     def get_last_database_update(self):
         """
         Obtiene la fecha de la última actualización de la base de datos
@@ -1290,6 +1721,11 @@ class Product:
                 "scraped_at": {"$lt": cutoff_date.isoformat()}
             })
             
+            if result.deleted_count:
+                identity_cache.clear()
+                search_index.reset()
+                query_cache.bump_all()
+            
             print(f"Limpieza: {result.deleted_count} productos antiguos eliminados")
             return result.deleted_count
             
@@ -1328,6 +1764,11 @@ class Product:
             })
             deleted_count += result.deleted_count
         
+        if deleted_count:
+            identity_cache.clear()
+            search_index.reset()
+            query_cache.bump_all()
+        
         print(f"Eliminados {deleted_count} productos duplicados")
         return deleted_count
 
@@ -1362,6 +1803,84 @@ class Product:
             print(f"❌ Error obteniendo producto por unique_id: {e}")
             return None
 
+    def warm_identity_cache(self, limit=None):
+        """
+        Carga en memoria unique_id -> precio/nombre/update_count de los productos
+        más recientes, para que el guardado masivo no tenga que leerlos
+        """
+        return identity_cache.warm(self.products_collection, limit)
+
+    def get_product_identity(self, unique_id):
+        """
+        Último precio conocido de un producto: primero la caché, luego MongoDB
+        
+        Returns:
+            dict | None: {price, name_hash, update_count}
+        """
+        if not unique_id:
+            return None
+        
+        cached = identity_cache.get(unique_id)
+        if cached:
+            return cached
+        
+        product = self.products_collection.find_one(
+            {"unique_id": unique_id},
+            {"_id": 0, "price": 1, "name": 1, "update_count": 1, "content_hash": 1}
+        )
+        if not product:
+            return None
+        
+        identity_cache.put(
+            unique_id, product.get("price", 0), product.get("name"),
+            product.get("update_count", 0), product.get("content_hash")
+        )
+        return identity_cache.get(unique_id)
+
+    def get_autocomplete_suggestions(self, query, limit=8, suggestion_type=None):
+        """
+        Sugerencias de nombres y marcas para lo escrito hasta ahora (índice de prefijos en memoria)
+        
+        Returns:
+            list: [{text, type, products, popularity}]
+        """
+        if not autocomplete_index.ensure_loaded(self.products_collection, self.search_history_collection):
+            return []
+        return autocomplete_index.suggest(query, limit, suggestion_type)
+
+    def refresh_autocomplete_index(self):
+        """
+        Reconstruye el autocompletado con los productos y la popularidad actuales
+        (si todavía no se usó, se construye en la primera consulta)
+        """
+        if autocomplete_index.loaded:
+            return autocomplete_index.load_from_collection(
+                self.products_collection, self.search_history_collection, force=True
+            )
+        return 0
+
+    def backfill_canonical_ids(self):
+        """
+        Asigna canonical_id a los productos guardados sin él (no hace nada si ya están todos)
+        """
+        updated = canonical_index.backfill(self.products_collection)
+        if updated:
+            query_cache.bump_all()
+        return updated
+
+    def find_products_by_canonical_name(self, product_name):
+        """
+        El mismo producto en todos los supermercados: una consulta por canonical_id (indexada)
+        
+        Returns:
+            list: Productos del grupo canónico del nombre (vacío si no hay grupo)
+        """
+        canonical_id = canonical_index.canonical_id(product_name)
+        if not canonical_id:
+            return []
+        
+        return list(self.products_collection.find({"canonical_id": canonical_id}))
+
     def save_single_product(self, product_data, search_term):
         """
         Guarda UN solo producto en la base de datos
@@ -1373,6 +1892,7 @@ class Product:
             # Preparar documento
             product_doc = {
                 **product_data,
+                "canonical_id": canonical_index.canonical_id(product_data.get("name")),
                 "search_term": search_term,
                 "scraped_at": datetime.now().isoformat(),
                 "created_at": datetime.now().isoformat(),
@@ -1381,6 +1901,10 @@ class Product:
             
             # Insertar producto
             result = self.products_collection.insert_one(product_doc)
+            identity_cache.invalidate([product_data["unique_id"]])
+            search_index.add_many([product_doc])
+            autocomplete_index.add_products([product_doc])
+            query_cache.bump_products([product_doc])
             
             if result.inserted_id:
                 print(f"✅ Producto guardado: {product_data.get('name')}")
@@ -1413,6 +1937,9 @@ class Product:
                 {"unique_id": unique_id},
                 {"$set": update_data}
             )
+            identity_cache.invalidate([unique_id])
+            search_index.update(unique_id, update_data)
+            query_cache.bump_all()
             
             if result.modified_count > 0:
                 print(f"✅ Producto actualizado: {product_data.get('name')}")
@@ -1483,18 +2010,27 @@ class Product:
             cutoff_date = datetime.now() - timedelta(days=days_old)
             
             # Eliminar productos que no se han visto en X días
+            # (los productos sin cambios sólo renuevan last_seen, no updated_at)
             result = self.products_collection.delete_many({
                 "$or": [
-                    {"updated_at": {"$lt": cutoff_date.isoformat()}},
                     {"last_seen": {"$lt": cutoff_date.isoformat()}},
-                    # Productos sin updated_at (muy antiguos)
-                    {"updated_at": {"$exists": False}}
+                    # Productos guardados antes de existir last_seen
+                    {
+                        "last_seen": {"$exists": False},
+                        "$or": [
+                            {"updated_at": {"$lt": cutoff_date.isoformat()}},
+                            {"updated_at": {"$exists": False}}
+                        ]
+                    }
                 ]
             })
             
             deleted_count = result.deleted_count
             
             if deleted_count > 0:
+                identity_cache.clear()
+                search_index.reset()
+                query_cache.bump_all()
                 print(f"🧹 Limpieza: {deleted_count} productos antiguos eliminados")
             
             return deleted_count
@@ -1536,34 +2072,22 @@ class Product:
             if not product_unique_id or old_price <= 0 or new_price <= 0:
                 return None
             
-            # Calcular cambio
-            price_difference = round(new_price - old_price, 2)
+            # Calcular cambio (sólo para el log: el historial guarda precio nuevo y anterior)
             percentage_change = round(((new_price - old_price) / old_price) * 100, 1)
             
-            # Crear documento de historial
-            history_entry = {
-                "product_unique_id": product_unique_id,
-                "product_name": product_data.get("name") if product_data else "Producto desconocido",
-                "old_price": old_price,
-                "new_price": new_price,
-                "price_difference": price_difference,
-                "percentage_change": percentage_change,
-                "supermarket": product_data.get("supermarket") if product_data else None,
-                "supermarket_key": product_data.get("supermarket_key") if product_data else None,
-                "timestamp": datetime.now().isoformat(),
-                "source": "automatic_update",
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Insertar en colección de historial
-            result = self.price_history_collection.insert_one(history_entry)
+            # Crear documento de historial (esquema compacto)
+            history_entry = price_history_model.build_change(
+                product_unique_id, old_price, new_price,
+                supermarket_key=product_data.get("supermarket_key") if product_data else None,
+                source="automatic_update"
+            )
             
-            if result.inserted_id:
-                print(f"📊 Historial de precio creado: {product_data.get('name') if product_data else product_unique_id}")
-                print(f"   Cambio: S/{old_price:.2f} → S/{new_price:.2f} ({percentage_change:+.1f}%)")
-                return result.inserted_id
+            # Encolar en el escritor por lotes (el _id se asigna al encolar)
+            inserted_id = history_writer.add(history_entry)
             
-            return None
+            print(f"📊 Historial de precio creado: {product_data.get('name') if product_data else product_unique_id}")
+            print(f"   Cambio: S/{old_price:.2f} → S/{new_price:.2f} ({percentage_change:+.1f}%)")
+            return inserted_id
             
         except Exception as e:
             print(f"❌ Error creando entrada de historial: {e}")
@@ -1578,30 +2102,10 @@ class Product:
             
             cutoff_date = datetime.now() - timedelta(days=days_back)
             
-            # Contar cambios por tipo
-            pipeline = [
-                {"$match": {"timestamp": {"$gte": cutoff_date.isoformat()}}},
-                {
-                    "$group": {
-                        "_id": None,
-                        "total_changes": {"$sum": 1},
-                        "price_increases": {
-                            "$sum": {"$cond": [{"$gt": ["$price_difference", 0]}, 1, 0]}
-                        },
-                        "price_decreases": {
-                            "$sum": {"$cond": [{"$lt": ["$price_difference", 0]}, 1, 0]}
-                        },
-                        "avg_percentage_change": {"$avg": "$percentage_change"},
-                        "max_increase": {"$max": "$percentage_change"},
-                        "max_decrease": {"$min": "$percentage_change"}
-                    }
-                }
-            ]
-            
-            result = list(self.price_history_collection.aggregate(pipeline))
+            # Contar cambios por tipo (rango sobre fechas BSON)
+            summary = price_history_model.get_changes_summary(cutoff_date)
             
-            if result:
-                summary = result[0]
+            if summary:
                 return {
                     "period_days": days_back,
                     "total_changes": summary.get("total_changes", 0),
@@ -1,6 +1,9 @@
 # dashboard_routes.py - VERSIÓN COMPLETA CORREGIDA
 from flask import Blueprint, request, jsonify
 from models.product_model import product_model
+from models.price_history_model import price_history_model
+from models.price_rollup_model import price_rollup_model
+from utils.price_series import PriceSeries, daily_trend, daily_trend_from_rollups
 from datetime import datetime, timedelta
 import re
 
@@ -35,9 +38,7 @@ def get_dashboard_stats():
         # Estadísticas de historial de precios (últimos 7 días)
         date_limit = datetime.now() - timedelta(days=7)
         
-        price_changes_count = product_model.price_history_collection.count_documents({
-            "timestamp": {"$gte": date_limit.isoformat()}
-        })
+        price_changes_count = price_history_model.count_since(date_limit)
         
         # Búsquedas recientes
         recent_searches = product_model.search_history_collection.count_documents({
@@ -134,13 +135,10 @@ def get_product_history_unified():
             current_product = similar_products[0]
             target_unique_id = current_product["unique_id"]
         
-        # CONSULTA PRINCIPAL: Buscar en price_history
+        # CONSULTA PRINCIPAL: Buscar en el historial de precios (time-series)
         print(f"📊 Consultando historial para unique_id: {target_unique_id}")
         
-        price_history = list(db.price_history.find({
-            "product_unique_id": target_unique_id,
-            "timestamp": {"$gte": date_limit.isoformat()}
-        }).sort([("timestamp", 1)]))
+        price_history = price_history_model.get_entries(target_unique_id, since=date_limit)
         
         processed_history = []
         
@@ -158,7 +156,7 @@ def get_product_history_unified():
                     "images": current_product.get("images", []),
                     "url": current_product.get("url"),
                     "source": "price_history",
-                    "date": entry.get("timestamp", "").split("T")[0] if entry.get("timestamp") else ""
+                    "date": entry.get("date", "")
                 }
                 processed_history.append(processed_entry)
         
@@ -283,14 +281,13 @@ def get_product_complete_info():
         target_unique_id = product["unique_id"]
         
         # Obtener historial COMPLETO de precios
-        price_history = list(db.price_history.find({
-            "product_unique_id": target_unique_id
-        }).sort([("timestamp", -1)]).limit(100))  # Últimas 100 entradas
+        price_history = price_history_model.get_entries(
+            target_unique_id, limit=100, newest_first=True
+        )  # Últimas 100 entradas
         
         # Formatear historial
         formatted_history = []
         for entry in price_history:
-            entry["_id"] = str(entry["_id"])
             # Formatear fecha para mostrar
             if entry.get("timestamp"):
                 try:
@@ -302,18 +299,20 @@ def get_product_complete_info():
                     entry["date_only"] = ""
             formatted_history.append(entry)
         
-        # Calcular estadísticas del historial
-        prices = [h.get("price", 0) for h in formatted_history if h.get("price", 0) > 0]
+        # Calcular estadísticas del historial (vectorizado)
+        series_stats = PriceSeries.from_records(formatted_history).summary()
         
         history_stats = {
             "total_records": len(formatted_history),
             "price_range": {
-                "min": min(prices) if prices else 0,
-                "max": max(prices) if prices else 0,
+                "min": series_stats["min"],
+                "max": series_stats["max"],
                 "current": product.get("price", 0)
             },
-            "average_price": round(sum(prices) / len(prices), 2) if prices else 0,
-            "has_price_changes": len(set(prices)) > 1 if prices else False
+            "average_price": series_stats["average"],
+            "has_price_changes": series_stats["has_price_changes"],
+            "change_percentage": series_stats["change_percentage"],
+            "volatility": series_stats["volatility"]
         }
         
         return jsonify({
@@ -338,41 +337,30 @@ def get_price_trends(unique_id):
     """
     try:
         days_back = int(request.args.get('days_back', 30))
-        from services.db import db
+        days_back = min(days_back, 90)  # Los resúmenes diarios cubren 90 días
         
         date_limit = datetime.now() - timedelta(days=days_back)
         
-        # Buscar historial de precios
-        price_history = list(db.price_history.find({
-            "product_unique_id": unique_id,
-            "timestamp": {"$gte": date_limit.isoformat()}
-        }).sort([("timestamp", 1)]))
+        # Resúmenes diarios precalculados (máximo 90 filas)
+        daily_rows = price_rollup_model.get_product_daily(unique_id, days_back=days_back)
+        
+        if daily_rows:
+            trend = daily_trend_from_rollups(daily_rows)
+        else:
+            # Sin resumen todavía (antes de la primera actualización programada): agrupar el historial
+            trend = daily_trend(PriceSeries.from_records(
+                price_history_model.get_entries(unique_id, since=date_limit)
+            ))
         
-        if not price_history:
+        if not trend["dates"]:
             return jsonify({
                 "success": False,
                 "message": "No hay datos de historial para este producto",
                 "trends": []
             })
         
-        # Agrupar por día para crear tendencia
-        daily_prices = {}
-        for entry in price_history:
-            timestamp = entry.get("timestamp", "")
-            if timestamp:
-                date_key = timestamp.split("T")[0]  # Solo la fecha
-                price = entry.get("price", 0)
-                
-                if date_key not in daily_prices:
-                    daily_prices[date_key] = []
-                daily_prices[date_key].append(price)
-        
-        # Calcular promedio diario
         trends = []
-        for date_str in sorted(daily_prices.keys()):
-            prices_list = daily_prices[date_str]
-            avg_price = sum(prices_list) / len(prices_list)
-            
+        for index, date_str in enumerate(trend["dates"]):
             try:
                 date_obj = datetime.strptime(date_str, "%Y-%m-%d")
                 formatted_date = date_obj.strftime("%d %b")
@@ -382,14 +370,20 @@ def get_price_trends(unique_id):
             trends.append({
                 "date": date_str,
                 "formatted_date": formatted_date,
-                "price": round(avg_price, 2),
-                "data_points": len(prices_list)
+                "price": trend["prices"][index],
+                "min_price": trend["min_prices"][index],
+                "max_price": trend["max_prices"][index],
+                "last_price": trend["last_prices"][index],
+                "moving_average": trend["moving_average"][index],
+                "data_points": trend["counts"][index]
             })
         
         return jsonify({
             "success": True,
             "trends": trends,
             "total_days": len(trends),
+            "change_percentage": trend["change_percentage"],
+            "volatility": trend["volatility"],
             "date_range": {
                 "from": date_limit.date().isoformat(),
                 "to": datetime.now().date().isoformat()
@@ -416,17 +410,21 @@ def get_recent_price_changes():
         from services.db import db
         date_limit = datetime.now() - timedelta(days=days_back)
         
-        # Consultar historial de precios reciente
-        recent_changes = list(db.price_history.find({
-            "timestamp": {"$gte": date_limit.isoformat()},
-            "old_price": {"$exists": True},
-            "new_price": {"$exists": True}
-        }).sort([("timestamp", -1)]).limit(limit))
+        # Consultar historial de precios reciente (sólo cambios, no observaciones)
+        recent_changes = price_history_model.get_recent_changes(date_limit, limit)
+        
+        # Datos actuales de todos los productos en una sola consulta
+        products_by_id = {
+            product["unique_id"]: product
+            for product in db.products.find({
+                "unique_id": {"$in": list({change["product_unique_id"] for change in recent_changes})}
+            })
+        }
         
         formatted_changes = []
         for change in recent_changes:
             # Obtener datos del producto actual
-            product = db.products.find_one({"unique_id": change.get("product_unique_id")})
+            product = products_by_id.get(change.get("product_unique_id"))
             
             if product:
                 formatted_change = {
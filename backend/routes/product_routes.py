@@ -33,14 +33,18 @@ def handle_route_errors(f):
 def get_all_products():
     """
     GET /api/products/all?page=1&limit=50&sort_by=scraped_at&supermarket=plazavea
+    GET /api/products/all?cursor=&limit=50&sort_by=scraped_at
     
     Obtiene todos los productos guardados en la base de datos con paginación
     
     Query Parameters:
-    - page (opcional): Página actual (por defecto 1)
+    - cursor (opcional): Paginación por cursor; vacío para la primera página y luego
+      el next_cursor de la respuesta anterior (cada página cuesta lo mismo)
+    - page (opcional): Página actual (por defecto 1; se ignora si hay cursor)
     - limit (opcional): Productos por página (por defecto 50, máximo 100)
     - sort_by (opcional): price, price_desc, name, scraped_at, updated_at (por defecto scraped_at)
     - supermarket (opcional): Filtrar por supermercado específico
+    - include_total (opcional, con cursor): Incluir el total aproximado de productos (por defecto false)
     
     Respuesta:
     {
@@ -50,11 +54,23 @@ def get_all_products():
             "current_page": 1,
             "total_pages": 10,
             "total_products": 500,
+            "total_is_estimate": true,
             "products_per_page": 50,
             "has_next": true,
             "has_prev": false
         }
     }
+    
+    Con cursor:
+    {
+        "success": true,
+        "products": [...],
+        "pagination": {
+            "products_per_page": 50,
+            "next_cursor": "WyJzY3JhcGVkX2F0Iiw...",
+            "has_next": true
+        }
+    }
     """
     return product_controller.get_all_saved_products()
 
@@ -119,13 +135,18 @@ def search_saved_products():
     """
     GET /api/products/search/saved?query=arroz&supermarket=plazavea&limit=50&sort_by=price
     
-    Busca productos guardados en la base de datos
+    Busca productos guardados en la base de datos: nombres que contienen el término o,
+    con PRODUCT_SEARCH_BACKEND=local, productos con todas las palabras de la consulta en
+    nombre, marca o categorías (índice en memoria de cada proceso; con varios workers
+    los guardados de otro worker aparecen al recargarse, PRODUCT_SEARCH_INDEX_MAX_AGE)
     
     Query Parameters:
     - query (requerido): Término de búsqueda
     - supermarket (opcional): Filtrar por supermercado
     - limit (opcional): Límite de resultados (por defecto 50)
     - sort_by (opcional): price, price_desc, name, scraped_at (por defecto price)
+    - stream (opcional): ndjson (un producto por línea) o json (misma respuesta, enviada por partes);
+      también con el header Accept: application/x-ndjson
     
     Respuesta:
     {
@@ -133,9 +154,38 @@ def search_saved_products():
         "products_count": 25,
         "products": [...]
     }
+    
+    Con stream=ndjson:
+    {"_id": "...", "name": "Arroz Costeño 5kg", ...}
+    {"_id": "...", "name": "Arroz Paisana 5kg", ...}
+    {"success": true, "query": "arroz", "products_count": 2}
     """
     return product_controller.search_saved_products()
 
+@product_routes.route('/autocomplete', methods=['GET'])
+@optional_auth
+@handle_route_errors
+def autocomplete_products():
+    """
+    GET /api/products/autocomplete?query=lec&limit=8&type=product
+    
+    Sugerencias de nombres y marcas mientras el usuario escribe
+    (índice de prefijos en memoria, ordenado por popularidad en search_history)
+    
+    Query Parameters:
+    - query (requerido): Texto escrito hasta ahora (la última palabra puede estar incompleta)
+    - limit (opcional): Sugerencias a devolver (por defecto 8, máximo 20)
+    - type (opcional): product o brand (por defecto ambos)
+    
+    Respuesta:
+    {
+        "success": true,
+        "suggestions": [{"text": "Leche Evaporada Gloria 400g", "type": "product", "products": 3, "popularity": 120}],
+        "count": 1
+    }
+    """
+    return product_controller.autocomplete()
+
 @product_routes.route('/compare', methods=['GET'])
 @optional_auth
 @handle_route_errors
@@ -425,6 +475,9 @@ def health_check():
         
         # Verificar APIs de supermercados (simple ping)
         supermarkets_status = {}
+        connection_stats = {}
+        rate_limit_stats = {}
+        cache_stats = {}
         try:
             from services.api_scraper import supermarket_api
             for key, info in supermarket_api.SUPERMERCADOS_API.items():
@@ -432,9 +485,38 @@ def health_check():
                     "name": info["name"],
                     "active": info["active"]
                 }
+            connection_stats = supermarket_api.get_connection_stats()
+            rate_limit_stats = supermarket_api.get_rate_limit_stats()
+            cache_stats = supermarket_api.get_cache_stats()
         except Exception as e:
             supermarkets_status = {"error": "No se pudo verificar APIs"}
         
+        # Escritor por lotes del historial de precios
+        try:
+            from services.history_writer import history_writer
+            history_writer_stats = history_writer.get_stats()
+        except Exception as e:
+            history_writer_stats = {"error": str(e)}
+        
+        # Índice de búsqueda local
+        try:
+            from services.search_index import search_index, SEARCH_BACKEND
+            search_index_stats = {"backend": SEARCH_BACKEND, **search_index.get_stats()}
+        except Exception as e:
+            search_index_stats = {"error": str(e)}
+        
+        try:
+            from services.autocomplete_index import autocomplete_index
+            autocomplete_stats = autocomplete_index.get_stats()
+        except Exception as e:
+            autocomplete_stats = {"error": str(e)}
+        
+        try:
+            from services.query_cache import query_cache
+            query_cache_stats = query_cache.get_stats()
+        except Exception as e:
+            query_cache_stats = {"error": str(e)}
+        
         # Verificar scheduler
         try:
             from services.scheduler import database_scheduler
@@ -451,6 +533,13 @@ def health_check():
                 "total_products": product_count
             },
             "supermarkets": supermarkets_status,
+            "http_connections": connection_stats,
+            "rate_limits": rate_limit_stats,
+            "response_cache": cache_stats,
+            "price_history_writer": history_writer_stats,
+            "search_index": search_index_stats,
+            "autocomplete_index": autocomplete_stats,
+            "query_cache": query_cache_stats,
             "scheduler": {
                 "active": scheduler_status
             },
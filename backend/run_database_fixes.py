@@ -11,6 +11,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.db import db
 from models.product_model import product_model
 from models.alert_model import alert_model
+from models.price_history_model import price_history_model
 from datetime import datetime
 
 def main():
@@ -47,12 +48,19 @@ def main():
         duplicates_removed = product_model.clean_duplicate_products()
         print(f"   🗑️ Duplicados eliminados: {duplicates_removed}")
         
-        # 4. Estadísticas finales
+        # 4. Reportar productos iguales que quedaron con distinto unique_id (no se modifican)
+        print("\n4️⃣ Buscando productos iguales con distinto ID...")
+        duplicate_groups = product_model.find_duplicate_product_groups()
+        print(f"   🔎 Grupos para revisar: {len(duplicate_groups)}")
+        for group in duplicate_groups[:10]:
+            print(f"      - {group[0].get('name')} ({group[0].get('supermarket_key')}): {len(group)} productos")
+        
+        # 5. Estadísticas finales
         print("\n" + "=" * 60)
         print("📊 ESTADO FINAL DE LA BASE DE DATOS:")
         total_products = db['products'].count_documents({})
         total_alerts = db['alerts'].count_documents({"active": True})
-        total_history = db['price_history'].count_documents({})
+        total_history = price_history_model.count()
         
         print(f"   - Productos activos: {total_products}")
         print(f"   - Alertas activas: {total_alerts}")
@@ -0,0 +1,127 @@
+# run_price_history_migration.py
+"""
+MIGRACIÓN DEL HISTORIAL DE PRECIOS A TIME-SERIES
+Copia la colección price_history (fechas como texto, dos formas de documento) a
+price_history_ts (fechas BSON, esquema compacto, product_unique_id como metaField)
+
+Se puede interrumpir y volver a ejecutar: el avance (último _id copiado) queda
+guardado en la colección migrations
+
+Ejemplos:
+    python run_price_history_migration.py --dry-run
+    python run_price_history_migration.py --batch-size 5000
+    python run_price_history_migration.py --drop-legacy
+"""
+
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.db import db
+from models.price_history_model import price_history_model, PriceHistory, LEGACY_COLLECTION
+from datetime import datetime
+
+MIGRATION_ID = "price_history_ts"
+
+
+def get_checkpoint():
+    state = db['migrations'].find_one({"_id": MIGRATION_ID})
+    return state.get("last_id") if state else None
+
+
+def save_checkpoint(last_id, migrated, skipped):
+    db['migrations'].update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {"last_id": last_id, "updated_at": datetime.now().isoformat()},
+            "$inc": {"migrated": migrated, "skipped": skipped}
+        },
+        upsert=True
+    )
+
+
+def migrate(batch_size, dry_run=False):
+    """
+    Copia por lotes ordenados por _id
+
+    Returns:
+        tuple: (migrados, omitidos)
+    """
+    legacy = db[LEGACY_COLLECTION]
+    last_id = None if dry_run else get_checkpoint()
+
+    query = {"_id": {"$gt": last_id}} if last_id else {}
+    total = legacy.count_documents(query)
+    print(f"📦 {total} entradas por migrar" + (f" (retomando después de {last_id})" if last_id else ""))
+
+    migrated = 0
+    skipped = 0
+    start_time = time.perf_counter()
+
+    while True:
+        batch = list(legacy.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        docs = []
+        for doc in batch:
+            compact = PriceHistory.from_legacy(doc)
+            if compact:
+                docs.append(compact)
+            else:
+                skipped += 1
+
+        if docs and not dry_run:
+            price_history_model.collection.insert_many(docs, ordered=False)
+
+        migrated += len(docs)
+        last_id = batch[-1]["_id"]
+        query = {"_id": {"$gt": last_id}}
+
+        if not dry_run:
+            save_checkpoint(last_id, len(docs), len(batch) - len(docs))
+
+        elapsed = time.perf_counter() - start_time
+        print(f"   ✅ {migrated + skipped}/{total} ({migrated / max(elapsed, 1e-9):,.0f} entradas/s)")
+
+    return migrated, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra price_history a una colección time-series")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Entradas por lote")
+    parser.add_argument("--dry-run", action="store_true", help="Sólo convertir y contar, sin escribir")
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help="Eliminar price_history al terminar (pide confirmación)")
+    args = parser.parse_args()
+
+    print("🕒 MIGRACIÓN DE HISTORIAL DE PRECIOS A TIME-SERIES")
+    print("=" * 60)
+
+    try:
+        migrated, skipped = migrate(args.batch_size, dry_run=args.dry_run)
+
+        print("\n" + "=" * 60)
+        print(f"📊 Migradas: {migrated} | Omitidas (sin producto o fecha): {skipped}")
+        if args.dry_run:
+            print("   (dry-run: no se escribió nada)")
+            return
+
+        print(f"   - Entradas en {price_history_model.collection.name}: {price_history_model.count()}")
+
+        if args.drop_legacy:
+            response = input(f"\n¿Eliminar la colección {LEGACY_COLLECTION}? (escribe 'SI' para continuar): ")
+            if response.upper() == 'SI':
+                db[LEGACY_COLLECTION].drop()
+                db['migrations'].delete_one({"_id": MIGRATION_ID})
+                print(f"🗑️ Colección {LEGACY_COLLECTION} eliminada")
+
+    except Exception as e:
+        print(f"\n❌ ERROR DURANTE LA MIGRACIÓN: {e}")
+        print("   Se puede volver a ejecutar: retoma desde el último lote guardado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# run_scraper_benchmark.py
+"""
+BENCHMARK DEL SCRAPER SIN CONEXIÓN
+Mide el procesamiento de productos VTEX (y opcionalmente el guardado) usando
+un catálogo sintético o respuestas grabadas, sin tocar los sitios reales
+
+Ejemplos:
+    python run_scraper_benchmark.py --products 100000
+    python run_scraper_benchmark.py --record fixtures/vtex --query leche
+    python run_scraper_benchmark.py --replay fixtures/vtex --query leche
+    python run_scraper_benchmark.py --products 10000 --save
+"""
+
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.api_scraper import SupermarketAPI
+from services.rate_limiter import AdaptiveRateLimiter
+from services import vtex_replay
+
+
+def prepare_offline_api(api):
+    """
+    Sin caché en disco ni pausas: sólo se mide el procesamiento
+    """
+    api.response_cache.enabled = False
+    api.rate_limiter = AdaptiveRateLimiter(default_rate=1e6, burst=1e6, max_rate=1e6)
+
+
+def benchmark_parse(api, products_count):
+    """
+    Mide _process_products directamente sobre productos sintéticos en memoria
+    """
+    print(f"\n1️⃣ Procesando {products_count} productos sintéticos en memoria...")
+
+    raw_products = list(vtex_replay.generate_vtex_products(products_count))
+
+    start_time = time.perf_counter()
+    processed = api._process_products(raw_products, "plazavea", "Plaza Vea")
+    elapsed = time.perf_counter() - start_time
+
+    print(f"   ✅ {len(processed)} productos válidos en {elapsed:.2f}s "
+          f"({products_count / max(elapsed, 1e-9):,.0f} productos/s)")
+    return processed
+
+
+def benchmark_stream(api, query, max_products, page_size, save=False):
+    """
+    Mide el flujo completo: paginación + parseo JSON + procesamiento (+ guardado)
+    """
+    print(f"\n2️⃣ Recorriendo páginas de '{query}' (máx {max_products} por supermercado)...")
+
+    product_model = None
+    if save:
+        # Import tardío: requiere conexión a MongoDB
+        from models.product_model import product_model
+
+    total_products = 0
+    total_pages = 0
+
+    def pages():
+        nonlocal total_products, total_pages
+        for page in api.stream_products(query, max_products=max_products, page_size=page_size):
+            for result in page.values():
+                total_pages += 1
+                total_products += result.get("products_count", 0)
+            yield page
+
+    start_time = time.perf_counter()
+
+    if product_model:
+        product_model.save_products(pages(), query)
+    else:
+        for _ in pages():
+            pass
+
+    elapsed = time.perf_counter() - start_time
+
+    print(f"   ✅ {total_products} productos en {total_pages} páginas, {elapsed:.2f}s "
+          f"({total_products / max(elapsed, 1e-9):,.0f} productos/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper sin conexión")
+    parser.add_argument("--products", type=int, default=10000, help="Tamaño del catálogo sintético")
+    parser.add_argument("--page-size", type=int, default=50, help="Productos por ventana VTEX")
+    parser.add_argument("--query", default="leche", help="Término de búsqueda")
+    parser.add_argument("--record", metavar="DIR", help="Grabar respuestas reales en DIR")
+    parser.add_argument("--replay", metavar="DIR", help="Reproducir respuestas grabadas en DIR")
+    parser.add_argument("--save", action="store_true", help="Guardar también en MongoDB")
+    args = parser.parse_args()
+
+    print("⏱️ BENCHMARK DEL SCRAPER")
+    print("=" * 60)
+
+    api = SupermarketAPI()
+
+    try:
+        if args.record:
+            # Grabación: usa los sitios reales con su rate limit normal
+            api.response_cache.enabled = False
+            recorder = vtex_replay.install_recorder(api, args.record)
+            benchmark_stream(api, args.query, args.products, args.page_size)
+            print(f"\n💾 Respuestas grabadas: {recorder.recorded} en {args.record}")
+            return
+
+        prepare_offline_api(api)
+
+        if args.replay:
+            replay = vtex_replay.install_replay(api, args.replay, empty_when_missing=True)
+            benchmark_stream(api, args.query, args.products, args.page_size, save=args.save)
+            print(f"\n📼 Fixtures usados: {replay.hits} | faltantes: {replay.misses}")
+            return
+
+        benchmark_parse(api, args.products)
+
+        synthetic = vtex_replay.install_synthetic(api, total_products=args.products)
+        benchmark_stream(api, args.query, args.products, args.page_size, save=args.save)
+        print(f"\n🧪 Ventanas sintéticas servidas: {synthetic.requests_served}")
+
+    finally:
+        api.close()
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+import os
 import re
+from services.http_pool import HostSessionPool
+from services.rate_limiter import rate_limiter
+from services.response_cache import DiskResponseCache
+from services.vtex_json import vtex_json
+
+# Patrón precompilado para quitar etiquetas HTML de los nombres
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
 
 class SupermarketAPI:
     #Clase para conectarse a las APIs de supermrcados peruanos
@@ -42,8 +50,50 @@ class SupermarketAPI:
             "Connection": "keep-alive"
         }
 
-        #Tiempo de espera entre peticiones (para no ser bloqueados)
-        self.delay_between_requests = 2
+        #Limitador de peticiones por supermercado (token bucket adaptativo)
+        #Reemplaza las pausas fijas: cada tienda va a la velocidad que tolera
+        self.rate_limiter = rate_limiter
+
+        #Caché en disco de respuestas (TTL + LRU + revalidación con ETag/Last-Modified)
+        self.response_cache = DiskResponseCache(
+            cache_dir=os.getenv(
+                "SCRAPER_CACHE_DIR",
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "vtex")
+            ),
+            ttl_seconds=int(os.getenv("SCRAPER_CACHE_TTL", 900)),
+            max_bytes=int(os.getenv("SCRAPER_CACHE_MAX_MB", 200)) * 1024 * 1024,
+            enabled=os.getenv("SCRAPER_CACHE_ENABLED", "true").lower() == "true"
+        )
+
+        #Decodificador JSON rápido (msgspec con esquema > orjson > json)
+        self.json_decoder = vtex_json
+
+        #Paginación VTEX: máximo 50 productos por ventana y 2500 por búsqueda
+        self.VTEX_PAGE_SIZE = 50
+        self.VTEX_MAX_RESULTS = 2500
+
+        #URL base de la ficha de producto en cada sitio
+        self.PRODUCT_BASE_URLS = {
+            "plazavea": "https://www.plazavea.com.pe",
+            "wong": "https://www.wong.pe",
+            "vivanda": "https://www.vivanda.com.pe",
+            "metro": "https://www.metro.pe",
+            "tottus": "https://www.tottus.com.pe"
+        }
+
+        #Impresiones de depuración y contadores de rechazo al procesar productos
+        self.verbose_processing = os.getenv("SCRAPER_VERBOSE", "false").lower() == "true"
+
+        #Búsqueda concurrente: consulta todos los supermercados activos en paralelo
+        self.concurrent_search = True
+        self.max_workers = len(self.SUPERMERCADOS_API)
+
+        #Sesiones HTTP persistentes (keep-alive) por host, con reintentos
+        self.http_pool = HostSessionPool(
+            headers=self.headers,
+            pool_size=int(os.getenv("SCRAPER_POOL_SIZE", 10)),
+            max_retries=int(os.getenv("SCRAPER_MAX_RETRIES", 3))
+        )
     
     def search_products(self, query, supermarket=None, limit=100):
         """
@@ -62,18 +112,61 @@ class SupermarketAPI:
         if supermarket and supermarket in self.SUPERMERCADOS_API:
             # Buscar en un supermercado específico
             results[supermarket] = self._fetch_from_supermarket(supermarket, query, limit)
+            return results
+
+        active_markets = [
+            market_key for market_key, info in self.SUPERMERCADOS_API.items()
+            if info["active"]
+        ]
+
+        if self.concurrent_search and len(active_markets) > 1:
+            # Buscar en todos los supermercados en paralelo (fan-out)
+            print(f"🔍 Buscando en {len(active_markets)} supermercados en paralelo...")
+            workers = min(self.max_workers, len(active_markets))
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    market_key: executor.submit(self._fetch_from_supermarket, market_key, query, limit)
+                    for market_key in active_markets
+                }
+                # Mantener el orden original de los supermercados en la respuesta
+                for market_key in active_markets:
+                    results[market_key] = futures[market_key].result()
         else:
-            # Buscar en todos los supermercados
-            for market_key in self.SUPERMERCADOS_API:
-                if self.SUPERMERCADOS_API[market_key]["active"]:
-                    print(f"🔍 Buscando en {self.SUPERMERCADOS_API[market_key]['name']}...")
-                    results[market_key] = self._fetch_from_supermarket(market_key, query, limit)
-                    
-                    # Esperar entre peticiones para no ser bloqueados
-                    time.sleep(self.delay_between_requests)
+            # Buscar en todos los supermercados uno por uno
+            for market_key in active_markets:
+                print(f"🔍 Buscando en {self.SUPERMERCADOS_API[market_key]['name']}...")
+                results[market_key] = self._fetch_from_supermarket(market_key, query, limit)
         
         return results
     
+    def stream_products(self, query, supermarket=None, max_products=None, page_size=None):
+        """
+        Recorre el catálogo de forma paginada (ventanas VTEX _from/_to)
+        y entrega cada página procesada apenas llega
+        
+        Args:
+            query (str): Término de búsqueda
+            supermarket (str): Supermercado específico o None para todos
+            max_products (int): Máximo de productos por supermercado (None = catálogo completo)
+            page_size (int): Productos por página (máximo 50, límite de VTEX)
+            
+        Yields:
+            dict: {supermarket_key: página} con el mismo formato que search_products,
+                  listo para pasarlo a ProductModel.save_products
+        """
+        if supermarket and supermarket in self.SUPERMERCADOS_API:
+            markets = [supermarket]
+        else:
+            markets = [
+                market_key for market_key, info in self.SUPERMERCADOS_API.items()
+                if info["active"]
+            ]
+
+        for market_key in markets:
+            for page in self._iter_supermarket_pages(market_key, query, max_products, page_size):
+                yield {market_key: page}
+
     def _fetch_from_supermarket(self, supermarket_key, query, limit):
         """
         Obtiene productos de un supermercado específico
@@ -86,66 +179,165 @@ class SupermarketAPI:
         Returns:
             dict: Información de productos o error
         """
+        supermarket_info = self.SUPERMERCADOS_API[supermarket_key]
+        processed_products = []
+
+        # Juntar las páginas necesarias hasta llegar al límite
+        for page in self._iter_supermarket_pages(supermarket_key, query, max_products=limit):
+            if not page["success"]:
+                if not processed_products:
+                    return page  # Falló la primera página: devolver el error
+
+                print(f"⚠️ {supermarket_info['name']}: resultados parciales ({page['error']})")
+                break
+
+            processed_products.extend(page["products"])
+
+        return {
+            "success": True,
+            "supermarket": supermarket_info["name"],
+            "products_count": len(processed_products),
+            "products": processed_products,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def _iter_supermarket_pages(self, supermarket_key, query, max_products=None, page_size=None):
+        """
+        Generador de páginas de un supermercado usando ventanas _from/_to
+        
+        VTEX responde 206 (Partial Content) cuando hay más resultados que la ventana
+        pedida; el header "resources" trae el total (ej: "0-49/312")
+        
+        Yields:
+            dict: Página procesada o error (se detiene después de un error)
+        """
+        page_size = min(page_size or self.VTEX_PAGE_SIZE, self.VTEX_PAGE_SIZE)
+        start = 0
+        page_number = 1
+
+        while start < self.VTEX_MAX_RESULTS:
+            end = start + page_size - 1
+            if max_products:
+                end = min(end, max_products - 1)
+            end = min(end, self.VTEX_MAX_RESULTS - 1)
+
+            page = self._fetch_page(supermarket_key, query, start, end)
+            page["page"] = page_number
+            yield page
+
+            if not page["success"]:
+                return
+
+            # ¿Quedan más productos?
+            window_size = end - start + 1
+            total = page.get("total_available")
+            if total is not None:
+                has_more = total > end + 1
+            else:
+                has_more = page["status_code"] == 206 and page["raw_count"] == window_size
+
+            if not has_more or page["raw_count"] == 0:
+                return
+            if max_products and end + 1 >= max_products:
+                return
+
+            start = end + 1
+            page_number += 1
+
+    def _fetch_page(self, supermarket_key, query, start, end):
+        """
+        Obtiene y procesa UNA ventana de resultados [start, end]
+        
+        Returns:
+            dict: Página procesada o error
+        """
+        supermarket_info = self.SUPERMERCADOS_API[supermarket_key]
 
         try:
-            supermarket_info = self.SUPERMERCADOS_API[supermarket_key]
             url = supermarket_info["url"]
-            
-            # Usar URL simple sin parámetros de paginación para evitar error 206
-            response = requests.get(
-                url, 
-                params={
-                    'fq': f'productName:{query}',  # Filtro específico por nombre
-                    'rows': limit,
-                    'start': 0
-                },
-                headers=self.headers, 
-                timeout=10
-            )
-            
-            print(f"🔍 {supermarket_info['name']}: Status {response.status_code}")
+            cache_key = self.response_cache.make_key(supermarket_key, query, start, end)
+            cached = self.response_cache.get(cache_key)
 
-            if response.status_code in [200, 206]:
-                products_data = response.json()
+            if cached and cached["fresh"]:
+                # Respuesta reciente en caché: no tocar la red
+                print(f"⚡ {supermarket_info['name']} [{start}-{end}]: desde caché")
+                body = cached["body"]
+                status_code = cached["status_code"]
+                response_headers = cached["headers"]
+            else:
+                # Esperar turno en el limitador de ESTE supermercado (no bloquea a los demás)
+                self.rate_limiter.acquire(supermarket_key)
                 
-                # Limitar productos después de obtenerlos (evitar paginación API)
-                if len(products_data) > limit:
-                    products_data = products_data[:limit]
+                response = self.http_pool.get(
+                    url, 
+                    params={
+                        'fq': f'productName:{query}',  # Filtro específico por nombre
+                        '_from': start,
+                        '_to': end
+                    },
+                    headers=self.response_cache.conditional_headers(cached),
+                    timeout=10
+                )
                 
-                # Procesar y limpiar datos
+                print(f"🔍 {supermarket_info['name']} [{start}-{end}]: Status {response.status_code}")
+                self.rate_limiter.report(supermarket_key, response.status_code)
+
+                if response.status_code == 304 and cached:
+                    # El servidor confirma que la copia en caché sigue vigente
+                    self.response_cache.revalidated(cache_key)
+                    body = cached["body"]
+                    status_code = cached["status_code"]
+                    response_headers = cached["headers"]
+                elif response.status_code in [200, 206]:
+                    body = response.content
+                    status_code = response.status_code
+                    response_headers = response.headers
+                    self.response_cache.put(cache_key, body, status_code, dict(response.headers))
+                else:
+                    return {
+                        "success": False,
+                        "supermarket": supermarket_info["name"],
+                        "error": f"Error HTTP: {response.status_code}",
+                        "message": f"Respuesta del servidor: {response.text[:100]}..."
+                    }
+
+            products_data = self.json_decoder.decode_products(body)
+            
+            # Procesar y limpiar datos
+            processed_products = []
+            if products_data:
                 processed_products = self._process_products(
                     products_data, 
                     supermarket_key,
                     supermarket_info["name"]
                 )
-                
-                return {
-                    "success": True,
-                    "supermarket": supermarket_info["name"],
-                    "products_count": len(processed_products),
-                    "products": processed_products,
-                    "timestamp": datetime.now().isoformat()
-                }
-            else:
-                return {
-                    "success": False,
-                    "supermarket": supermarket_info["name"],
-                    "error": f"Error HTTP: {response.status_code}",
-                    "message": f"Respuesta del servidor: {response.text[:100]}..."
-                }
+            
+            return {
+                "success": True,
+                "supermarket": supermarket_info["name"],
+                "products_count": len(processed_products),
+                "products": processed_products,
+                "status_code": status_code,
+                "raw_count": len(products_data),
+                "range": f"{start}-{end}",
+                "total_available": self._parse_total_resources(response_headers.get("resources")),
+                "timestamp": datetime.now().isoformat()
+            }
                 
         except requests.exceptions.Timeout:
+            self.rate_limiter.report_error(supermarket_key)
             return {
                 "success": False,
-                "supermarket": self.SUPERMERCADOS_API[supermarket_key]["name"],
+                "supermarket": supermarket_info["name"],
                 "error": "Timeout",
                 "message": "La petición tardó demasiado tiempo"
             }
         
         except requests.exceptions.ConnectionError:
+            self.rate_limiter.report_error(supermarket_key)
             return {
                 "success": False,
-                "supermarket": self.SUPERMERCADOS_API[supermarket_key]["name"],
+                "supermarket": supermarket_info["name"],
                 "error": "Connection Error",
                 "message": "No se pudo conectar con el supermercado"
             }
@@ -153,15 +345,67 @@ class SupermarketAPI:
         except Exception as e:
             return {
                 "success": False,
-                "supermarket": self.SUPERMERCADOS_API[supermarket_key]["name"],
+                "supermarket": supermarket_info["name"],
                 "error": "Unknown Error",
                 "message": str(e)
             }
+
+    def _parse_total_resources(self, resources_header):
+        """
+        Lee el total de resultados del header VTEX "resources" (ej: "0-49/312")
+        """
+        try:
+            if resources_header and "/" in resources_header:
+                return int(resources_header.split("/")[-1])
+        except ValueError:
+            pass
+        return None
     
-    # Modifica temporalmente tu método _process_products para debuggear
+    def _process_products(self, raw_products, supermarket_key, supermarket_name, verbose=None):
+        """
+        Normaliza una página de productos VTEX y descarta los que no tienen nombre o precio
+
+        Args:
+            raw_products (list): Productos tal como los devuelve la API
+            supermarket_key (str): Clave del supermercado
+            supermarket_name (str): Nombre visible del supermercado
+            verbose (bool): Mostrar ejemplos y contadores de rechazo (por defecto SCRAPER_VERBOSE)
+
+        Returns:
+            list: Productos normalizados
+        """
+        if verbose is None:
+            verbose = self.verbose_processing
+
+        if not verbose:
+            return self._normalize_batch(raw_products, supermarket_key, supermarket_name)
+
+        return self._process_products_verbose(raw_products, supermarket_key, supermarket_name)
+
+    def _normalize_batch(self, raw_products, supermarket_key, supermarket_name):
+        """
+        Modo por lotes: una sola marca de tiempo y URL base para toda la página,
+        sin impresiones ni contadores
+        """
+        scraped_at = datetime.now().isoformat()
+        base_url = self.PRODUCT_BASE_URLS.get(supermarket_key, "")
+        normalize = self._normalize_product
+
+        processed_products = []
+        append = processed_products.append
+
+        for product in raw_products:
+            try:
+                product_info = normalize(product, supermarket_key, supermarket_name, base_url, scraped_at)
+                if product_info["name"] and product_info["price"] > 0:
+                    append(product_info)
+            except Exception:
+                continue
+
+        return processed_products
 
-    def _process_products(self, raw_products, supermarket_key, supermarket_name):
-        """Debug version - muestra por qué se rechazan productos"""
+    def _process_products_verbose(self, raw_products, supermarket_key, supermarket_name):
+        """Versión de depuración - muestra por qué se rechazan productos"""
         processed_products = []
         
         print(f"\n🔍 Procesando {len(raw_products)} productos de {supermarket_name}")
@@ -171,30 +415,14 @@ class SupermarketAPI:
         rejected_zero_price = 0
         processed_count = 0
 
+        scraped_at = datetime.now().isoformat()
+        base_url = self.PRODUCT_BASE_URLS.get(supermarket_key, "")
+
         for i, product in enumerate(raw_products):
             try:
-                # Extraer información básica
-                product_info = {
-                    "id": product.get("productId", ""),
-                    "name": self._clean_product_name(product.get("productName", "")),
-                    "brand": product.get("brand", "Sin marca"),
-                    "description": product.get("description", ""),
-                    "supermarket": supermarket_name,
-                    "supermarket_key": supermarket_key,
-                }
-
-                # Extraer precios
-                prices = self._extract_prices(product)
-                product_info.update(prices)
-                
-                # Extraer otros datos...
-                images = self._extract_images(product)
-                product_info["images"] = images
-                categories = self._extract_categories(product)
-                product_info["categories"] = categories
-                product_info["url"] = self._build_product_url(product, supermarket_key)
-                product_info["available"] = self._check_availability(product)
-                product_info["scraped_at"] = datetime.now().isoformat()
+                product_info = self._normalize_product(
+                    product, supermarket_key, supermarket_name, base_url, scraped_at
+                )
                 
                 # DEBUGGING: Verificar por qué se rechaza
                 name_ok = bool(product_info["name"])
@@ -233,57 +461,91 @@ class SupermarketAPI:
         print(f"   - Rechazados por nombre vacío: {rejected_no_name}")
         print(f"   - Rechazados por precio = 0: {rejected_zero_price}")
         print(f"   - Rechazados por precio inválido: {rejected_no_price}")
-        print(f"   - Ratio de éxito: {(processed_count/len(raw_products)*100):.1f}%")
+        print(f"   - Ratio de éxito: {(processed_count/max(len(raw_products), 1)*100):.1f}%")
         
         return processed_products
+
+    def _normalize_product(self, product, supermarket_key, supermarket_name, base_url, scraped_at):
+        """
+        Convierte UN producto VTEX al formato interno en una sola pasada
+        (commertialOffer se lee una sola vez para precios y disponibilidad)
+        """
+        offer = self._extract_offer(product)
+        link_text = product.get("linkText", "")
+
+        return {
+            "id": product.get("productId", ""),
+            "name": self._clean_product_name(product.get("productName", "")),
+            "brand": product.get("brand", "Sin marca"),
+            "description": product.get("description", ""),
+            "supermarket": supermarket_name,
+            "supermarket_key": supermarket_key,
+            "price": offer["price"],
+            "original_price": offer["original_price"],
+            "discount_percentage": offer["discount_percentage"],
+            "currency": "PEN",
+            "images": self._extract_images(product),
+            "categories": self._extract_categories(product),
+            "url": f"{base_url}/{link_text}/p" if link_text and base_url else "",
+            "available": offer["available"],
+            "scraped_at": scraped_at
+        }
     
     def _clean_product_name(self, name):
         """Limpia y normaliza el nombre del producto"""
         if not name:
             return ""
         
-        # Remover HTML tags si los hay
-        name = re.sub(r'<[^>]+>', '', name)
+        # Remover HTML tags si los hay (patrón precompilado)
+        if "<" in name:
+            name = HTML_TAG_PATTERN.sub('', name)
 
         # Limpiar espacios extra
-        name = ' '.join(name.split())
-        
-        return name.strip()
+        return ' '.join(name.split())
     
-    def _extract_prices(self, product):
-        """Extrae información de precios del producto"""
-        prices = {
+    def _extract_offer(self, product):
+        """
+        Extrae precios y disponibilidad de items[0].sellers[0].commertialOffer
+        """
+        offer_data = {
             "price": 0,
             "original_price": 0,
             "discount_percentage": 0,
-            "currency": "PEN"
+            "available": False
         }
 
+        items = product.get("items", [])
+        if not items:
+            return offer_data
+
+        sellers = items[0].get("sellers", [])
+        if not sellers:
+            return offer_data
+
+        commertial_offer = sellers[0].get("commertialOffer", {})
+
         try:
-            # Las APIs VTEX pueden tener precios en diferentes lugares
-            items = product.get("items", [])
-            if items:
-                sellers = items[0].get("sellers", [])
-                if sellers:
-                    commertial_offer = sellers[0].get("commertialOffer", {})
-                    
-                    # Precio actual
-                    price = commertial_offer.get("Price", 0)
-                    list_price = commertial_offer.get("ListPrice", 0)
-                    
-                    prices["price"] = price
-                    prices["original_price"] = list_price if list_price > price else price
-                    
-                    # Calcular descuento si hay precio original mayor
-                    if list_price > price and price > 0:
-                        discount = ((list_price - price) / list_price) * 100
-                        prices["discount_percentage"] = round(discount, 2)
-            
-            return prices
-        
+            offer_data["available"] = commertial_offer.get("AvailableQuantity", 0) > 0
+        except TypeError:
+            pass
+
+        try:
+            # Precio actual
+            price = commertial_offer.get("Price", 0)
+            list_price = commertial_offer.get("ListPrice", 0)
+
+            offer_data["price"] = price
+            offer_data["original_price"] = list_price if list_price > price else price
+
+            # Calcular descuento si hay precio original mayor
+            if list_price > price and price > 0:
+                discount = ((list_price - price) / list_price) * 100
+                offer_data["discount_percentage"] = round(discount, 2)
+
         except Exception as e:
             print(f"Error extrayendo precios: {e}")
-            return prices
+
+        return offer_data
         
     def _extract_images(self, product):
         """Extrae URLs de imágenes del producto"""
@@ -330,45 +592,6 @@ class SupermarketAPI:
             print(f"Error extrayendo categorías: {e}")
             return []
     
-    def _build_product_url(self, product, supermarket_key):
-        """Construye la URL del producto en el sitio web"""
-        try:
-            link_text = product.get("linkText", "")
-            if link_text:
-                base_urls = {
-                    "plazavea": "https://www.plazavea.com.pe",
-                    "wong": "https://www.wong.pe", 
-                    "vivanda": "https://www.vivanda.com.pe",
-                    "metro": "https://www.metro.pe",
-                    "tottus": "https://www.tottus.com.pe"
-                }
-                
-                base_url = base_urls.get(supermarket_key, "")
-                return f"{base_url}/{link_text}/p" if base_url else ""
-            
-            return ""
-        
-        except Exception as e:
-            print(f"Error construyendo URL: {e}")
-            return ""
-    
-    def _check_availability(self, product):
-        """Verifica si el producto está disponible"""
-        try:
-            items = product.get("items", [])
-            if items:
-                sellers = items[0].get("sellers", [])
-                if sellers:
-                    commertial_offer = sellers[0].get("commertialOffer", {})
-                    available_quantity = commertial_offer.get("AvailableQuantity", 0)
-                    return available_quantity > 0
-            
-            return False
-        
-        except Exception as e:
-            print(f"Error verificando disponibilidad: {e}")
-            return False
-    
     def get_available_supermarkets(self):
         """Devuelve lista de supermercados disponibles"""
         return {
@@ -380,6 +603,22 @@ class SupermarketAPI:
             if info["active"]
         }
 
+    def get_rate_limit_stats(self):
+        """Devuelve la velocidad actual y esperas del limitador por supermercado"""
+        return self.rate_limiter.get_stats()
+
+    def get_cache_stats(self):
+        """Devuelve aciertos, fallos y tamaño de la caché de respuestas"""
+        return self.response_cache.get_stats()
+
+    def get_connection_stats(self):
+        """Devuelve estadísticas de reutilización de conexiones por host"""
+        return self.http_pool.get_stats()
+
+    def close(self):
+        """Cierra las sesiones HTTP persistentes"""
+        self.http_pool.close()
+
 # Crear instancia global
 supermarket_api = SupermarketAPI()
 
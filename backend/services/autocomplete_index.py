@@ -0,0 +1,307 @@
+"""
+Índice de autocompletado para nombres y marcas de productos
+- Prefijos de cada palabra (edge n-grams) -> sugerencias ya ordenadas por popularidad,
+  así una consulta de una palabra es una sola lectura de diccionario
+- Popularidad según search_history: cada palabra buscada suma sus búsquedas a
+  las sugerencias que la contienen
+- Nombres y marcas nuevos se agregan al guardar; el índice completo se reconstruye
+  después de cada actualización programada
+"""
+import bisect
+import os
+import threading
+import time
+
+from utils.canonical_product import fold_accents
+from services.search_index import TOKEN_PATTERN, STOPWORDS, analyze, stem
+
+
+def words_of(text):
+    """Palabras normalizadas sin tildes (sin stemming: se comparan prefijos escritos)"""
+    return [token for token in TOKEN_PATTERN.findall(fold_accents(text)) if token not in STOPWORDS]
+
+
+class _AutocompleteData:
+    """
+    Estructuras de un índice construido (se reemplazan completas al reconstruir)
+    """
+
+    def __init__(self):
+        self.suggestions = []  # id -> {text, type, products, popularity}
+        self.keys = {}  # (tipo, palabras normalizadas) -> id
+        self.words = []  # id -> tupla de palabras
+        self.scores = []  # id -> (popularidad, productos)
+        self.word_postings = {}  # palabra -> set de ids
+        self.vocabulary = []  # palabras ordenadas (búsqueda de prefijos con bisect)
+        self.prefix_top = {}  # prefijo -> ids ordenados por puntaje (máximo top_size)
+        self.term_weights = {}  # término (con stemming) -> búsquedas
+
+
+class AutocompleteIndex:
+    """
+    Sugerencias por prefijo sobre nombres y marcas de los productos guardados
+    """
+
+    def __init__(self, top_size=20, max_prefix=15, candidate_limit=5000, max_queries=20000):
+        """
+        Args:
+            top_size (int): Sugerencias precalculadas por prefijo
+            max_prefix (int): Largo máximo de prefijo precalculado
+            candidate_limit (int): Candidatos revisados como máximo en consultas de varias palabras
+            max_queries (int): Búsquedas distintas de search_history que cuentan para la popularidad
+        """
+        self.top_size = top_size
+        self.max_prefix = max_prefix
+        self.candidate_limit = candidate_limit
+        self.max_queries = max_queries
+
+        self._data = _AutocompleteData()
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._stats = {"requests": 0, "total_ms": 0.0, "max_ms": 0.0, "builds": 0, "last_build_ms": 0}
+
+    # === CONSTRUCCIÓN ===
+    def load_from_collection(self, products_collection, search_history_collection, force=False):
+        """
+        Construye el índice con todos los productos y la popularidad de search_history
+        (se arma aparte y se reemplaza de una vez: las consultas no esperan)
+
+        Args:
+            force (bool): Reconstruir aunque ya esté cargado (actualización programada)
+
+        Returns:
+            int: Sugerencias cargadas
+        """
+        with self._build_lock:
+            # Otra petición pudo terminar la construcción mientras se esperaba el lock
+            if self.loaded and not force:
+                return len(self._data.suggestions)
+
+            start_time = time.perf_counter()
+            data = _AutocompleteData()
+
+            try:
+                data.term_weights = self._load_term_weights(search_history_collection)
+
+                for product in products_collection.find({}, {"_id": 0, "name": 1, "brand": 1}):
+                    self._register(data, product.get("name"), "product")
+                    self._register(data, product.get("brand"), "brand")
+
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar el índice de autocompletado: {e}")
+                return 0
+
+            for suggestion_id, words in enumerate(data.words):
+                data.scores[suggestion_id] = self._score(data, suggestion_id, words)
+
+            # Las sugerencias entran a cada prefijo de mayor a menor puntaje hasta llenarlo
+            for suggestion_id in sorted(range(len(data.words)), key=data.scores.__getitem__, reverse=True):
+                for prefix in self._prefixes(data.words[suggestion_id]):
+                    bucket = data.prefix_top.setdefault(prefix, [])
+                    if len(bucket) < self.top_size:
+                        bucket.append(suggestion_id)
+
+            data.vocabulary = sorted(data.word_postings)
+
+            with self._lock:
+                self._data = data
+                self.loaded = True
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            self._stats["builds"] += 1
+            self._stats["last_build_ms"] = round(elapsed_ms, 1)
+
+        print(f"🔤 Índice de autocompletado: {len(data.suggestions)} sugerencias, "
+              f"{len(data.prefix_top)} prefijos en {elapsed_ms:.0f} ms")
+        return len(data.suggestions)
+
+    def ensure_loaded(self, products_collection, search_history_collection):
+        if not self.loaded:
+            self.load_from_collection(products_collection, search_history_collection)
+        return self.loaded
+
+    def _load_term_weights(self, search_history_collection):
+        """
+        Búsquedas por término: "leche gloria" buscada 40 veces suma 40 a "lech" y a "glori"
+        """
+        pipeline = [
+            {"$group": {"_id": "$search_query", "search_count": {"$sum": "$search_count"}}},
+            {"$sort": {"search_count": -1}},
+            {"$limit": self.max_queries}
+        ]
+
+        term_weights = {}
+        for row in search_history_collection.aggregate(pipeline):
+            for term in set(analyze(row["_id"] or "")):
+                term_weights[term] = term_weights.get(term, 0) + (row.get("search_count") or 0)
+        return term_weights
+
+    def _register(self, data, text, suggestion_type):
+        """
+        Suma un nombre o marca (los repetidos sólo cuentan un producto más)
+
+        Returns:
+            tuple | None: (id de la sugerencia, es_nueva), None si el texto no tiene palabras
+        """
+        words = tuple(words_of(text))
+        if not words:
+            return None
+
+        key = (suggestion_type, " ".join(words))
+        suggestion_id = data.keys.get(key)
+        if suggestion_id is not None:
+            data.suggestions[suggestion_id]["products"] += 1
+            return suggestion_id, False
+
+        suggestion_id = len(data.suggestions)
+        data.keys[key] = suggestion_id
+        data.suggestions.append({
+            "text": " ".join(text.split()),
+            "type": suggestion_type,
+            "products": 1,
+            "popularity": 0
+        })
+        data.words.append(words)
+        data.scores.append((0, 1))
+        for word in set(words):
+            data.word_postings.setdefault(word, set()).add(suggestion_id)
+        return suggestion_id, True
+
+    def _score(self, data, suggestion_id, words):
+        suggestion = data.suggestions[suggestion_id]
+        suggestion["popularity"] = sum(data.term_weights.get(stem(word), 0) for word in set(words))
+        return (suggestion["popularity"], suggestion["products"])
+
+    def _prefixes(self, words):
+        prefixes = set()
+        for word in words:
+            for length in range(1, min(len(word), self.max_prefix) + 1):
+                prefixes.add(word[:length])
+        return prefixes
+
+    def add_products(self, products):
+        """
+        Agrega los nombres y marcas de productos recién guardados (sólo si el índice
+        ya está cargado; los puntajes se recalculan en la próxima reconstrucción)
+        """
+        if not self.loaded:
+            return 0
+
+        added = 0
+        with self._lock:
+            data = self._data
+            for product in products:
+                for text, suggestion_type in ((product.get("name"), "product"), (product.get("brand"), "brand")):
+                    registered = self._register(data, text, suggestion_type)
+                    if not registered or not registered[1]:
+                        continue
+
+                    suggestion_id = registered[0]
+                    words = data.words[suggestion_id]
+                    data.scores[suggestion_id] = self._score(data, suggestion_id, words)
+                    score = data.scores[suggestion_id]
+
+                    for prefix in self._prefixes(words):
+                        bucket = data.prefix_top.setdefault(prefix, [])
+                        position = len(bucket)
+                        while position > 0 and data.scores[bucket[position - 1]] < score:
+                            position -= 1
+                        if position < self.top_size:
+                            bucket.insert(position, suggestion_id)
+                            del bucket[self.top_size:]
+
+                    for word in set(words):
+                        if len(data.word_postings[word]) == 1:
+                            bisect.insort(data.vocabulary, word)
+                    added += 1
+
+        return added
+
+    # === CONSULTA ===
+    def _words_with_prefix(self, data, prefix):
+        start = bisect.bisect_left(data.vocabulary, prefix)
+        end = bisect.bisect_left(data.vocabulary, prefix + "\uffff")
+        return data.vocabulary[start:end]
+
+    def _candidates_for(self, data, token, exact=False):
+        """Ids que contienen la palabra (o una palabra que empieza con ella)"""
+        if exact and token in data.word_postings:
+            return data.word_postings[token]
+        ids = set()
+        for word in self._words_with_prefix(data, token):
+            ids |= data.word_postings[word]
+            if len(ids) > self.candidate_limit:
+                break
+        return ids
+
+    def suggest(self, query, limit=8, suggestion_type=None):
+        """
+        Sugerencias para lo escrito hasta ahora; la última palabra puede estar incompleta
+
+        Args:
+            query (str): Texto escrito
+            limit (int): Sugerencias a devolver
+            suggestion_type (str): "product" o "brand" (por defecto ambos)
+
+        Returns:
+            list: [{text, type, products, popularity}] de mayor a menor popularidad
+        """
+        start_time = time.perf_counter()
+        tokens = words_of(query)
+        if not tokens:
+            return []
+
+        *complete, last = tokens
+
+        with self._lock:
+            data = self._data
+
+            if not complete and len(last) <= self.max_prefix and not suggestion_type:
+                # Caso más común (una palabra): lista ya ordenada
+                ranked = data.prefix_top.get(last, [])
+            else:
+                if complete:
+                    candidate_sets = sorted(
+                        (self._candidates_for(data, token, exact=True) for token in complete), key=len
+                    )
+                    candidates = set.intersection(*candidate_sets) if candidate_sets[0] else set()
+                    candidates = [
+                        suggestion_id for suggestion_id in candidates
+                        if any(word.startswith(last) for word in data.words[suggestion_id])
+                    ]
+                else:
+                    candidates = self._candidates_for(data, last)
+
+                if suggestion_type:
+                    candidates = [
+                        suggestion_id for suggestion_id in candidates
+                        if data.suggestions[suggestion_id]["type"] == suggestion_type
+                    ]
+                ranked = sorted(candidates, key=data.scores.__getitem__, reverse=True)
+
+            results = [dict(data.suggestions[suggestion_id]) for suggestion_id in ranked[:limit]]
+
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        self._stats["requests"] += 1
+        self._stats["total_ms"] += elapsed_ms
+        self._stats["max_ms"] = max(self._stats["max_ms"], elapsed_ms)
+
+        return results
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        requests = stats.pop("requests")
+        total_ms = stats.pop("total_ms")
+        stats["requests"] = requests
+        stats["avg_ms"] = round(total_ms / requests, 3) if requests else 0
+        stats["max_ms"] = round(stats["max_ms"], 3)
+        stats["suggestions"] = len(self._data.suggestions)
+        stats["loaded"] = self.loaded
+        return stats
+
+
+# Crear instancia global
+autocomplete_index = AutocompleteIndex(
+    top_size=int(os.getenv("AUTOCOMPLETE_TOP_SIZE", 20))
+)
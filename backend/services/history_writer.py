@@ -0,0 +1,181 @@
+"""
+Escritura por lotes del historial de precios
+Las entradas se acumulan en memoria y se insertan con insert_many cuando el buffer
+llega a HISTORY_WRITER_BATCH_SIZE filas o la más antigua supera HISTORY_WRITER_MAX_AGE
+segundos; app.py vacía el buffer al cerrar (atexit)
+"""
+import os
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from models.price_history_model import price_history_model
+
+
+class PriceHistoryWriter:
+    """
+    Buffer de entradas de price_history con vaciado por tamaño o por antigüedad
+    """
+
+    def __init__(self, collection, batch_size=500, max_age_seconds=5.0):
+        """
+        Args:
+            collection: Colección del historial de precios (time-series)
+            batch_size (int): Filas que disparan un insert_many
+            max_age_seconds (float): Tiempo máximo que una fila espera en memoria
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_age_seconds = max_age_seconds
+
+        self._buffer = []
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._flusher = None
+
+        self._stats = {
+            "queued": 0,
+            "written": 0,
+            "failed": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "max_queue_depth": 0
+        }
+
+    def add(self, doc):
+        """
+        Encola una entrada; se le asigna _id al encolarla para poder devolverlo enseguida
+
+        Returns:
+            ObjectId: _id que tendrá la entrada en MongoDB
+        """
+        self.add_many([doc])
+        return doc["_id"]
+
+    def add_many(self, docs):
+        """Encola varias entradas (vacía el buffer si se llegó al tamaño del lote)"""
+        if not docs:
+            return
+
+        with self._lock:
+            for doc in docs:
+                doc.setdefault("_id", ObjectId())
+            self._buffer.extend(docs)
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+
+            depth = len(self._buffer)
+            self._stats["queued"] += len(docs)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+
+        self._ensure_flusher()
+
+        # Ya cerrado (apagado en curso): escribir enseguida
+        if depth >= self.batch_size or self._stopped:
+            self.flush()
+
+    def flush(self):
+        """
+        Inserta todo lo pendiente
+
+        Returns:
+            int: Entradas escritas
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = self._buffer
+                self._buffer = []
+                self._oldest_at = None
+
+            if not pending:
+                return 0
+
+            written = len(pending)
+            start_time = time.perf_counter()
+
+            for offset in range(0, len(pending), self.batch_size):
+                chunk = pending[offset:offset + self.batch_size]
+                try:
+                    self.collection.insert_many(chunk, ordered=False)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    written -= len(errors)
+                    print(f"⚠️ {len(errors)} de {len(chunk)} entradas de historial fallaron")
+                except Exception as e:
+                    written -= len(chunk)
+                    print(f"Error guardando historial de precios: {e}")
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+            with self._lock:
+                self._stats["written"] += written
+                self._stats["failed"] += len(pending) - written
+                self._stats["flushes"] += 1
+                self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+                self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+                self._stats["total_flush_ms"] += elapsed_ms
+
+            return written
+
+    def _ensure_flusher(self):
+        """Hilo en segundo plano que vacía el buffer cuando las filas envejecen"""
+        if self._flusher is not None or self._stopped:
+            return
+
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="price-history-writer", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stopped:
+            self._wakeup.wait(self.max_age_seconds / 2)
+            self._wakeup.clear()
+
+            with self._lock:
+                expired = (
+                    self._oldest_at is not None
+                    and time.monotonic() - self._oldest_at >= self.max_age_seconds
+                )
+
+            if expired:
+                self.flush()
+
+    def close(self):
+        """Detiene el hilo y escribe lo pendiente (llamado desde el cleanup de app.py)"""
+        self._stopped = True
+        self._wakeup.set()
+        return self.flush()
+
+    def get_stats(self):
+        """Profundidad de la cola y latencia de los vaciados"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._buffer)
+            stats["oldest_age_seconds"] = (
+                round(time.monotonic() - self._oldest_at, 2) if self._oldest_at else 0
+            )
+
+        total_flush_ms = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(total_flush_ms / stats["flushes"], 2) if stats["flushes"] else 0
+        stats["batch_size"] = self.batch_size
+        stats["max_age_seconds"] = self.max_age_seconds
+        return stats
+
+
+# Crear instancia global
+history_writer = PriceHistoryWriter(
+    price_history_model.collection,
+    batch_size=int(os.getenv("HISTORY_WRITER_BATCH_SIZE", 500)),
+    max_age_seconds=float(os.getenv("HISTORY_WRITER_MAX_AGE", 5))
+)
@@ -0,0 +1,145 @@
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HostSessionPool:
+    """
+    Pool de sesiones HTTP persistentes (keep-alive), una por host
+    Reutiliza las conexiones TCP/TLS entre peticiones al mismo supermercado
+    """
+
+    def __init__(self, headers=None, pool_size=10, max_retries=3, backoff_factor=0.5):
+        """
+        Args:
+            headers (dict): Encabezados por defecto para todas las sesiones
+            pool_size (int): Conexiones máximas que se mantienen abiertas por host
+            max_retries (int): Reintentos ante errores de conexión o 502/503/504
+            backoff_factor (float): Factor de espera exponencial entre reintentos
+        """
+        self.headers = headers or {}
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self._sessions = {}  # host -> requests.Session
+        self._request_counts = {}  # host -> peticiones realizadas
+        self._custom_adapter = None  # Adaptador alternativo (grabación / replay)
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        """Crea una sesión con adaptador de reintentos y pool de conexiones"""
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=1,  # Un solo host por sesión
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+            pool_block=False
+        )
+
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount("https://", self._custom_adapter or adapter)
+        session.mount("http://", self._custom_adapter or adapter)
+        return session
+
+    def mount_adapter(self, adapter):
+        """
+        Reemplaza el transporte HTTP de todas las sesiones (actuales y futuras)
+        Se usa para grabar respuestas reales o reproducirlas sin red
+
+        Args:
+            adapter (requests.adapters.BaseAdapter): Adaptador a usar, o None para volver al normal
+        """
+        with self._lock:
+            self._custom_adapter = adapter
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def get_session(self, url):
+        """
+        Devuelve la sesión persistente del host de la URL (la crea si no existe)
+        """
+        host = urlparse(url).netloc
+
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._build_session()
+                self._sessions[host] = session
+                self._request_counts[host] = 0
+            return session
+
+    def get(self, url, **kwargs):
+        """
+        Realiza un GET reutilizando la conexión del host
+        """
+        session = self.get_session(url)
+        host = urlparse(url).netloc
+
+        with self._lock:
+            self._request_counts[host] += 1
+
+        return session.get(url, **kwargs)
+
+    def get_stats(self):
+        """
+        Estadísticas de reutilización de conexiones por host
+
+        Returns:
+            dict: {host: {requests, connections_opened, connections_reused, reuse_ratio}}
+        """
+        stats = {}
+
+        with self._lock:
+            sessions = dict(self._sessions)
+            request_counts = dict(self._request_counts)
+
+        for host, session in sessions.items():
+            connections_opened = 0
+
+            try:
+                adapter = session.get_adapter(f"https://{host}")
+                pools = adapter.poolmanager.pools if hasattr(adapter, "poolmanager") else {}
+                for pool_key in pools.keys():
+                    pool = pools[pool_key]
+                    connections_opened += getattr(pool, "num_connections", 0)
+            except Exception as e:
+                print(f"⚠️ No se pudieron leer estadísticas de conexión de {host}: {e}")
+
+            total_requests = request_counts.get(host, 0)
+            reused = max(total_requests - connections_opened, 0)
+
+            stats[host] = {
+                "requests": total_requests,
+                "connections_opened": connections_opened,
+                "connections_reused": reused,
+                "reuse_ratio": round(reused / total_requests, 3) if total_requests else 0
+            }
+
+        return stats
+
+    def close(self):
+        """
+        Cierra todas las sesiones y sus conexiones abiertas
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._request_counts.clear()
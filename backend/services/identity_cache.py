@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ProductIdentityCache:
+    """
+    Caché en memoria unique_id -> (último precio, hash del nombre, update_count, content_hash)
+    Permite saber si un producto cambió sin leer su documento en MongoDB
+    """
+
+    def __init__(self, max_entries=200000):
+        """
+        Args:
+            max_entries (int): Productos recordados como máximo (expulsión LRU)
+        """
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "warmed": 0}
+
+    @staticmethod
+    def name_hash(name):
+        """Hash corto del nombre normalizado (minúsculas, espacios simples)"""
+        normalized = " ".join((name or "").lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+    def get(self, unique_id):
+        """
+        Returns:
+            dict | None: {price, name_hash, update_count, content_hash}
+        """
+        with self._lock:
+            entry = self._entries.get(unique_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(unique_id)
+            self._stats["hits"] += 1
+            return dict(entry)
+
+    def put(self, unique_id, price, name, update_count=0, content_hash=None):
+        """Guarda el estado que quedó escrito en la base de datos"""
+        entry = {
+            "price": float(price or 0),
+            "name_hash": self.name_hash(name),
+            "update_count": update_count or 0,
+            "content_hash": content_hash
+        }
+
+        with self._lock:
+            self._entries[unique_id] = entry
+            self._entries.move_to_end(unique_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_unchanged(self, unique_id, price, name):
+        """
+        True si el producto tiene el mismo precio y nombre que la última vez
+
+        Returns:
+            tuple: (sin_cambios, entrada_en_cache)
+        """
+        entry = self.get(unique_id)
+        if entry is None:
+            return False, None
+
+        try:
+            same_price = entry["price"] == float(price or 0)
+        except (TypeError, ValueError):
+            return False, entry
+
+        return same_price and entry["name_hash"] == self.name_hash(name), entry
+
+    def invalidate(self, unique_ids):
+        """Olvida productos modificados por fuera del guardado por lotes"""
+        with self._lock:
+            for unique_id in unique_ids:
+                if self._entries.pop(unique_id, None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def warm(self, collection, limit=None):
+        """
+        Carga el estado actual de los productos desde MongoDB (una sola consulta)
+
+        Args:
+            collection: Colección products
+            limit (int): Máximo de productos a cargar (por defecto max_entries)
+
+        Returns:
+            int: Productos cargados
+        """
+        limit = min(limit or self.max_entries, self.max_entries)
+        loaded = 0
+
+        try:
+            cursor = collection.find(
+                {},
+                {"_id": 0, "unique_id": 1, "price": 1, "name": 1, "update_count": 1, "content_hash": 1}
+            ).sort("last_seen", -1).limit(limit)
+
+            for doc in cursor:
+                if doc.get("unique_id"):
+                    self.put(
+                        doc["unique_id"], doc.get("price", 0), doc.get("name"),
+                        doc.get("update_count", 0), doc.get("content_hash")
+                    )
+                    loaded += 1
+
+            with self._lock:
+                self._stats["warmed"] += loaded
+
+            print(f"🧠 Caché de identidades cargada: {loaded} productos")
+
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar la caché de identidades: {e}")
+
+        return loaded
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        return stats
+
+
+# Crear instancia global
+identity_cache = ProductIdentityCache(
+    max_entries=int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", 200000))
+)
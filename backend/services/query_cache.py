@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.search_index import analyze
+
+
+class QueryResultCache:
+    """
+    Caché en memoria de resultados de búsqueda de productos guardados (LRU + TTL)
+
+    Invalidación por contadores de generación:
+    - Cada término (nombre/marca/categorías, con stemming) tiene una generación que
+      el guardado incrementa cuando un lote crea o modifica productos con ese término
+    - Una entrada guarda las generaciones de los términos de su consulta y deja de
+      valer en cuanto alguna cambia; "leche" no se invalida por un lote de arroz
+    - Las entradas que no dependen sólo de términos (búsqueda parcial por regex)
+      usan la generación global, que cambia con cualquier escritura
+    """
+
+    def __init__(self, max_entries=2000, ttl_seconds=3600, enabled=True):
+        """
+        Args:
+            max_entries (int): Consultas recordadas como máximo (expulsión LRU)
+            ttl_seconds (int): Segundos que vale un resultado aunque no haya escrituras
+            enabled (bool): Permite desactivar la caché sin tocar el código
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._entries = OrderedDict()  # clave -> {value, term_based, generations, global_generation, expires_at}
+        self._generations = {}  # término -> generación
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "stores": 0, "evictions": 0, "bumps": 0}
+
+    @staticmethod
+    def make_key(namespace, query, sort_by=None, supermarket=None, limit=None):
+        """Consulta normalizada (minúsculas, espacios simples) + orden + supermercado"""
+        return (namespace, " ".join((query or "").lower().split()), sort_by, supermarket, limit)
+
+    # === LECTURA ===
+    def lookup(self, namespace, query, sort_by=None, supermarket=None, limit=None):
+        """
+        Busca un resultado vigente
+
+        Returns:
+            tuple: (resultado o None, marca para pasar a store() si hubo que calcularlo)
+                   La marca guarda las generaciones de antes de calcular, así un guardado
+                   que ocurra mientras tanto deja la entrada vencida
+        """
+        key = self.make_key(namespace, query, sort_by, supermarket, limit)
+        terms = tuple(sorted(set(analyze(query))))
+
+        with self._lock:
+            stamp = {
+                "key": key,
+                "terms": terms,
+                "generations": tuple(self._generations.get(term, 0) for term in terms),
+                "global_generation": self._global_generation
+            }
+
+            if not self.enabled:
+                return None, stamp
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, stamp
+
+            if entry["expires_at"] <= time.time():
+                reason = "expired"
+            elif entry["term_based"] and entry["generations"] != stamp["generations"]:
+                reason = "stale"
+            elif not entry["term_based"] and entry["global_generation"] != self._global_generation:
+                reason = "stale"
+            else:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry["value"], stamp
+
+            del self._entries[key]
+            self._stats[reason] += 1
+            self._stats["misses"] += 1
+            return None, stamp
+
+    def store(self, stamp, value, term_based=True):
+        """
+        Guarda el resultado calculado después de lookup()
+
+        Args:
+            stamp (dict): Marca devuelta por lookup()
+            value: Resultado (no se copia: no modificarlo después)
+            term_based (bool): False si el resultado puede cambiar con productos que no
+                               contienen los términos (ej. búsqueda parcial por regex)
+        """
+        if not self.enabled:
+            return
+
+        term_based = term_based and bool(stamp["terms"])
+
+        with self._lock:
+            self._entries[stamp["key"]] = {
+                "value": value,
+                "term_based": term_based,
+                "generations": stamp["generations"],
+                "global_generation": stamp["global_generation"],
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._entries.move_to_end(stamp["key"])
+            self._stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # === INVALIDACIÓN ===
+    def bump_products(self, products):
+        """
+        Incrementa la generación de los términos de productos creados o modificados
+
+        Returns:
+            int: Términos afectados
+        """
+        terms = set()
+        for product in products:
+            categories = product.get("categories") or []
+            if isinstance(categories, (list, tuple)):
+                categories = " ".join(str(category) for category in categories if category)
+            for text in (product.get("name"), product.get("brand"), categories):
+                if text:
+                    terms.update(analyze(text))
+
+        with self._lock:
+            for term in terms:
+                self._generations[term] = self._generations.get(term, 0) + 1
+            self._global_generation += 1
+            self._stats["bumps"] += 1
+
+        return len(terms)
+
+    def bump_all(self):
+        """Invalida todo (borrados masivos, cambios de unique_id)"""
+        with self._lock:
+            self._entries.clear()
+            self._global_generation += 1
+            self._stats["bumps"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["tracked_terms"] = len(self._generations)
+            stats["enabled"] = self.enabled
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        stats["miss_rate"] = round(stats["misses"] / lookups, 3) if lookups else 0
+        return stats
+
+
+# Crear instancia global
+query_cache = QueryResultCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 2000)),
+    ttl_seconds=int(os.getenv("QUERY_CACHE_TTL", 3600)),
+    enabled=os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+)
@@ -0,0 +1,174 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket clásico: permite ráfagas de hasta `burst` peticiones
+    y luego limita a `rate` peticiones por segundo
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        """Recarga tokens según el tiempo transcurrido (llamar con el lock tomado)"""
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """
+        Espera hasta que haya un token disponible y lo consume
+
+        Returns:
+            float: Segundos esperados
+        """
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def drain(self):
+        """Vacía el bucket (fuerza una pausa antes de la siguiente petición)"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de peticiones por supermercado basado en token buckets
+    Se adapta a cada tienda: frena ante HTTP 429/5xx y acelera con respuestas 200 consecutivas
+    """
+
+    def __init__(self, default_rate=0.5, burst=2, min_rate=0.1, max_rate=4.0,
+                 increase_step=0.1, decrease_factor=0.5, success_threshold=10):
+        """
+        Args:
+            default_rate (float): Peticiones por segundo iniciales por supermercado
+            burst (int): Ráfaga máxima permitida
+            min_rate (float): Velocidad mínima ante errores repetidos
+            max_rate (float): Velocidad máxima permitida
+            increase_step (float): Aumento de velocidad tras una racha de éxitos
+            decrease_factor (float): Factor de reducción ante 429/5xx
+            success_threshold (int): Respuestas exitosas seguidas para acelerar
+        """
+        self.default_rate = default_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.success_threshold = success_threshold
+
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.default_rate, self.burst)
+                self._buckets[key] = bucket
+                self._stats[key] = {
+                    "requests": 0,
+                    "throttled": 0,
+                    "success_streak": 0,
+                    "total_wait_seconds": 0.0
+                }
+            return bucket
+
+    def acquire(self, key):
+        """
+        Espera el turno para hacer una petición al supermercado `key`
+
+        Returns:
+            float: Segundos esperados
+        """
+        bucket = self._get_bucket(key)
+        waited = bucket.acquire()
+
+        with self._lock:
+            stats = self._stats[key]
+            stats["requests"] += 1
+            stats["total_wait_seconds"] += waited
+
+        return waited
+
+    def report(self, key, status_code):
+        """
+        Informa el resultado de una petición para ajustar la velocidad
+
+        Args:
+            key (str): Clave del supermercado
+            status_code (int): Código HTTP recibido
+        """
+        if status_code == 429 or status_code >= 500:
+            self._slow_down(key)
+        elif status_code in (200, 206):
+            self._record_success(key)
+
+    def report_error(self, key):
+        """Timeouts y errores de conexión también reducen la velocidad"""
+        self._slow_down(key)
+
+    def _slow_down(self, key):
+        bucket = self._get_bucket(key)
+
+        with bucket.lock:
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+            new_rate = bucket.rate
+
+        bucket.drain()
+
+        with self._lock:
+            self._stats[key]["throttled"] += 1
+            self._stats[key]["success_streak"] = 0
+
+        print(f"🐢 Rate limit {key}: bajando a {new_rate:.2f} req/s")
+
+    def _record_success(self, key):
+        bucket = self._get_bucket(key)
+
+        with self._lock:
+            stats = self._stats[key]
+            stats["success_streak"] += 1
+            if stats["success_streak"] < self.success_threshold:
+                return
+            stats["success_streak"] = 0
+
+        with bucket.lock:
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase_step)
+
+    def get_stats(self):
+        """
+        Estadísticas por supermercado: velocidad actual, peticiones y esperas
+        """
+        with self._lock:
+            buckets = dict(self._buckets)
+            stats = {key: dict(value) for key, value in self._stats.items()}
+
+        for key, bucket in buckets.items():
+            stats[key]["rate_per_second"] = round(bucket.rate, 2)
+            stats[key]["total_wait_seconds"] = round(stats[key]["total_wait_seconds"], 1)
+
+        return stats
+
+
+# Crear instancia global (compartida por buscador, scheduler y controlador)
+rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class DiskResponseCache:
+    """
+    Caché en disco de respuestas HTTP del scraper
+    - Cuerpos comprimidos con zlib, un archivo por entrada
+    - TTL configurable y expulsión LRU cuando se supera el tamaño máximo
+    - Guarda ETag / Last-Modified para revalidar con peticiones condicionales
+    """
+
+    def __init__(self, cache_dir, ttl_seconds=900, max_bytes=200 * 1024 * 1024, enabled=True):
+        """
+        Args:
+            cache_dir (str): Carpeta donde se guardan las respuestas
+            ttl_seconds (int): Segundos que una respuesta se considera fresca
+            max_bytes (int): Tamaño máximo de la caché en disco
+            enabled (bool): Permite desactivar la caché sin tocar el código
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+        self._index = OrderedDict()  # key -> metadatos (orden = uso reciente)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+        if self.enabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._load_index()
+            except Exception as e:
+                print(f"⚠️ Caché de respuestas desactivada: {e}")
+                self.enabled = False
+
+    def make_key(self, *parts):
+        """
+        Genera la clave de caché (ej: supermercado, query, ventana _from/_to)
+        """
+        raw = "|".join(str(part).strip().lower() for part in parts)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.bin"
+
+    def _load_index(self):
+        """Reconstruye el índice LRU con las entradas que ya están en disco"""
+        entries = []
+
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+
+            key = filename[:-5]
+            meta_path, body_path = self._paths(key)
+
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                meta["last_used"] = os.path.getmtime(meta_path)
+                entries.append((key, meta))
+            except (OSError, ValueError):
+                self._remove_files(key)
+
+        for key, meta in sorted(entries, key=lambda entry: entry[1]["last_used"]):
+            self._index[key] = meta
+            self._total_bytes += meta.get("size", 0)
+
+        self._evict_if_needed()
+
+    def get(self, key):
+        """
+        Busca una respuesta en caché
+
+        Returns:
+            dict | None: {body, status_code, headers, etag, last_modified, fresh}
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                self._stats["misses"] += 1
+                return None
+            self._index.move_to_end(key)
+
+        _, body_path = self._paths(key)
+
+        try:
+            with open(body_path, "rb") as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            self._discard(key)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        fresh = meta["expires_at"] > time.time()
+
+        with self._lock:
+            self._stats["hits" if fresh else "misses"] += 1
+
+        return {
+            "body": body,
+            "status_code": meta.get("status_code", 200),
+            "headers": meta.get("headers", {}),
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+            "fresh": fresh
+        }
+
+    def put(self, key, body, status_code=200, headers=None):
+        """
+        Guarda una respuesta (cuerpo en bytes) comprimida en disco
+        """
+        if not self.enabled:
+            return
+
+        headers = headers or {}
+        compressed = zlib.compress(body, 6)
+
+        meta = {
+            "status_code": status_code,
+            "headers": {k.lower(): v for k, v in headers.items() if k.lower() == "resources"},
+            "etag": headers.get("ETag") or headers.get("etag"),
+            "last_modified": headers.get("Last-Modified") or headers.get("last-modified"),
+            "expires_at": time.time() + self.ttl_seconds,
+            "size": len(compressed)
+        }
+
+        meta_path, body_path = self._paths(key)
+
+        try:
+            self._atomic_write(body_path, compressed, "wb")
+            self._atomic_write(meta_path, json.dumps(meta), "w")
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en caché: {e}")
+            return
+
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous:
+                self._total_bytes -= previous.get("size", 0)
+            self._index[key] = meta
+            self._total_bytes += meta["size"]
+            self._stats["stores"] += 1
+
+        self._evict_if_needed()
+
+    def revalidated(self, key):
+        """
+        El servidor respondió 304: la copia sigue siendo válida, renovar su TTL
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return
+            meta["expires_at"] = time.time() + self.ttl_seconds
+            self._stats["revalidated"] += 1
+
+        meta_path, _ = self._paths(key)
+        try:
+            self._atomic_write(meta_path, json.dumps(meta), "w")
+        except OSError:
+            pass
+
+    def conditional_headers(self, cached):
+        """
+        Headers If-None-Match / If-Modified-Since para revalidar una entrada vencida
+        """
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _atomic_write(self, path, data, mode):
+        tmp_path = f"{path}.tmp"
+        encoding = None if "b" in mode else "utf-8"
+        with open(tmp_path, mode, encoding=encoding) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict_if_needed(self):
+        """Expulsa las entradas menos usadas hasta volver al tamaño máximo"""
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or not self._index:
+                    return
+                key, meta = self._index.popitem(last=False)
+                self._total_bytes -= meta.get("size", 0)
+                self._stats["evictions"] += 1
+
+            self._remove_files(key)
+
+    def _discard(self, key):
+        with self._lock:
+            meta = self._index.pop(key, None)
+            if meta:
+                self._total_bytes -= meta.get("size", 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Elimina todas las respuestas guardadas"""
+        with self._lock:
+            keys = list(self._index.keys())
+            self._index.clear()
+            self._total_bytes = 0
+
+        for key in keys:
+            self._remove_files(key)
+
+    def get_stats(self):
+        """Estadísticas de uso de la caché"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["size_bytes"] = self._total_bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        stats["enabled"] = self.enabled
+        return stats
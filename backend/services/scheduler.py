@@ -3,7 +3,11 @@ import time
 import threading
 from datetime import datetime
 from services.api_scraper import supermarket_api
+from services.scrape_engine import scrape_engine
 from models.product_model import product_model
+from services.history_writer import history_writer
+from models.price_history_model import price_history_model
+from models.price_rollup_model import price_rollup_model
 
 class DatabaseScheduler:
     """
@@ -97,6 +101,8 @@ class DatabaseScheduler:
         try:
             print("🌅 Iniciando actualización diaria de la base de datos...")
             start_time = datetime.now()
+            product_model.warm_identity_cache()
+            product_model.backfill_canonical_ids()
             
             total_saved = 0
             total_updated = 0
@@ -124,14 +130,22 @@ class DatabaseScheduler:
                         total_errors += 1
                         print(f"   ❌ Error guardando productos para '{term}'")
                     
-                    # Pausa entre términos
-                    time.sleep(3)
+                    # Sin pausa fija: el rate limiter de supermarket_api regula cada tienda
                     
                 except Exception as e:
                     total_errors += 1
                     print(f"   ❌ Error procesando '{term}': {e}")
                     continue
             
+            # Escribir el historial que quedó en el buffer antes de dar la corrida por terminada
+            history_writer.flush()
+            
+            # Sumar las entradas nuevas a los resúmenes diarios de precios
+            price_rollup_model.refresh()
+            
+            # Popularidad y nombres nuevos en el autocompletado
+            product_model.refresh_autocomplete_index()
+            
             # Actualizar timestamp
             product_model.update_last_database_update()
             
@@ -146,6 +160,7 @@ class DatabaseScheduler:
             print(f"   - Productos actualizados: {total_updated}")
             print(f"   - Errores: {total_errors}")
             print(f"   - Términos procesados: {len(self.popular_terms)}")
+            self._print_rate_limit_stats()
             
             # Guardar estadísticas de la actualización
             self._save_update_stats(
@@ -163,48 +178,65 @@ class DatabaseScheduler:
             print("🌅 Iniciando actualización diaria CON HISTORIAL...")
             start_time = datetime.now()
             
-            total_saved = 0
-            total_updated = 0
-            total_errors = 0
-            total_price_changes = 0
-            total_alerts_created = 0
+            # Precios conocidos en memoria: los productos sin cambios no se leen de la BD
+            product_model.warm_identity_cache()
+            product_model.backfill_canonical_ids()
             
-            # Procesar cada término popular
-            for i, term in enumerate(self.popular_terms):
+            totals = {
+                "saved": 0,
+                "updated": 0,
+                "errors": 0,
+                "price_changes": 0,
+                "alerts_created": 0
+            }
+            
+            def save_term(term, products_data):
+                """Etapa de guardado: corre en el hilo escritor del motor asyncio"""
                 try:
-                    print(f"🔍 Procesando {i+1}/{len(self.popular_terms)}: {term}")
-                    
                     # 1. PASO 1: Actualización normal (que sabemos que funciona)
-                    products_data = supermarket_api.search_products(query=term, limit=100)
-                    
-                    if not products_data:
-                        print(f"   ⚠️ No se encontraron productos para '{term}'")
-                        continue
-                    
-                    # Guardar usando el método original
                     save_result = product_model.save_products(products_data, term)
                     
                     if save_result["success"]:
-                        total_saved += save_result["saved_count"]
-                        total_updated += save_result["updated_count"]
-                        print(f"   ✅ Guardado: {save_result['saved_count']} nuevos, {save_result['updated_count']} actualizados")
+                        totals["saved"] += save_result["saved_count"]
+                        totals["updated"] += save_result["updated_count"]
+                        print(f"   ✅ '{term}': {save_result['saved_count']} nuevos, {save_result['updated_count']} actualizados")
                         
                         # 2. PASO 2: Crear historial de precios DESPUÉS del guardado exitoso
                         history_result = self._create_price_history_for_term(products_data, term)
-                        total_price_changes += history_result['price_changes']
-                        total_alerts_created += history_result['alerts_created']
+                        totals["price_changes"] += history_result['price_changes']
+                        totals["alerts_created"] += history_result['alerts_created']
                         
                     else:
-                        total_errors += 1
+                        totals["errors"] += 1
                         print(f"   ❌ Error guardando productos para '{term}'")
                     
-                    # Pausa entre términos
-                    time.sleep(3)
-                    
                 except Exception as e:
-                    total_errors += 1
+                    totals["errors"] += 1
                     print(f"   ❌ Error procesando '{term}': {e}")
-                    continue
+            
+            # Descargar todos los términos en paralelo (límite global y por supermercado)
+            # mientras se van guardando los que ya terminaron
+            print(f"🔍 Procesando {len(self.popular_terms)} términos con el motor asyncio...")
+            engine_summary = scrape_engine.run(
+                self.popular_terms,
+                limit=100,
+                on_term_complete=save_term
+            )
+            
+            total_saved = totals["saved"]
+            total_updated = totals["updated"]
+            total_errors = totals["errors"] + engine_summary["write_errors"]
+            total_price_changes = totals["price_changes"]
+            total_alerts_created = totals["alerts_created"]
+            
+            # Escribir el historial que quedó en el buffer antes de dar la corrida por terminada
+            history_writer.flush()
+            
+            # Sumar las entradas nuevas a los resúmenes diarios de precios
+            price_rollup_model.refresh()
+            
+            # Popularidad y nombres nuevos en el autocompletado
+            product_model.refresh_autocomplete_index()
             
             # Actualizar timestamp
             product_model.update_last_database_update()
@@ -221,7 +253,9 @@ class DatabaseScheduler:
             print(f"   - Cambios de precio detectados: {total_price_changes}")
             print(f"   - Alertas creadas: {total_alerts_created}")
             print(f"   - Errores: {total_errors}")
-            print(f"   - Términos procesados: {len(self.popular_terms)}")
+            print(f"   - Términos procesados: {engine_summary['terms_processed']}")
+            print(f"   - Descargas fallidas: {engine_summary['failed_jobs']}/{engine_summary['jobs']}")
+            self._print_rate_limit_stats()
             
             # Guardar estadísticas ampliadas
             self._save_update_stats_extended(
@@ -232,6 +266,14 @@ class DatabaseScheduler:
         except Exception as e:
             print(f"❌ Error en actualización con historial: {e}")
 
+    def _print_rate_limit_stats(self):
+        """
+        Muestra la velocidad final alcanzada por el limitador en cada supermercado
+        """
+        for supermarket_key, stats in supermarket_api.get_rate_limit_stats().items():
+            print(f"   - {supermarket_key}: {stats['rate_per_second']} req/s, "
+                  f"{stats['requests']} peticiones, {stats['throttled']} frenadas")
+
     def _create_price_history_for_term(self, products_data, term):
         """
         NUEVO: Crea historial de precios para productos de un término
@@ -268,8 +310,8 @@ class DatabaseScheduler:
                     if not product or not product.get("unique_id"):
                         continue
                     
-                    # Obtener producto existente de la DB
-                    existing = product_model.get_product_by_unique_id(product.get("unique_id"))
+                    # Último precio conocido (caché de identidades, sin leer el documento)
+                    existing = product_model.get_product_identity(product.get("unique_id"))
                     
                     if not existing:
                         continue  # Es producto nuevo, no hay historial que crear
@@ -306,20 +348,13 @@ class DatabaseScheduler:
     def _save_price_history_entry(self, product, old_price, new_price):
         """Guarda entrada en historial de precios"""
         try:
-            price_history_entry = {
-                "product_unique_id": product["unique_id"],
-                "product_name": product.get("name", "Producto desconocido"),
-                "old_price": old_price,
-                "new_price": new_price,
-                "price_difference": round(new_price - old_price, 2),
-                "percentage_change": round(((new_price - old_price) / old_price) * 100, 1),
-                "supermarket": product.get("supermarket"),
-                "supermarket_key": product.get("supermarket_key"),
-                "timestamp": datetime.now().isoformat(),
-                "source": "scheduled_update"
-            }
+            price_history_entry = price_history_model.build_change(
+                product["unique_id"], old_price, new_price,
+                supermarket_key=product.get("supermarket_key"),
+                source="scheduled_update"
+            )
             
-            product_model.price_history_collection.insert_one(price_history_entry)
+            history_writer.add(price_history_entry)
             return True
             
         except Exception as e:
@@ -367,9 +402,7 @@ class DatabaseScheduler:
             }).deleted_count
             
             # Limpiar historial de precios muy antiguo (más de 45 días)
-            deleted_prices = product_model.price_history_collection.delete_many({
-                "timestamp": {"$lt": (datetime.now() - timedelta(days=45)).isoformat()}
-            }).deleted_count
+            deleted_prices = price_history_model.delete_older_than(datetime.now() - timedelta(days=45))
             
             # Limpiar alertas muy antiguas (más de 30 días)
             deleted_alerts = 0
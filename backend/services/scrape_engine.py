@@ -0,0 +1,133 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.api_scraper import supermarket_api
+
+
+class AsyncScrapeEngine:
+    """
+    Motor asyncio para actualizaciones masivas
+    Ejecuta trabajos (término, supermercado) en paralelo con un límite global
+    y otro por supermercado, y guarda en la base de datos en una etapa aparte
+    para que las escrituras no frenen las descargas
+    """
+
+    def __init__(self, api, max_concurrency=8, per_host_concurrency=2, write_queue_size=20):
+        """
+        Args:
+            api (SupermarketAPI): Cliente de supermercados (sesiones, rate limiter y caché)
+            max_concurrency (int): Trabajos de descarga simultáneos en total
+            per_host_concurrency (int): Trabajos simultáneos por supermercado
+            write_queue_size (int): Términos listos esperando ser guardados
+        """
+        self.api = api
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.write_queue_size = write_queue_size
+
+    def run(self, terms, limit=100, on_term_complete=None):
+        """
+        Procesa todos los términos y devuelve un resumen
+
+        Args:
+            terms (list): Términos de búsqueda
+            limit (int): Límite de productos por supermercado
+            on_term_complete (callable): Se llama como on_term_complete(term, products_data)
+                con el mismo diccionario que devuelve search_products; corre en un
+                único hilo de escritura, en el orden en que se completan los términos
+
+        Returns:
+            dict: {terms_processed, jobs, failed_jobs, write_errors, duration_seconds}
+        """
+        return asyncio.run(self._run(terms, limit, on_term_complete))
+
+    async def _run(self, terms, limit, on_term_complete):
+        loop = asyncio.get_running_loop()
+        start_time = time.monotonic()
+
+        markets = [
+            market_key for market_key, info in self.api.SUPERMERCADOS_API.items()
+            if info["active"]
+        ]
+
+        summary = {
+            "terms_processed": 0,
+            "jobs": len(terms) * len(markets),
+            "failed_jobs": 0,
+            "write_errors": 0,
+            "duration_seconds": 0
+        }
+
+        if not terms or not markets:
+            return summary
+
+        fetch_executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        write_executor = ThreadPoolExecutor(max_workers=1)  # Un solo escritor en la BD
+
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphores = {
+            market_key: asyncio.Semaphore(self.per_host_concurrency)
+            for market_key in markets
+        }
+        write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+        partial_results = {term: {} for term in terms}
+
+        async def fetch_job(term, market_key):
+            async with global_semaphore:
+                async with host_semaphores[market_key]:
+                    result = await loop.run_in_executor(
+                        fetch_executor,
+                        self.api._fetch_from_supermarket,
+                        market_key, term, limit
+                    )
+
+            if not result.get("success"):
+                summary["failed_jobs"] += 1
+
+            term_results = partial_results[term]
+            term_results[market_key] = result
+
+            # Término completo: pasarlo a la etapa de guardado
+            if len(term_results) == len(markets):
+                del partial_results[term]
+                products_data = {key: term_results[key] for key in markets}
+                await write_queue.put((term, products_data))
+
+        async def writer():
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+
+                term, products_data = item
+                summary["terms_processed"] += 1
+
+                if on_term_complete is None:
+                    continue
+
+                try:
+                    await loop.run_in_executor(write_executor, on_term_complete, term, products_data)
+                except Exception as e:
+                    summary["write_errors"] += 1
+                    print(f"   ❌ Error guardando '{term}': {e}")
+
+        writer_task = asyncio.create_task(writer())
+
+        try:
+            await asyncio.gather(*[
+                fetch_job(term, market_key)
+                for term in terms
+                for market_key in markets
+            ])
+        finally:
+            await write_queue.put(None)
+            await writer_task
+            fetch_executor.shutdown(wait=True)
+            write_executor.shutdown(wait=True)
+
+        summary["duration_seconds"] = round(time.monotonic() - start_time, 1)
+        return summary
+
+
+# Crear instancia global
+scrape_engine = AsyncScrapeEngine(supermarket_api)
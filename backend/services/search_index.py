@@ -0,0 +1,374 @@
+"""
+Índice invertido en memoria para buscar productos guardados sin Atlas Search
+- Campos name, brand y categories, cada uno con sus propias listas de apariciones
+- Palabras sin tildes y con un stemmer liviano de español ("leches" = "leche" = "lech")
+- Puntaje BM25 por campo, multiplicado por el boost del campo y sumado (como un
+  compound/should de Atlas Search)
+- Se actualiza en caché con cada guardado; la primera búsqueda lo carga desde MongoDB
+- Es por proceso: con varios workers, los guardados de otro proceso se ven recién al
+  recargarlo (cada max_age_seconds, PRODUCT_SEARCH_INDEX_MAX_AGE)
+"""
+import math
+import os
+import re
+import threading
+import time
+
+from utils.canonical_product import fold_accents
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Palabras vacías del español que no aportan a la búsqueda
+STOPWORDS = {
+    'de', 'del', 'la', 'el', 'los', 'las', 'en', 'con', 'para', 'por', 'y', 'o',
+    'un', 'una', 'al', 'a', 'sin', 'x'
+}
+
+SEARCH_FIELDS = ("name", "brand", "categories")
+
+# Mismos boosts que los índices de Atlas Search
+SAVED_SEARCH_BOOSTS = {"name": 3, "brand": 2, "categories": 1.5}
+COMPARISON_BOOSTS = {"name": 5, "brand": 3}
+
+# Campos que se guardan por producto para filtrar y ordenar sin leer MongoDB
+SORT_FIELDS = ("price", "name", "scraped_at", "supermarket_key")
+
+
+def stem(word):
+    """
+    Stemmer liviano de español (plurales y género, como el SpanishLightStemmer de Lucene)
+    "galletas" -> "gallet", "leche" -> "lech", "arroces" -> "arroz"
+    """
+    if len(word) < 5 or word.isdigit():
+        return word
+
+    last = word[-1]
+    if last in "aeo":
+        return word[:-1]
+    if last == "s":
+        if word.endswith("eses"):
+            return word[:-2]
+        if word.endswith("ces"):
+            return word[:-3] + "z"
+        if word[-2] in "aeo":
+            return word[:-2]
+    return word
+
+
+def analyze(text):
+    """
+    Texto -> lista de términos (sin tildes, sin palabras vacías, con stemming)
+    """
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(fold_accents(text))
+        if token not in STOPWORDS
+    ]
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido por campo: término -> {número de documento: frecuencia}
+
+    Los productos se identifican por unique_id; volver a agregar un producto
+    reemplaza sus términos anteriores
+    """
+
+    def __init__(self, k1=1.2, b=0.75, max_age_seconds=None):
+        """
+        Args:
+            k1 (float): Saturación de la frecuencia de un término (BM25)
+            b (float): Peso de la normalización por largo del campo (BM25)
+            max_age_seconds (int): Recargar desde MongoDB pasado este tiempo (None = nunca)
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_age_seconds = max_age_seconds
+
+        self._postings = {field: {} for field in SEARCH_FIELDS}
+        self._lengths = {field: {} for field in SEARCH_FIELDS}  # doc -> cantidad de términos
+        self._total_length = {field: 0 for field in SEARCH_FIELDS}
+
+        self._doc_ids = {}  # unique_id -> número de documento
+        self._unique_ids = {}  # número de documento -> unique_id
+        self._terms = {}  # doc -> {campo: términos}, para poder quitarlo
+        self._sources = {}  # doc -> campos indexados + campos de orden
+        self._norms = {}  # campo -> {doc: k1 * (1 - b + b * largo / largo promedio)}, se recalcula tras escribir
+        self._next_doc = 0
+
+        self.loaded = False
+        self.loaded_at = 0
+        self._lock = threading.RLock()
+        self._stats = {"searches": 0, "total_search_ms": 0.0, "updates": 0, "loads": 0, "last_load_ms": 0}
+
+    # === ESCRITURA ===
+    def add(self, product):
+        """
+        Agrega o reemplaza un producto (documento de la colección products)
+
+        Returns:
+            bool: True si se indexó
+        """
+        unique_id = product.get("unique_id")
+        if not unique_id:
+            return False
+
+        source = {field: product.get(field) for field in SEARCH_FIELDS + SORT_FIELDS}
+
+        with self._lock:
+            self._remove(unique_id)
+
+            doc = self._next_doc
+            self._next_doc += 1
+            self._doc_ids[unique_id] = doc
+            self._unique_ids[doc] = unique_id
+            self._sources[doc] = source
+
+            doc_terms = {}
+            for field in SEARCH_FIELDS:
+                value = source.get(field)
+                if isinstance(value, (list, tuple)):
+                    value = " ".join(str(item) for item in value if item)
+                terms = analyze(value or "")
+                if not terms:
+                    continue
+
+                doc_terms[field] = terms
+                self._lengths[field][doc] = len(terms)
+                self._total_length[field] += len(terms)
+
+                postings = self._postings[field]
+                for term in terms:
+                    entries = postings.setdefault(term, {})
+                    entries[doc] = entries.get(doc, 0) + 1
+
+            self._terms[doc] = doc_terms
+            self._norms.clear()
+            self._stats["updates"] += 1
+
+        return True
+
+    def add_many(self, products):
+        """
+        Indexa productos recién guardados (sólo si el índice ya está cargado:
+        antes de la primera búsqueda no hace falta mantenerlo)
+
+        Returns:
+            int: Productos indexados
+        """
+        if not self.loaded:
+            return 0
+
+        with self._lock:
+            return sum(1 for product in products if self.add(product))
+
+    def update(self, unique_id, fields):
+        """
+        Aplica campos modificados ($set) a un producto ya indexado
+        """
+        if not self.loaded:
+            return False
+
+        with self._lock:
+            doc = self._doc_ids.get(unique_id)
+            if doc is None:
+                return self.add({**fields, "unique_id": unique_id})
+            return self.add({**self._sources[doc], **fields, "unique_id": unique_id})
+
+    def remove(self, unique_ids):
+        with self._lock:
+            for unique_id in unique_ids:
+                self._remove(unique_id)
+
+    def _remove(self, unique_id):
+        doc = self._doc_ids.pop(unique_id, None)
+        if doc is None:
+            return
+
+        for field, terms in self._terms.pop(doc, {}).items():
+            postings = self._postings[field]
+            for term in set(terms):
+                entries = postings.get(term)
+                if entries is not None:
+                    entries.pop(doc, None)
+                    if not entries:
+                        del postings[term]
+            self._total_length[field] -= self._lengths[field].pop(doc, 0)
+
+        del self._unique_ids[doc]
+        del self._sources[doc]
+        self._norms.clear()
+
+    def reset(self):
+        """
+        Descarta el índice (la próxima búsqueda lo vuelve a cargar); para cambios masivos
+        como borrados o correcciones de unique_id
+        """
+        with self._lock:
+            for field in SEARCH_FIELDS:
+                self._postings[field].clear()
+                self._lengths[field].clear()
+                self._total_length[field] = 0
+            self._doc_ids.clear()
+            self._unique_ids.clear()
+            self._terms.clear()
+            self._sources.clear()
+            self._norms.clear()
+            self.loaded = False
+
+    def load_from_collection(self, collection):
+        """
+        Carga todos los productos desde MongoDB (sólo los campos indexados)
+
+        Returns:
+            int: Productos cargados
+        """
+        start_time = time.perf_counter()
+        projection = {"_id": 0, "unique_id": 1, **{field: 1 for field in SEARCH_FIELDS + SORT_FIELDS}}
+
+        with self._lock:
+            self.reset()
+            try:
+                for product in collection.find({}, projection):
+                    self.add(product)
+                self.loaded = True
+                self.loaded_at = time.time()
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar el índice de búsqueda: {e}")
+                self.reset()
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            self._stats["loads"] += 1
+            self._stats["last_load_ms"] = round(elapsed_ms, 1)
+
+        print(f"🔎 Índice de búsqueda cargado: {len(self._doc_ids)} productos en {elapsed_ms:.0f} ms")
+        return len(self._doc_ids)
+
+    def _needs_load(self):
+        """Sin cargar, o cargado hace más de max_age_seconds (guardados de otros procesos)"""
+        if not self.loaded:
+            return True
+        return bool(self.max_age_seconds) and time.time() - self.loaded_at > self.max_age_seconds
+
+    def ensure_loaded(self, collection):
+        if self._needs_load():
+            with self._lock:
+                if self._needs_load():
+                    self.load_from_collection(collection)
+        return self.loaded
+
+    # === BÚSQUEDA ===
+    def _field_norms(self, field):
+        """Normalización BM25 por largo de cada documento en un campo (en caché hasta la próxima escritura)"""
+        norms = self._norms.get(field)
+        if norms is None:
+            lengths = self._lengths[field]
+            average_length = self._total_length[field] / len(lengths) if lengths else 1
+            norm = self.k1 * (1 - self.b)
+            slope = self.k1 * self.b / average_length
+            norms = self._norms[field] = {doc: norm + slope * length for doc, length in lengths.items()}
+        return norms
+
+    def search(self, query, boosts, supermarket=None, sort_by="relevance", limit=None, match_all=False):
+        """
+        Productos con al menos un término de la consulta en algún campo con boost
+        (con match_all, todos los términos, cada uno en cualquiera de los campos)
+
+        Args:
+            query (str): Texto buscado
+            boosts (dict): {campo: boost}, por ejemplo SAVED_SEARCH_BOOSTS
+            supermarket (str): Filtrar por supermarket_key
+            sort_by (str): relevance, relevance_price, price, price_desc, name o
+                           cualquier otro valor (más recientes); el puntaje desempata
+            limit (int): Máximo de resultados (None = todos)
+            match_all (bool): Exigir todos los términos (AND) en vez de alguno (OR)
+
+        Returns:
+            list: [{unique_id, search_score}] en el orden pedido
+        """
+        start_time = time.perf_counter()
+        terms = set(analyze(query))
+        scores = {}
+
+        with self._lock:
+            total_docs = len(self._doc_ids)
+            fields = [field for field in boosts if self._postings.get(field)]
+            norms_by_field = {field: self._field_norms(field) for field in fields}
+            matched_terms = {}  # doc -> términos de la consulta encontrados (match_all)
+
+            for term in terms:
+                term_docs = set()
+
+                for field in fields:
+                    entries = self._postings[field].get(term)
+                    if not entries:
+                        continue
+
+                    idf = math.log(1 + (total_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+                    weight = boosts[field] * idf * (self.k1 + 1)
+                    norms = norms_by_field[field]
+
+                    for doc, frequency in entries.items():
+                        scores[doc] = scores.get(doc, 0.0) + weight * frequency / (frequency + norms[doc])
+                    if match_all:
+                        term_docs.update(entries)
+
+                for doc in term_docs:
+                    matched_terms[doc] = matched_terms.get(doc, 0) + 1
+
+            if match_all:
+                scores = {doc: score for doc, score in scores.items() if matched_terms.get(doc) == len(terms)}
+
+            sources = self._sources
+            if supermarket:
+                ranked = [doc for doc in scores if sources[doc].get("supermarket_key") == supermarket]
+            else:
+                ranked = list(scores)
+
+            # Primero por puntaje; los demás ordenamientos son estables y lo conservan para desempatar
+            ranked.sort(key=scores.__getitem__, reverse=True)
+
+            if sort_by == "relevance_price":
+                ranked.sort(key=lambda doc: (-scores[doc], sources[doc].get("price") or 0))
+            elif sort_by == "price":
+                ranked.sort(key=lambda doc: sources[doc].get("price") or 0)
+            elif sort_by == "price_desc":
+                ranked.sort(key=lambda doc: sources[doc].get("price") or 0, reverse=True)
+            elif sort_by == "name":
+                ranked.sort(key=lambda doc: sources[doc].get("name") or "")
+            elif sort_by != "relevance":
+                ranked.sort(key=lambda doc: sources[doc].get("scraped_at") or "", reverse=True)
+
+            if limit:
+                ranked = ranked[:limit]
+
+            hits = [{"unique_id": self._unique_ids[doc], "search_score": scores[doc]} for doc in ranked]
+
+            self._stats["searches"] += 1
+            self._stats["total_search_ms"] += (time.perf_counter() - start_time) * 1000
+
+        return hits
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["documents"] = len(self._doc_ids)
+            stats["terms"] = {field: len(self._postings[field]) for field in SEARCH_FIELDS}
+            stats["loaded"] = self.loaded
+
+        searches = stats.pop("searches")
+        total_ms = stats.pop("total_search_ms")
+        stats["searches"] = searches
+        stats["avg_search_ms"] = round(total_ms / searches, 3) if searches else 0
+        return stats
+
+
+# Backend de búsqueda de productos guardados: "atlas" ($search, por defecto) o
+# "local" (este índice, para MongoDB sin Atlas Search)
+SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND", "atlas").lower()
+
+# Crear instancia global
+search_index = ProductSearchIndex(
+    max_age_seconds=int(os.getenv("PRODUCT_SEARCH_INDEX_MAX_AGE", 300)) or None
+)
@@ -0,0 +1,128 @@
+"""
+Decodificación rápida de respuestas VTEX
+- msgspec (si está instalado): esquema tipado que sólo decodifica los campos que usa
+  _process_products; especificaciones, SKUs extra y demás datos nunca se crean en memoria
+- orjson (si está instalado): decodificador genérico en C
+- json de la librería estándar como último recurso
+Se puede forzar un backend con VTEX_JSON_BACKEND=msgspec|orjson|json
+"""
+import json
+import os
+from typing import List, Optional, TypedDict
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+# Esquema mínimo de la respuesta de catalog_system/pub/products/search
+# (total=False: cualquier campo puede faltar; los campos no listados se ignoran)
+
+class VtexOffer(TypedDict, total=False):
+    Price: Optional[float]
+    ListPrice: Optional[float]
+    AvailableQuantity: Optional[float]
+
+
+class VtexSeller(TypedDict, total=False):
+    commertialOffer: VtexOffer
+
+
+class VtexImage(TypedDict, total=False):
+    imageUrl: Optional[str]
+
+
+class VtexItem(TypedDict, total=False):
+    images: List[VtexImage]
+    sellers: List[VtexSeller]
+
+
+class VtexProduct(TypedDict, total=False):
+    productId: Optional[str]
+    productName: Optional[str]
+    brand: Optional[str]
+    description: Optional[str]
+    linkText: Optional[str]
+    categories: List[str]
+    categoryPath: Optional[str]
+    images: List[VtexImage]
+    items: List[VtexItem]
+
+
+class VtexJsonDecoder:
+    """
+    Decodifica listas de productos VTEX con el backend más rápido disponible
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend (str): "msgspec", "orjson" o "json" (por defecto el mejor instalado)
+        """
+        self.backend = self._resolve_backend(backend or os.getenv("VTEX_JSON_BACKEND"))
+        self._stats = {"decoded": 0, "fallbacks": 0}
+
+        if self.backend == "msgspec":
+            self._decoder = msgspec.json.Decoder(List[VtexProduct])
+
+    def _resolve_backend(self, requested):
+        available = {
+            "msgspec": MSGSPEC_AVAILABLE,
+            "orjson": ORJSON_AVAILABLE,
+            "json": True
+        }
+
+        if requested:
+            requested = requested.lower()
+            if available.get(requested):
+                return requested
+            print(f"⚠️ Backend JSON '{requested}' no disponible, usando el mejor instalado")
+
+        for name in ["msgspec", "orjson", "json"]:
+            if available[name]:
+                return name
+
+    def decode_products(self, body):
+        """
+        Convierte el cuerpo de la respuesta en lista de productos (dicts)
+
+        Args:
+            body (bytes): Cuerpo de la respuesta VTEX
+
+        Returns:
+            list: Productos con los campos que usa el scraper
+        """
+        self._stats["decoded"] += 1
+
+        if self.backend == "msgspec":
+            try:
+                return self._decoder.decode(body)
+            except msgspec.ValidationError:
+                # Algún campo con un tipo inesperado: decodificar sin esquema
+                self._stats["fallbacks"] += 1
+                return self._decode_generic(body)
+
+        return self._decode_generic(body)
+
+    def _decode_generic(self, body):
+        if self.backend in ["msgspec", "orjson"] and ORJSON_AVAILABLE:
+            return orjson.loads(body)
+        if self.backend == "msgspec":
+            return msgspec.json.decode(body)
+        return json.loads(body)
+
+    def get_stats(self):
+        """Backend en uso y cantidad de respuestas decodificadas"""
+        return dict(self._stats, backend=self.backend)
+
+
+# Crear instancia global
+vtex_json = VtexJsonDecoder()
@@ -0,0 +1,301 @@
+"""
+Herramientas para probar el scraper SIN los sitios reales de los supermercados
+- RecordingAdapter: graba respuestas VTEX reales en archivos (fixtures)
+- ReplayAdapter: reproduce esas respuestas sin red
+- SyntheticVtexAdapter: simula un catálogo VTEX de cualquier tamaño (10k - 1M productos)
+- generate_vtex_products: generador de productos con la misma forma que la API VTEX
+"""
+import hashlib
+import json
+import os
+import random
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Headers VTEX que vale la pena conservar en los fixtures
+RECORDED_HEADERS = ["resources", "content-type", "etag", "last-modified"]
+
+SYNTHETIC_BRANDS = [
+    "Gloria", "Laive", "Nestle", "Bimbo", "Costeño", "Primor", "Maggi", "Bolivar",
+    "Sapolio", "Ariel", "Ace", "Pilsen", "Coca Cola", "Inca Kola", "Paisana", "Cielo"
+]
+SYNTHETIC_PRODUCTS = [
+    ("Leche Evaporada", "Lácteos", ["400", "g"]),
+    ("Arroz Extra", "Abarrotes", ["5", "kg"]),
+    ("Aceite Vegetal", "Abarrotes", ["900", "ml"]),
+    ("Azúcar Rubia", "Abarrotes", ["1", "kg"]),
+    ("Yogurt Fresa", "Lácteos", ["1", "l"]),
+    ("Detergente en Polvo", "Limpieza", ["2", "kg"]),
+    ("Gaseosa", "Bebidas", ["3", "l"]),
+    ("Galletas de Soda", "Snacks", ["6", "un"]),
+    ("Atún en Trozos", "Conservas", ["170", "g"]),
+    ("Fideos Spaghetti", "Abarrotes", ["500", "g"])
+]
+
+
+def fixture_key(url):
+    """
+    Clave estable de una URL (parámetros ordenados) para nombrar el fixture
+    """
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    normalized = urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", query, ""))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def build_response(request, status_code, body, headers=None):
+    """
+    Construye un requests.Response a partir de datos locales
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    response.reason = "OK" if status_code < 400 else "Not Found"
+    return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Adaptador HTTP normal que además guarda cada respuesta en fixture_dir
+    """
+
+    def __init__(self, fixture_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.fixture_dir = fixture_dir
+        self.recorded = 0
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+
+        if response.status_code in (200, 206):
+            host_dir = os.path.join(self.fixture_dir, urlparse(request.url).netloc)
+            os.makedirs(host_dir, exist_ok=True)
+
+            fixture = {
+                "url": request.url,
+                "status_code": response.status_code,
+                "headers": {
+                    name: response.headers[name]
+                    for name in RECORDED_HEADERS
+                    if name in response.headers
+                },
+                "body": response.content.decode("utf-8", errors="replace")
+            }
+
+            path = os.path.join(host_dir, f"{fixture_key(request.url)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False)
+
+            self.recorded += 1
+
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Reproduce respuestas grabadas por RecordingAdapter sin usar la red
+    Las URLs sin fixture devuelven 404 (o una lista vacía si empty_when_missing=True)
+    """
+
+    def __init__(self, fixture_dir, empty_when_missing=False):
+        super().__init__()
+        self.fixture_dir = fixture_dir
+        self.empty_when_missing = empty_when_missing
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, **kwargs):
+        host_dir = os.path.join(self.fixture_dir, urlparse(request.url).netloc)
+        path = os.path.join(host_dir, f"{fixture_key(request.url)}.json")
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+            self.hits += 1
+            return build_response(
+                request,
+                fixture["status_code"],
+                fixture["body"].encode("utf-8"),
+                fixture.get("headers")
+            )
+
+        self.misses += 1
+        if self.empty_when_missing:
+            return build_response(request, 200, b"[]", {"content-type": "application/json"})
+        return build_response(request, 404, b"fixture no encontrado")
+
+    def close(self):
+        pass
+
+
+class SyntheticVtexAdapter(BaseAdapter):
+    """
+    Simula el endpoint de búsqueda VTEX con un catálogo sintético de `total_products`
+    Respeta las ventanas _from/_to, devuelve 206 + header "resources" como la API real
+    """
+
+    def __init__(self, total_products=10000, seed=42):
+        super().__init__()
+        self.total_products = total_products
+        self.seed = seed
+        self.requests_served = 0
+
+    def send(self, request, **kwargs):
+        params = dict(parse_qsl(urlparse(request.url).query))
+        start = int(params.get("_from", 0))
+        end = int(params.get("_to", start + 9))
+        last = min(end, self.total_products - 1)
+
+        products = list(generate_vtex_products(
+            max(last - start + 1, 0),
+            seed=self.seed,
+            start=start,
+            host=urlparse(request.url).netloc
+        ))
+
+        self.requests_served += 1
+        status_code = 206 if end + 1 < self.total_products else 200
+
+        return build_response(
+            request,
+            status_code,
+            json.dumps(products).encode("utf-8"),
+            {
+                "content-type": "application/json",
+                "resources": f"{start}-{last}/{self.total_products}"
+            }
+        )
+
+    def close(self):
+        pass
+
+
+def generate_vtex_products(count, seed=42, start=0, host="www.plazavea.com.pe"):
+    """
+    Genera productos con la forma de la API VTEX (catalog_system/pub/products/search)
+    Determinista: el mismo (seed, índice) produce siempre el mismo producto
+
+    Args:
+        count (int): Cantidad de productos
+        seed (int): Semilla base
+        start (int): Índice del primer producto (para paginar)
+        host (str): Host usado en las URLs de imágenes
+
+    Yields:
+        dict: Producto en formato VTEX
+    """
+    for index in range(start, start + count):
+        rng = random.Random(seed * 1000003 + index)
+
+        brand = rng.choice(SYNTHETIC_BRANDS)
+        base_name, category, (quantity, unit) = rng.choice(SYNTHETIC_PRODUCTS)
+        variant = rng.randint(1, 50)
+        name = f"{base_name} {brand.upper()} {quantity}{unit} Variedad {variant}"
+
+        list_price = round(rng.uniform(1.5, 80), 2)
+        price = list_price if rng.random() < 0.7 else round(list_price * rng.uniform(0.6, 0.95), 2)
+        if rng.random() < 0.03:
+            price = 0  # Algunos productos sin precio, como en la API real
+
+        product_id = str(100000 + index)
+        link_text = f"{base_name}-{brand}-{quantity}{unit}-{variant}-{product_id}".lower().replace(" ", "-")
+
+        image = {
+            "imageId": product_id,
+            "imageLabel": "",
+            "imageUrl": f"https://{host}/arquivos/ids/{product_id}/imagen.jpg"
+        }
+
+        yield {
+            "productId": product_id,
+            "productName": f"<b>{name}</b>" if rng.random() < 0.02 else name,
+            "brand": brand,
+            "brandId": rng.randint(1, 5000),
+            "linkText": link_text,
+            "productReference": product_id,
+            "categoryId": str(rng.randint(100, 999)),
+            "categories": [f"/{category}/", f"/{category}/{base_name}/"],
+            "categoriesIds": ["/1/", "/1/2/"],
+            "description": " ".join([f"Descripción larga del producto {name}."] * rng.randint(5, 20)),
+            "Especificaciones": ["Peso", "Origen", "Marca"],
+            "Peso": [f"{quantity}{unit}"],
+            "Origen": ["Perú"],
+            "allSpecifications": ["Peso", "Origen"],
+            "specificationGroups": [{
+                "name": "allSpecifications",
+                "specifications": [
+                    {"name": "Peso", "values": [f"{quantity}{unit}"]},
+                    {"name": "Origen", "values": ["Perú"]}
+                ]
+            }],
+            "items": [{
+                "itemId": product_id,
+                "name": name,
+                "ean": f"77{rng.randint(10**10, 10**11 - 1)}",
+                "measurementUnit": "un",
+                "unitMultiplier": 1,
+                "images": [dict(image, imageId=f"{product_id}-{i}") for i in range(rng.randint(1, 5))],
+                "sellers": [{
+                    "sellerId": "1",
+                    "sellerName": "VTEX",
+                    "sellerDefault": True,
+                    "commertialOffer": {
+                        "Price": price,
+                        "ListPrice": list_price,
+                        "PriceWithoutDiscount": list_price,
+                        "AvailableQuantity": rng.choice([0, 10, 99999]),
+                        "Tax": 0,
+                        "Installments": [],
+                        "DiscountHighLight": [],
+                        "Teasers": []
+                    }
+                }]
+            }]
+        }
+
+
+def write_synthetic_fixture(path, count, seed=42):
+    """
+    Guarda una lista de productos sintéticos como archivo JSON (formato respuesta VTEX)
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(list(generate_vtex_products(count, seed=seed)), f, ensure_ascii=False)
+
+
+def install_recorder(api, fixture_dir):
+    """
+    Hace que `api` (SupermarketAPI) grabe todas las respuestas reales en fixture_dir
+    """
+    adapter = RecordingAdapter(fixture_dir)
+    api.http_pool.mount_adapter(adapter)
+    return adapter
+
+
+def install_replay(api, fixture_dir, empty_when_missing=False):
+    """
+    Hace que `api` lea las respuestas desde fixture_dir en lugar de la red
+    """
+    adapter = ReplayAdapter(fixture_dir, empty_when_missing=empty_when_missing)
+    api.http_pool.mount_adapter(adapter)
+    return adapter
+
+
+def install_synthetic(api, total_products=10000, seed=42):
+    """
+    Hace que `api` consulte un catálogo sintético local de total_products productos
+    """
+    adapter = SyntheticVtexAdapter(total_products=total_products, seed=seed)
+    api.http_pool.mount_adapter(adapter)
+    return adapter
+
+
+def uninstall(api):
+    """Vuelve al transporte HTTP normal"""
+    api.http_pool.mount_adapter(None)
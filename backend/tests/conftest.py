@@ -0,0 +1,30 @@
+"""
+Configuración de pytest: los modelos se importan contra mongomock (sin servidor MongoDB)
+
+services.db se conecta al importarse, así que MongoClient se reemplaza antes de que
+cualquier test importe un modelo
+"""
+import os
+import sys
+
+import mongomock
+import pymongo
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+pymongo.MongoClient = mongomock.MongoClient
+
+
+@pytest.fixture
+def mongo_db():
+    """Base de datos en memoria compartida por los modelos (se vacía después de cada test)"""
+    from services.db import db
+
+    yield db
+
+    for name in db.list_collection_names():
+        db.drop_collection(name)
@@ -0,0 +1,126 @@
+"""
+Actualización incremental de resúmenes diarios (PriceRollup.refresh)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.price_rollup_model import PriceRollup, ROLLUP_STATE_ID
+from models.price_history_model import price_history_model
+
+NOW = datetime(2024, 5, 20, 18, 0)
+
+
+@pytest.fixture
+def rollup(mongo_db):
+    mongo_db["products"].insert_many([
+        {"unique_id": "wong_leche", "name": "Leche Gloria 400g", "supermarket": "Wong",
+         "supermarket_key": "wong", "canonical_id": "leche-gloria-400g"},
+        {"unique_id": "wong_leche_pack", "name": "Leche Gloria 400g Pack", "supermarket": "Wong",
+         "supermarket_key": "wong", "canonical_id": "leche-gloria-400g"},
+        {"unique_id": "metro_arroz", "name": "Arroz Costeño 5kg", "supermarket": "Metro",
+         "supermarket_key": "metro"}
+    ])
+
+    # Varias entradas por día, en los dos lados de cada corte usado en los tests
+    # (precios en cuartos: las sumas no dependen del orden en que se agregan)
+    history = []
+    for hour in range(0, 72, 5):
+        ts = NOW - timedelta(days=3) + timedelta(hours=hour)
+        history.append({"ts": ts, "product_unique_id": "wong_leche", "price": 4.0 + hour % 7 / 4})
+        history.append({"ts": ts, "product_unique_id": "wong_leche_pack", "price": 3.5 + hour % 3 / 4})
+        history.append({"ts": ts, "product_unique_id": "metro_arroz", "price": 20.0 - hour % 4})
+    history.append({"ts": NOW - timedelta(days=1), "product_unique_id": "metro_arroz", "price": 0})
+    price_history_model.collection.insert_many(history)
+
+    return PriceRollup()
+
+
+def daily_docs(rollup):
+    return {
+        doc["_id"]: {key: value for key, value in doc.items() if key != "_id"}
+        for doc in rollup.rollups_collection.find()
+    }
+
+
+def reset(rollup):
+    rollup.rollups_collection.delete_many({})
+    rollup.state_collection.delete_many({})
+
+
+def test_refresh_in_overlapping_windows_matches_single_refresh(rollup):
+    until = NOW + timedelta(hours=1)
+
+    rollup.refresh(until=until)
+    single = daily_docs(rollup)
+
+    reset(rollup)
+    # Cortes a mitad de día: los mismos días reciben dos y tres ventanas
+    rollup.refresh(until=NOW - timedelta(days=2, hours=7))
+    rollup.refresh(until=NOW - timedelta(days=1, hours=13))
+    rollup.refresh(until=until)
+
+    assert daily_docs(rollup) == single
+    assert {doc["scope"] for doc in single.values()} == {"product", "canonical"}
+
+
+def test_merge_keeps_min_max_sum_count_and_last(rollup):
+    split = NOW - timedelta(days=2, hours=7)
+    until = NOW + timedelta(hours=1)
+    rollup.refresh(until=split)
+    rollup.refresh(until=until)
+
+    day = (split - timedelta(hours=1)).date().isoformat()
+    rows = [
+        row for row in price_history_model.collection.find({"product_unique_id": "wong_leche"})
+        if row["ts"].date().isoformat() == day
+    ]
+    doc = rollup.rollups_collection.find_one({"_id": f"product:wong_leche:{day}"})
+
+    prices = [row["price"] for row in rows]
+    assert any(row["ts"] < split for row in rows) and any(row["ts"] >= split for row in rows)
+    assert doc["min"] == min(prices)
+    assert doc["max"] == max(prices)
+    assert doc["sum"] == pytest.approx(sum(prices))
+    assert doc["count"] == len(prices)
+    assert doc["last"] == max(rows, key=lambda row: row["ts"])["price"]
+
+
+def test_watermark_skips_rows_already_summarized(rollup):
+    until = NOW + timedelta(hours=1)
+    rollup.refresh(until=until)
+    before = daily_docs(rollup)
+
+    state = rollup.state_collection.find_one({"_id": ROLLUP_STATE_ID})
+    result = rollup.refresh(until=until)
+
+    assert state["last_ts"] == until
+    assert result["product_days"] == 0
+    assert daily_docs(rollup) == before
+
+
+def test_rows_inside_safety_lag_wait_for_next_refresh(rollup):
+    rollup.safety_lag = timedelta(hours=2)
+    # Fechas BSON con precisión de milisegundos
+    recent_ts = (datetime.now() - timedelta(minutes=30)).replace(microsecond=0)
+    price_history_model.collection.insert_one({"ts": recent_ts, "product_unique_id": "metro_arroz", "price": 15.0})
+
+    result = rollup.refresh()
+    day_id = f"product:metro_arroz:{recent_ts.date().isoformat()}"
+
+    assert datetime.fromisoformat(result["until"]) <= datetime.now() - rollup.safety_lag
+    assert result["product_days"] == 0
+    assert rollup.rollups_collection.find_one({"_id": day_id}) is None
+
+    rollup.safety_lag = timedelta(0)
+    rollup.refresh()
+    doc = rollup.rollups_collection.find_one({"_id": day_id})
+
+    assert doc["last_ts"] == recent_ts
+    assert doc["last"] == 15.0
+
+
+def test_zero_prices_are_ignored(rollup):
+    rollup.refresh(until=NOW + timedelta(hours=1))
+
+    assert all(doc["min"] > 0 for doc in daily_docs(rollup).values())
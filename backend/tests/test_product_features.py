@@ -0,0 +1,182 @@
+"""
+ProductFeatureExtractor frente a los patrones originales de _extract_product_features_enhanced
+
+Las características forman parte del unique_id (_generate_product_id_v2): cualquier
+diferencia con el recorrido regex original cambiaría la identidad de productos guardados
+"""
+import re
+
+import pytest
+
+from utils.product_features import ProductFeatureExtractor
+
+# Nombres reales de Wong, Metro, Plaza Vea y Tottus
+PRODUCT_NAMES = [
+    "Leche Evaporada GLORIA Lata 400g",
+    "Leche Evaporada Gloria Pack 6 Latas 400g",
+    "Leche Gloria Entera 6 x 400g",
+    "Leche Evaporada LAIVE Light Paquete 6un 400g",
+    "Yogurt Gloria Fresa Botella 1kg",
+    "Yogurt Laive Bebible Durazno 1.7L",
+    "Pan de Molde BIMBO Blanco Bolsa 600g",
+    "Aceite Vegetal PRIMOR Clásico Botella 900ml",
+    "Aceite Primor Premium 1L",
+    "Gaseosa COCA COLA Botella 3L",
+    "Gaseosa Coca Cola Pack 4 x 1.5L",
+    "Gaseosa Cocacola Sin Azúcar 500ml",
+    "Gaseosa INCA KOLA Botella 2.25L",
+    "Gaseosa Inca Kola Six Pack 6 x 355ml",
+    "Cerveza PILSEN Callao Lata 355ml Pack 6",
+    "Cerveza Pilsen Six Pack Botella 305ml",
+    "Cerveza Pilsen 12pack Lata 355ml",
+    "Arroz Extra COSTEÑO Bolsa 5kg",
+    "Arroz Superior Costeño 750g",
+    "Arroz Paisana Extra Bolsa 2.5kg",
+    "Fideos Spaghetti Don Vittorio 950gr",
+    "Atún en Trozos Florida 140 gr",
+    "Detergente en Polvo ARIEL Bolsa 4kg",
+    "Detergente Ace Limón 2.6 Kg",
+    "Detergente BOLIVAR Matic 750 g",
+    "Lavavajillas AYUDIN Limón Pote 900g",
+    "Limpiador SAPOLIO Lavanda Caja 900ml",
+    "Jabón de Tocador PALMOLIVE Naturals Pack 3un 120g",
+    "Papel Higiénico Elite Doble Hoja 24 Rollos",
+    "Papel Toalla Paracas 2 unidades",
+    "Huevos Pardos La Calera Bandeja 30un",
+    "Huevos LA CALERA Pardos Bandeja 15 Unidades",
+    "Café Instantáneo NESTLE Kirma Frasco 200g",
+    "Cereal Nestlé Chocapic Bolsa 1 kg",
+    "Caldo de Gallina MAGGI Cubitos Caja 8un",
+    "Sopa Maggi Pollo x 12 sobres",
+    "Agua Mineral San Luis Sin Gas 2.5 Lt",
+    "Agua Cielo 625 mL Paquete 15 Un",
+    "Chocolate Sublime Clásico 30g Caja 24 Unidades",
+    "Galletas Soda Field Paquete 6 Un",
+    "Galletas Casino Menta 6 x 43g",
+    "Pañales Huggies Natural Care XG 48 pcs",
+    "Mantequilla Laive con Sal Barra 200 Gr",
+    "Queso Edam Bells Tajado 180g",
+    "Salchicha de Pollo BELL'S 1kg",
+    "Jamonada Artisan Tajada 250 g",
+    "Mermelada Emsal Fresa Frasco 300 g",
+    "Pack x6 Leche Gloria Chocolatada 180ml",
+    "Leche UHT Gloria Caja 1 Lt Pack 12",
+    "Bebida Pulp Durazno 145ml 6pack",
+    "Frugos Naranja Caja 1L x 6",
+    "Vino Tinto Tabernero Borgoña 750 ml",
+    "Pollo Entero Fresco x kg",
+    "Plátano de Seda",
+    "Tomate Italiano Granel 0.5 kg",
+    "  Leche   Gloria   Azul 410 G  ",
+]
+
+# Misma lista y orden que el código anterior (la unidad sale del texto del patrón)
+LEGACY_QUANTITY_PATTERNS = [
+    r'(\d+)\s*(?:un|unidades?|piezas?|pcs?)\b',
+    r'paquete\s*(\d+)\s*(?:un|unidades?)',
+    r'bandeja\s*(\d+)\s*(?:un|unidades?)',
+    r'pack\s*(\d+)\s*(?:un|unidades?)',
+    r'(\d+)\s*pack',
+    r'(\d+(?:\.\d+)?)\s*(?:ml|mililitros?)\b',
+    r'(\d+(?:\.\d+)?)\s*(?:lt?|l|litros?)\b',
+    r'caja\s*(\d+(?:\.\d+)?)\s*(?:ml|l)',
+    r'(\d+(?:\.\d+)?)\s*(?:gr?|g|gramos?)\b',
+    r'(\d+(?:\.\d+)?)\s*(?:kg|kilogramos?)\b',
+    r'bolsa\s*(\d+(?:\.\d+)?)\s*(?:kg|g)',
+    r'(\d+)\s*x\s*(\d+(?:\.\d+)?)\s*(?:ml|l|g|kg)',
+    r'(\d+)\s*x\s*(\d+)\s*(?:un|unidades?)',
+]
+
+LEGACY_PACK_PATTERNS = [
+    r'paquete\s*(\d+)',
+    r'pack\s*(\d+)',
+    r'bandeja\s*(\d+)',
+    r'caja\s*(\d+)',
+    r'bolsa\s*(\d+)',
+    r'(\d+)pack'
+]
+
+LEGACY_BRAND_PATTERN = (
+    r'\b(GLORIA|LAIVE|NESTLE|BIMBO|BELLS?|CALERA|ARTISAN|EMSAL|PALMOLIVE|AYUDIN|SAPOLIO|ARIEL|ACE|'
+    r'BOLIVAR|MAGGI|PRIMOR|COSTEÑO|PILSEN|COCA\s*COLA|INCA\s*KOLA)\b'
+)
+
+
+def legacy_extract(name):
+    """Recorrido regex original (un re.search por patrón hasta el primer acierto)"""
+    features = {"quantity": None, "unit": None, "pack_size": None, "brand": None, "type": None}
+
+    for pattern in LEGACY_QUANTITY_PATTERNS:
+        match = re.search(pattern, name, re.IGNORECASE)
+        if match:
+            if 'x' in pattern:
+                features["pack_size"] = match.group(1)
+                features["quantity"] = match.group(2)
+                unit_match = re.search(r'(ml|l|g|kg|un)', match.group(0), re.IGNORECASE)
+                if unit_match:
+                    features["unit"] = unit_match.group(1).lower()
+            else:
+                features["quantity"] = match.group(1)
+                if 'ml' in pattern or 'mililitros' in pattern:
+                    features["unit"] = "ml"
+                elif 'lt' in pattern or 'litros' in pattern:
+                    features["unit"] = "l"
+                elif 'gr' in pattern or 'gramos' in pattern:
+                    features["unit"] = "g"
+                elif 'kg' in pattern:
+                    features["unit"] = "kg"
+                elif 'un' in pattern or 'unidades' in pattern or 'piezas' in pattern:
+                    features["unit"] = "un"
+            break
+
+    if not features["pack_size"]:
+        for pattern in LEGACY_PACK_PATTERNS:
+            match = re.search(pattern, name, re.IGNORECASE)
+            if match:
+                features["pack_size"] = match.group(1)
+                break
+
+    match = re.search(LEGACY_BRAND_PATTERN, name, re.IGNORECASE)
+    if match:
+        features["brand"] = match.group(1).lower().replace(' ', '')
+
+    return features
+
+
+@pytest.fixture
+def extractor():
+    return ProductFeatureExtractor(cache_size=128)
+
+
+@pytest.mark.parametrize("name", PRODUCT_NAMES)
+def test_matches_legacy_patterns(extractor, name):
+    # _generate_product_id_v2 pasa el nombre en minúsculas y sin espacios en los extremos
+    lowered = name.lower().strip()
+
+    assert extractor.extract(lowered) == legacy_extract(lowered)
+
+
+# Reglas históricas que no son obvias: los patrones de peso/volumen van antes que "6 x 400g"
+# (sin pack_size), y el patrón de kg contiene "gr" en "kilogramos" (unidad "g")
+@pytest.mark.parametrize("name, expected", [
+    ("leche gloria entera 6 x 400g", {"quantity": "400", "unit": "g", "pack_size": None, "brand": "gloria"}),
+    ("gaseosa coca cola pack 4 x 1.5l", {"quantity": "1.5", "unit": "l", "pack_size": "4", "brand": "cocacola"}),
+    ("pack x6 leche gloria chocolatada 180ml", {"quantity": "180", "unit": "ml", "pack_size": None, "brand": "gloria"}),
+    ("cerveza pilsen 12pack lata 355ml", {"quantity": "12", "unit": None, "pack_size": "12", "brand": "pilsen"}),
+    ("huevos la calera bandeja 30un", {"quantity": "30", "unit": "un", "pack_size": "30", "brand": "calera"}),
+    ("yogurt laive bebible durazno 1.7l", {"quantity": "1.7", "unit": "l", "pack_size": None, "brand": "laive"}),
+    ("salchicha de pollo bell's 1kg", {"quantity": "1", "unit": "g", "pack_size": None, "brand": "bell"}),
+    ("plátano de seda", {"quantity": None, "unit": None, "pack_size": None, "brand": None}),
+])
+def test_known_features(extractor, name, expected):
+    features = extractor.extract(name)
+
+    assert {key: features[key] for key in expected} == expected
+
+
+def test_cached_result_is_a_copy(extractor):
+    first = extractor.extract("leche gloria 400g")
+    first["brand"] = "otra"
+
+    assert extractor.extract("leche gloria 400g")["brand"] == "gloria"
+    assert extractor.get_cache_stats()["hits"] == 1
@@ -0,0 +1,125 @@
+"""
+Paginación por cursor (keyset) de Product.get_products_page
+"""
+import pytest
+from bson import ObjectId
+
+from models.product_model import PAGE_SORT_OPTIONS, Product
+
+
+@pytest.fixture
+def model(mongo_db):
+    product_model = Product()
+
+    # Precios repetidos (desempate por _id) y productos sin precio (null y campo ausente)
+    products = []
+    for number in range(23):
+        product = {
+            "unique_id": f"prod_{number}",
+            "name": f"Producto {number % 5}",
+            "supermarket_key": "wong" if number % 2 else "metro",
+            "scraped_at": f"2024-05-{number % 7 + 1:02d}T10:00:00"
+        }
+        if number % 6 == 0:
+            product["price"] = None
+        elif number % 6 != 1:
+            product["price"] = float(number % 4)
+        products.append(product)
+
+    product_model.products_collection.insert_many(products)
+    return product_model
+
+
+def walk_with_cursor(model, limit, sort_by, supermarket=None):
+    ids = []
+    cursor = None
+    while True:
+        page = model.get_products_page(cursor, limit, sort_by, supermarket)
+        ids.extend(product["_id"] for product in page["products"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def walk_with_skip(model, limit, sort_by, supermarket=None):
+    ids = []
+    page_number = 1
+    while True:
+        products = model.get_all_products(page_number, limit, sort_by, supermarket)
+        ids.extend(product["_id"] for product in products)
+        if len(products) < limit:
+            return ids
+        page_number += 1
+
+
+@pytest.mark.parametrize("sort_by", sorted(PAGE_SORT_OPTIONS))
+@pytest.mark.parametrize("limit", [1, 4, 7, 50])
+def test_cursor_walk_matches_skip_limit(model, sort_by, limit):
+    by_cursor = walk_with_cursor(model, limit, sort_by)
+
+    assert by_cursor == walk_with_skip(model, limit, sort_by)
+    assert len(by_cursor) == len(set(by_cursor)) == 23
+
+
+def test_cursor_walk_with_supermarket_filter(model):
+    by_cursor = walk_with_cursor(model, 3, "price", supermarket="wong")
+
+    assert by_cursor == walk_with_skip(model, 3, "price", supermarket="wong")
+    assert len(by_cursor) == len(set(by_cursor)) == 11
+
+
+def test_products_without_price_go_first_ascending_and_last_descending(model):
+    ascending = walk_with_cursor(model, 5, "price")
+    descending = walk_with_cursor(model, 5, "price_desc")
+    documents = {str(doc["_id"]): doc for doc in model.products_collection.find()}
+
+    without_price = {product_id for product_id, doc in documents.items() if doc.get("price") is None}
+    assert len(without_price) == 8
+    assert set(ascending[:8]) == without_price
+    assert set(descending[-8:]) == without_price
+
+
+def test_ties_are_broken_by_id(model):
+    ids = walk_with_cursor(model, 2, "price")
+    documents = {str(doc["_id"]): doc for doc in model.products_collection.find()}
+
+    for previous, current in zip(ids, ids[1:]):
+        if documents[previous].get("price") == documents[current].get("price"):
+            assert ObjectId(previous) < ObjectId(current)
+
+
+def test_cursor_round_trip():
+    last_id = ObjectId()
+    cursor = Product._encode_page_cursor("price", 1, 4.5, last_id)
+
+    assert Product._decode_page_cursor(cursor, "price", 1) == (4.5, last_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-un-cursor",
+    "e30",  # {}
+    Product._encode_page_cursor("price", 1, 4.5, "no-es-un-objectid"),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        Product._decode_page_cursor(cursor, "price", 1)
+
+
+def test_cursor_from_another_sort_is_rejected():
+    cursor = Product._encode_page_cursor("price", 1, 4.5, ObjectId())
+
+    with pytest.raises(ValueError):
+        Product._decode_page_cursor(cursor, "price", -1)
+    with pytest.raises(ValueError):
+        Product._decode_page_cursor(cursor, "name", 1)
+
+
+def test_keyset_filter_after_null_value():
+    last_id = ObjectId()
+
+    assert Product._keyset_filter("price", 1, None, last_id) == {
+        "$or": [{"price": None, "_id": {"$gt": last_id}}, {"price": {"$ne": None}}]
+    }
+    assert Product._keyset_filter("price", -1, None, last_id) == {
+        "price": None, "_id": {"$lt": last_id}
+    }
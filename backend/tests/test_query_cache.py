@@ -0,0 +1,81 @@
+"""
+Invalidación por generaciones de QueryResultCache
+"""
+from services.query_cache import QueryResultCache
+
+
+def cache_result(cache, namespace, query, value, term_based=True):
+    cached, stamp = cache.lookup(namespace, query)
+    assert cached is None
+    cache.store(stamp, value, term_based=term_based)
+
+
+def test_bump_invalidates_only_queries_with_written_terms():
+    cache = QueryResultCache()
+    cache_result(cache, "saved", "leche", ["leche gloria"])
+    cache_result(cache, "saved", "arroz", ["arroz costeño"])
+
+    cache.bump_products([{"name": "Leches Evaporadas Gloria", "brand": "Gloria", "categories": ["Lácteos"]}])
+
+    assert cache.lookup("saved", "Leche")[0] is None  # "leches" y "leche" comparten término
+    assert cache.lookup("saved", "arroz")[0] == ["arroz costeño"]
+    assert cache.get_stats()["stale"] == 1
+
+
+def test_bump_by_brand_or_category_invalidates_query():
+    cache = QueryResultCache()
+    cache_result(cache, "saved", "gloria", ["leche gloria"])
+    cache_result(cache, "saved", "lacteos", ["yogurt"])
+
+    cache.bump_products([{"name": "Yogurt Fresa", "brand": "Gloria", "categories": ["Lácteos"]}])
+
+    assert cache.lookup("saved", "gloria")[0] is None
+    assert cache.lookup("saved", "lacteos")[0] is None
+
+
+def test_regex_entry_goes_stale_on_any_write():
+    cache = QueryResultCache()
+    cache_result(cache, "saved", "lec", ["leche gloria"], term_based=False)
+    cache_result(cache, "saved", "leche", ["leche gloria"])
+
+    cache.bump_products([{"name": "Arroz Costeño 5kg", "brand": "Costeño"}])
+
+    assert cache.lookup("saved", "lec")[0] is None
+    assert cache.lookup("saved", "leche")[0] == ["leche gloria"]
+
+
+def test_write_during_computation_leaves_entry_stale():
+    cache = QueryResultCache()
+    cached, stamp = cache.lookup("saved", "leche")
+
+    # Un guardado llega mientras se calcula el resultado
+    cache.bump_products([{"name": "Leche Laive"}])
+    cache.store(stamp, ["leche gloria"])
+
+    assert cache.lookup("saved", "leche")[0] is None
+
+
+def test_bump_all_clears_every_entry():
+    cache = QueryResultCache()
+    cache_result(cache, "saved", "leche", ["leche gloria"])
+    cache_result(cache, "compare", "arroz", {"wong": []})
+
+    cache.bump_all()
+
+    assert cache.lookup("saved", "leche")[0] is None
+    assert cache.lookup("compare", "arroz")[0] is None
+
+
+def test_expired_and_evicted_entries():
+    cache = QueryResultCache(max_entries=2, ttl_seconds=0)
+    cache_result(cache, "saved", "leche", ["leche gloria"])
+
+    assert cache.lookup("saved", "leche")[0] is None
+    assert cache.get_stats()["expired"] == 1
+
+    cache = QueryResultCache(max_entries=2)
+    for query in ("leche", "arroz", "azucar"):
+        cache_result(cache, "saved", query, [query])
+
+    assert cache.lookup("saved", "leche")[0] is None
+    assert cache.get_stats()["evictions"] == 1
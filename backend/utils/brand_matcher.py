@@ -0,0 +1,235 @@
+"""
+Detección de marcas con un autómata Aho-Corasick
+- Recorre cada nombre una sola vez, sin importar cuántas marcas haya cargadas
+- Marcas desde data/brands.txt, desde el campo "brand" de products, o agregadas en caliente
+- Sólo cuenta coincidencias de palabra completa (como \\b en un regex)
+"""
+import os
+import threading
+from collections import deque
+
+DEFAULT_BRANDS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "brands.txt"
+)
+
+# Valores del campo "brand" que no son marcas reales
+IGNORED_BRANDS = {"sin marca", "sinmarca", "generico", "genérico", "varios", "otros", "n/a", "na"}
+
+
+# Signos que separan palabras dentro de una marca ("Coca-Cola", "Oral-B", "H&S")
+PUNCTUATION_TABLE = str.maketrans({char: " " for char in "-_.,;:/&'’()+"})
+
+
+def normalize_text(text, fold_punctuation=False):
+    """Minúsculas y espacios simples (misma normalización para marcas y nombres)"""
+    text = (text or "").lower()
+    if fold_punctuation:
+        text = text.translate(PUNCTUATION_TABLE)
+    return " ".join(text.split())
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class BrandMatcher:
+    """
+    Diccionario de marcas sobre un autómata Aho-Corasick
+
+    La marca devuelta es la forma normalizada sin espacios ("coca cola" -> "cocacola"),
+    y una marca con espacios también se reconoce escrita junta
+    """
+
+    def __init__(self, brands=None, fold_punctuation=True):
+        """
+        Args:
+            brands (iterable): Marcas iniciales
+            fold_punctuation (bool): Tratar guiones y signos como espacios ("coca-cola" = "coca cola")
+        """
+        self.fold_punctuation = fold_punctuation
+
+        # Trie en construcción (sólo se modifica con el lock)
+        self._goto = [{}]  # Transiciones por estado
+        self._terminals = [[]]  # Marcas (largo, marca) que terminan exactamente en cada estado
+
+        # Autómata publicado para las búsquedas: (transiciones, enlaces de falla, salidas).
+        # Es una copia que no se modifica; al agregar marcas se arma otra y se reemplaza entera
+        self._automaton = ([{}], [0], [[]])
+
+        self._brands = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if brands:
+            self.add_brands(brands)
+
+    def add_brands(self, brands):
+        """
+        Agrega marcas al autómata; los enlaces de falla se recalculan en la próxima búsqueda
+
+        Args:
+            brands (iterable): Nombres de marcas
+
+        Returns:
+            int: Cantidad de marcas nuevas
+        """
+        added = 0
+
+        with self._lock:
+            for brand in brands:
+                normalized = normalize_text(brand, self.fold_punctuation)
+                if len(normalized) < 2 or normalized in IGNORED_BRANDS:
+                    continue
+
+                canonical = normalized.replace(" ", "")
+                variants = {normalized, canonical}
+
+                if canonical not in self._brands:
+                    self._brands.add(canonical)
+                    added += 1
+
+                for variant in variants:
+                    self._insert(variant, canonical)
+
+            if added:
+                self._dirty = True
+
+        return added
+
+    def load_file(self, path=DEFAULT_BRANDS_FILE):
+        """
+        Carga marcas desde un archivo de texto (una por línea, # para comentarios)
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                brands = [
+                    line.strip() for line in f
+                    if line.strip() and not line.lstrip().startswith("#")
+                ]
+            return self.add_brands(brands)
+        except OSError as e:
+            print(f"⚠️ No se pudo leer el archivo de marcas {path}: {e}")
+            return 0
+
+    def load_from_collection(self, collection, field="brand"):
+        """
+        Carga las marcas ya guardadas en una colección de MongoDB (valores distintos)
+        """
+        try:
+            return self.add_brands(
+                value for value in collection.distinct(field) if isinstance(value, str)
+            )
+        except Exception as e:
+            print(f"⚠️ No se pudieron cargar marcas desde la base de datos: {e}")
+            return 0
+
+    def _insert(self, text, canonical):
+        state = 0
+        for char in text:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._terminals.append([])
+            state = next_state
+
+        entry = (len(text), canonical)
+        if entry not in self._terminals[state]:
+            self._terminals[state].append(entry)
+
+    def _build_failure_links(self):
+        """
+        Arma un autómata nuevo (copia del trie + enlaces de falla y salidas con un recorrido
+        BFS) y lo publica en una sola asignación (llamar con el lock)
+        """
+        goto = [dict(transitions) for transitions in self._goto]
+        fail = [0] * len(goto)
+        outputs = [list(terminals) for terminals in self._terminals]
+
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+
+                # Heredar las salidas del estado de falla (sufijos que también son marcas)
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        self._automaton = (goto, fail, outputs)
+        self._dirty = False
+
+    def find_all(self, name):
+        """
+        Todas las marcas presentes en el nombre como palabras completas
+
+        Returns:
+            list: [(inicio, fin, marca)] en orden de aparición (posiciones en el texto normalizado)
+        """
+        text = normalize_text(name, self.fold_punctuation)
+        if not text:
+            return []
+
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    self._build_failure_links()
+
+        # Una sola lectura: add_brands en otro hilo no modifica este autómata
+        goto, fail, outputs = self._automaton
+
+        matches = []
+        state = 0
+        text_length = len(text)
+
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, canonical in outputs[state]:
+                start = index - length + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if index + 1 < text_length and _is_word_char(text[index + 1]):
+                    continue
+                matches.append((start, index + 1, canonical))
+
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        return matches
+
+    def find_brand(self, name):
+        """
+        Marca que aparece primero en el nombre (la más larga si empiezan en el mismo lugar)
+
+        Returns:
+            str | None: Marca normalizada sin espacios
+        """
+        matches = self.find_all(name)
+        return matches[0][2] if matches else None
+
+    def get_stats(self):
+        return {
+            "brands": len(self._brands),
+            "states": len(self._goto)
+        }
+
+
+# Marcas históricas usadas en los IDs de productos (no modificar: cambiaría los unique_id)
+# Se usan con fold_punctuation=False para reconocer exactamente lo mismo que el regex original
+LEGACY_ID_BRANDS = [
+    "gloria", "laive", "nestle", "bimbo", "bell", "bells", "calera", "artisan", "emsal",
+    "palmolive", "ayudin", "sapolio", "ariel", "ace", "bolivar", "maggi", "primor",
+    "costeño", "pilsen", "coca cola", "inca kola"
+]
+
+# Crear instancia global (diccionario completo: archivo + marcas guardadas + nuevas)
+brand_matcher = BrandMatcher()
+brand_matcher.load_file()
@@ -0,0 +1,157 @@
+"""
+Índice de productos canónicos entre supermercados
+El mismo artículo en Plaza Vea, Wong, Vivanda y Metro recibe el mismo canonical_id:
+- Tamaño normalizado a unidad base (1 kg = 1000 g, 1 l = 1000 ml) + tamaño de paquete
+- Palabras del nombre sin tildes, signos, números, unidades ni envases, ordenadas
+El ID sólo depende del nombre, así que se calcula al guardar cada producto
+(sin recalcular grupos) y también a partir del nombre que llega en una consulta
+"""
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+
+from pymongo import UpdateOne
+
+from utils.product_features import feature_extractor
+
+# Tamaño con unidad; el primer acierto en el nombre es el tamaño del producto
+SIZE_PATTERN = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*'
+    r'(kg|kilos?|kilogramos?|gr|g|gramos?|ml|mililitros?|lt|l|litros?|un|und|unidades?)\b'
+)
+
+# "6 x 1L", "3x390g": cantidad de unidades del paquete
+MULTIPACK_PATTERN = re.compile(r'(\d+)\s*x\s*\d')
+
+# Unidad -> (unidad base, factor)
+UNIT_CONVERSIONS = {
+    "kg": ("g", 1000), "kilo": ("g", 1000), "kilos": ("g", 1000),
+    "kilogramo": ("g", 1000), "kilogramos": ("g", 1000),
+    "gr": ("g", 1), "g": ("g", 1), "gramo": ("g", 1), "gramos": ("g", 1),
+    "ml": ("ml", 1), "mililitro": ("ml", 1), "mililitros": ("ml", 1),
+    "lt": ("ml", 1000), "l": ("ml", 1000), "litro": ("ml", 1000), "litros": ("ml", 1000),
+    "un": ("un", 1), "und": ("un", 1), "unidad": ("un", 1), "unidades": ("un", 1),
+}
+
+# Palabras que cambian entre tiendas para el mismo artículo
+IGNORED_WORDS = {
+    'de', 'del', 'la', 'el', 'los', 'las', 'en', 'con', 'para', 'por', 'y', 'o', 'x',
+    'bolsa', 'paquete', 'caja', 'lata', 'botella', 'frasco', 'envase', 'tarro', 'doypack',
+    'sachet', 'pack', 'bandeja', 'display', 'pote', 'vaso',
+    'unidad', 'unidades', 'und', 'un', 'ml', 'gr', 'g', 'kg', 'lt', 'l', 'litro', 'litros',
+    'gramos', 'kilo', 'kilos', 'producto', 'articulo', 'item'
+}
+
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+
+def fold_accents(text):
+    """Minúsculas sin tildes ("Costeño Café" -> "costeno cafe")"""
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _format_number(value):
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+class CanonicalProductIndex:
+    """
+    Calcula la clave canónica (y su hash corto) que agrupa un producto entre supermercados
+    """
+
+    def __init__(self, cache_size=50000):
+        """
+        Args:
+            cache_size (int): Nombres distintos que se recuerdan en la caché LRU
+        """
+        self._cached_key = lru_cache(maxsize=cache_size)(self._canonical_key_uncached)
+
+    def canonical_key(self, name):
+        """
+        Clave legible, por ejemplo "g=400|pack=|evaporada gloria leche"
+
+        Returns:
+            str | None: None si el nombre no tiene palabras útiles
+        """
+        return self._cached_key(" ".join(fold_accents(name).split()))
+
+    def canonical_id(self, name):
+        """
+        Hash corto de la clave canónica (valor del campo canonical_id)
+
+        Returns:
+            str | None
+        """
+        key = self.canonical_key(name)
+        if key is None:
+            return None
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+    def _canonical_key_uncached(self, name):
+        size = ""
+        match = SIZE_PATTERN.search(name)
+        if match:
+            base_unit, factor = UNIT_CONVERSIONS[match.group(2)]
+            amount = float(match.group(1).replace(",", ".")) * factor
+            size = f"{base_unit}={_format_number(amount)}"
+
+        multipack = MULTIPACK_PATTERN.search(name)
+        if multipack:
+            pack_size = multipack.group(1)
+        else:
+            pack_size = feature_extractor.extract(name).get("pack_size") or ""
+
+        words = sorted({
+            word for word in WORD_PATTERN.findall(name)
+            if len(word) > 1 and word not in IGNORED_WORDS
+        })
+        if not words:
+            return None
+
+        return f"{size}|pack={pack_size}|{' '.join(words)}"
+
+    def backfill(self, collection, batch_size=1000):
+        """
+        Completa canonical_id en productos guardados antes de existir el índice
+
+        Args:
+            collection: Colección products
+            batch_size (int): Actualizaciones por bulk_write
+
+        Returns:
+            int: Productos actualizados
+        """
+        updated = 0
+        operations = []
+
+        try:
+            cursor = collection.find({"canonical_id": None}, {"_id": 1, "name": 1})
+
+            for doc in cursor:
+                canonical_id = self.canonical_id(doc.get("name"))
+                if canonical_id is None:
+                    continue
+
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"canonical_id": canonical_id}}))
+                if len(operations) >= batch_size:
+                    collection.bulk_write(operations, ordered=False)
+                    updated += len(operations)
+                    operations = []
+
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+
+            if updated:
+                print(f"🧩 canonical_id asignado a {updated} productos existentes")
+
+        except Exception as e:
+            print(f"⚠️ No se pudo completar canonical_id: {e}")
+
+        return updated
+
+
+# Crear instancia global
+canonical_index = CanonicalProductIndex()
@@ -0,0 +1,197 @@
+"""
+Series de precios sobre arreglos NumPy
+Una serie es un par de arreglos contiguos (fechas datetime64, precios float64) ordenados
+por fecha; agrupación diaria, medias móviles, volatilidad y variación se calculan sin
+recorrer las entradas en Python
+"""
+import numpy as np
+
+
+class PriceSeries:
+    """
+    Historial de precios de un producto (o de un grupo de productos) en arreglos NumPy
+    """
+
+    def __init__(self, timestamps, prices):
+        """
+        Args:
+            timestamps (np.ndarray): Fechas datetime64
+            prices (np.ndarray): Precios float64 (mismo largo)
+        """
+        order = np.argsort(timestamps, kind="stable")
+        self.timestamps = np.ascontiguousarray(timestamps[order])
+        self.prices = np.ascontiguousarray(prices[order], dtype=np.float64)
+
+    @classmethod
+    def from_records(cls, records, time_field="timestamp", price_field="price"):
+        """
+        Serie desde entradas del historial o filas diarias (fechas ISO en texto o datetime)
+        Se ignoran precios en 0 o faltantes
+
+        Args:
+            records (list): Dicts con fecha y precio
+            time_field (str): Campo de la fecha ("timestamp", "date", ...)
+            price_field (str): Campo del precio
+        """
+        times = []
+        prices = []
+        for record in records:
+            price = record.get(price_field) or 0
+            moment = record.get(time_field)
+            if price > 0 and moment:
+                times.append(moment)
+                prices.append(price)
+
+        return cls(
+            np.array(times, dtype="datetime64[us]"),
+            np.array(prices, dtype=np.float64)
+        )
+
+    def __len__(self):
+        return len(self.prices)
+
+    # === AGRUPACIÓN ===
+    def daily(self):
+        """
+        Agrupa por día calendario
+
+        Returns:
+            dict: {days (datetime64[D]), mean, min, max, last, count} como arreglos
+        """
+        if not len(self):
+            empty = np.array([], dtype=np.float64)
+            return {
+                "days": np.array([], dtype="datetime64[D]"),
+                "mean": empty, "min": empty, "max": empty, "last": empty,
+                "count": np.array([], dtype=np.int64)
+            }
+
+        days = self.timestamps.astype("datetime64[D]")
+        # Los datos ya están ordenados: cada día empieza donde cambia la fecha
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        ends = np.r_[starts[1:], len(days)]
+        counts = ends - starts
+
+        return {
+            "days": days[starts],
+            "mean": np.add.reduceat(self.prices, starts) / counts,
+            "min": np.minimum.reduceat(self.prices, starts),
+            "max": np.maximum.reduceat(self.prices, starts),
+            "last": self.prices[ends - 1],
+            "count": counts
+        }
+
+    # === INDICADORES ===
+    @staticmethod
+    def moving_average(values, window=7):
+        """
+        Media móvil simple; los primeros puntos promedian lo disponible
+
+        Returns:
+            np.ndarray: Mismo largo que values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return values
+
+        cumulative = np.cumsum(np.r_[0.0, values])
+        index = np.arange(1, len(values) + 1)
+        start = np.maximum(index - window, 0)
+        return (cumulative[index] - cumulative[start]) / (index - start)
+
+    @staticmethod
+    def percent_changes(values):
+        """
+        Variación porcentual entre puntos consecutivos
+
+        Returns:
+            np.ndarray: Un elemento menos que values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) < 2:
+            return np.array([], dtype=np.float64)
+        return np.diff(values) / values[:-1] * 100
+
+    @staticmethod
+    def volatility(values):
+        """
+        Desviación estándar de las variaciones porcentuales (0 con menos de 3 puntos)
+        """
+        changes = PriceSeries.percent_changes(values)
+        if len(changes) < 2:
+            return 0.0
+        return float(np.std(changes, ddof=1))
+
+    def summary(self):
+        """
+        Estadísticas de todas las entradas
+
+        Returns:
+            dict: {count, min, max, average, first, last, change_percentage, volatility, has_price_changes}
+        """
+        if not len(self):
+            return {
+                "count": 0, "min": 0, "max": 0, "average": 0, "first": 0, "last": 0,
+                "change_percentage": 0, "volatility": 0, "has_price_changes": False
+            }
+
+        prices = self.prices
+        first = float(prices[0])
+        last = float(prices[-1])
+
+        return {
+            "count": len(prices),
+            "min": float(prices.min()),
+            "max": float(prices.max()),
+            "average": round(float(prices.mean()), 2),
+            "first": first,
+            "last": last,
+            "change_percentage": round((last - first) / first * 100, 1) if first else 0,
+            "volatility": round(self.volatility(prices), 2),
+            "has_price_changes": bool(prices.min() != prices.max())
+        }
+
+
+def _trend(dates, means, mins, maxs, lasts, counts, window):
+    return {
+        "dates": dates,
+        "prices": [round(value, 2) for value in means.tolist()],
+        "min_prices": mins.tolist(),
+        "max_prices": maxs.tolist(),
+        "last_prices": lasts.tolist(),
+        "counts": counts.tolist(),
+        "moving_average": [round(value, 2) for value in PriceSeries.moving_average(means, window).tolist()],
+        "change_percentage": round(float((means[-1] - means[0]) / means[0] * 100), 1) if len(means) > 1 else 0,
+        "volatility": round(PriceSeries.volatility(means), 2)
+    }
+
+
+def daily_trend(series, window=7):
+    """
+    Serie diaria lista para gráficos (promedio por día + media móvil + variación)
+
+    Returns:
+        dict: Listas de Python {dates, prices, min_prices, max_prices, last_prices,
+              counts, moving_average, change_percentage, volatility}
+    """
+    daily = series.daily()
+    return _trend(
+        np.datetime_as_string(daily["days"]).tolist(),
+        daily["mean"], daily["min"], daily["max"], daily["last"], daily["count"],
+        window
+    )
+
+
+def daily_trend_from_rollups(rows, window=7):
+    """
+    Igual que daily_trend, pero desde filas diarias ya agregadas (price_rollup_model)
+    """
+    return _trend(
+        [row["date"] for row in rows],
+        np.array([row["avg"] for row in rows], dtype=np.float64),
+        np.array([row["min"] for row in rows], dtype=np.float64),
+        np.array([row["max"] for row in rows], dtype=np.float64),
+        np.array([row["last"] for row in rows], dtype=np.float64),
+        np.array([row["count"] for row in rows], dtype=np.int64),
+        window
+    )
@@ -0,0 +1,173 @@
+"""
+Extractor de características de productos (cantidad, unidad, pack, marca)
+Los patrones de cantidad se compilan una sola vez y se combinan en un único escáner;
+los resultados se guardan en una caché LRU por nombre normalizado
+"""
+import re
+from functools import lru_cache
+from utils.brand_matcher import BrandMatcher, LEGACY_ID_BRANDS
+
+# Patrones para cantidades/unidades (el ORDEN importa: gana el primero que aparezca en el nombre)
+QUANTITY_PATTERNS = [
+    # Unidades específicas
+    r'(\d+)\s*(?:un|unidades?|piezas?|pcs?)\b',
+    r'paquete\s*(\d+)\s*(?:un|unidades?)',
+    r'bandeja\s*(\d+)\s*(?:un|unidades?)',
+    r'pack\s*(\d+)\s*(?:un|unidades?)',
+    r'(\d+)\s*pack',
+
+    # Volúmenes
+    r'(\d+(?:\.\d+)?)\s*(?:ml|mililitros?)\b',
+    r'(\d+(?:\.\d+)?)\s*(?:lt?|l|litros?)\b',
+    r'caja\s*(\d+(?:\.\d+)?)\s*(?:ml|l)',
+
+    # Pesos
+    r'(\d+(?:\.\d+)?)\s*(?:gr?|g|gramos?)\b',
+    r'(\d+(?:\.\d+)?)\s*(?:kg|kilogramos?)\b',
+    r'bolsa\s*(\d+(?:\.\d+)?)\s*(?:kg|g)',
+
+    # Combinaciones especiales
+    r'(\d+)\s*x\s*(\d+(?:\.\d+)?)\s*(?:ml|l|g|kg)',
+    r'(\d+)\s*x\s*(\d+)\s*(?:un|unidades?)',
+]
+
+# Tamaño de paquete cuando no vino en la cantidad
+PACK_PATTERNS = [
+    r'paquete\s*(\d+)',
+    r'pack\s*(\d+)',
+    r'bandeja\s*(\d+)',
+    r'caja\s*(\d+)',
+    r'bolsa\s*(\d+)',
+    r'(\d+)pack'
+]
+
+UNIT_IN_MATCH_PATTERN = re.compile(r'(ml|l|g|kg|un)', re.IGNORECASE)
+
+
+def _unit_for_pattern(pattern):
+    """
+    Unidad asociada a un patrón de cantidad (misma regla histórica basada en el
+    texto del patrón; los IDs de productos guardados dependen de ella)
+    """
+    if 'ml' in pattern or 'mililitros' in pattern:
+        return "ml"
+    elif 'lt' in pattern or 'litros' in pattern:
+        return "l"
+    elif 'gr' in pattern or 'gramos' in pattern:
+        return "g"
+    elif 'kg' in pattern:
+        return "kg"
+    elif 'un' in pattern or 'unidades' in pattern or 'piezas' in pattern:
+        return "un"
+    return None
+
+
+def _build_scanner(patterns):
+    """
+    Combina los patrones en un solo regex de lookaheads alternados
+    La alternancia prueba los patrones EN ORDEN sobre todo el texto, así que
+    el resultado es el mismo que hacer re.search con cada uno hasta el primer acierto
+    """
+    alternatives = [
+        f"(?=.*?(?P<p{index}>{pattern}))"
+        for index, pattern in enumerate(patterns)
+    ]
+    return re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL)
+
+
+class ProductFeatureExtractor:
+    """
+    Extrae cantidad, unidad, tamaño de paquete y marca del nombre de un producto
+    """
+
+    def __init__(self, cache_size=50000):
+        """
+        Args:
+            cache_size (int): Nombres distintos que se recuerdan en la caché LRU
+        """
+        self._quantity_scanner = _build_scanner(QUANTITY_PATTERNS)
+        self._quantity_patterns = [
+            {
+                "regex": re.compile(pattern, re.IGNORECASE),
+                "is_pack": 'x' in pattern,  # "6 x 390g", "3 x 1L"
+                "unit": _unit_for_pattern(pattern)
+            }
+            for pattern in QUANTITY_PATTERNS
+        ]
+
+        self._pack_scanner = _build_scanner(PACK_PATTERNS)
+        self._pack_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in PACK_PATTERNS]
+
+        # Marcas del ID: conjunto fijo e histórico (el diccionario completo está en brand_matcher)
+        self._brand_matcher = BrandMatcher(LEGACY_ID_BRANDS, fold_punctuation=False)
+
+        self._cached_extract = lru_cache(maxsize=cache_size)(self._extract_uncached)
+
+    def extract(self, name):
+        """
+        Características del producto; un nombre ya visto cuesta una búsqueda en caché
+
+        Returns:
+            dict: {quantity, unit, pack_size, brand, type}
+        """
+        normalized = " ".join((name or "").lower().split())
+        return dict(self._cached_extract(normalized))
+
+    def _extract_uncached(self, name):
+        features = {
+            "quantity": None,
+            "unit": None,
+            "pack_size": None,
+            "brand": None,
+            "type": None
+        }
+
+        # Buscar cantidad principal
+        scan = self._quantity_scanner.match(name)
+        if scan:
+            group_name = scan.lastgroup
+            pattern_info = self._quantity_patterns[int(group_name[1:])]
+            match = pattern_info["regex"].match(name, scan.start(group_name))
+
+            if pattern_info["is_pack"]:
+                features["pack_size"] = match.group(1)
+                features["quantity"] = match.group(2)
+                # Extraer unidad del texto encontrado
+                unit_match = UNIT_IN_MATCH_PATTERN.search(match.group(0))
+                if unit_match:
+                    features["unit"] = unit_match.group(1).lower()
+            else:
+                features["quantity"] = match.group(1)
+                features["unit"] = pattern_info["unit"]
+
+        # Buscar tamaño de paquete si no se encontró en cantidad
+        if not features["pack_size"]:
+            scan = self._pack_scanner.match(name)
+            if scan:
+                group_name = scan.lastgroup
+                match = self._pack_patterns[int(group_name[1:])].match(name, scan.start(group_name))
+                features["pack_size"] = match.group(1)
+
+        # Extraer marca conocida
+        features["brand"] = self._brand_matcher.find_brand(name)
+
+        return features
+
+    def get_cache_stats(self):
+        """Aciertos, fallos y tamaño de la caché"""
+        info = self._cached_extract.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "entries": info.currsize,
+            "max_entries": info.maxsize,
+            "hit_rate": round(info.hits / lookups, 3) if lookups else 0
+        }
+
+    def clear_cache(self):
+        self._cached_extract.cache_clear()
+
+
+# Crear instancia global
+feature_extractor = ProductFeatureExtractor()
@@ -0,0 +1,204 @@
+"""
+Búsqueda de candidatos para emparejar productos (blocking + MinHash/LSH)
+- Bloques: sólo se comparan productos del mismo supermercado y con cantidad, unidad,
+  paquete y marca compatibles (un valor que falta en uno de los dos no descarta el par,
+  igual que en _is_same_product_v3)
+- MinHash/LSH sobre las palabras del nombre: dentro de un bloque sólo se proponen los
+  pares que comparten alguna banda de la firma (los de Jaccard alto, con alta probabilidad)
+- La decisión final sigue siendo la comparación del modelo (_is_same_product_v2/v3),
+  que ahora se llama sobre unos pocos candidatos en vez de sobre todos los pares
+"""
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+from utils.product_features import feature_extractor
+
+# Primo de Mersenne 2^61 - 1 para las permutaciones (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+
+TOKEN_PATTERN = re.compile(r'[^\W\d_]{2,}')
+
+STOPWORDS = {
+    'de', 'del', 'la', 'el', 'los', 'las', 'en', 'con', 'para', 'y', 'o',
+    'producto', 'articulo', 'item'
+}
+
+
+def default_blocking_key(product):
+    """Bloque exacto: supermercado"""
+    return product.get("supermarket_key")
+
+
+def default_feature_key(product):
+    """Cantidad, unidad, paquete y marca (mismas características que compara v3)"""
+    features = feature_extractor.extract(product.get("name", ""))
+    return (
+        features.get("quantity"),
+        features.get("unit"),
+        features.get("pack_size"),
+        features.get("brand")
+    )
+
+
+def features_compatible(features1, features2):
+    """True si ninguna característica presente en ambos productos es distinta"""
+    return all(
+        value1 is None or value2 is None or value1 == value2
+        for value1, value2 in zip(features1, features2)
+    )
+
+
+def default_tokenizer(product):
+    """Palabras del nombre sin números ni palabras vacías"""
+    words = TOKEN_PATTERN.findall((product.get("name") or "").lower())
+    return [word for word in words if word not in STOPWORDS]
+
+
+class ProductMatcher:
+    """
+    Agrupa productos equivalentes comparando sólo candidatos de un mismo bloque y banda LSH
+    """
+
+    def __init__(self, blocking_key=None, feature_key=None, tokenizer=None, num_perm=36, bands=12, seed=1):
+        """
+        Args:
+            blocking_key (callable): producto -> clave de bloque exacta (hashable)
+            feature_key (callable): producto -> tupla de características (None = desconocida)
+            tokenizer (callable): producto -> palabras usadas en la firma MinHash
+            num_perm (int): Largo de la firma MinHash
+            bands (int): Bandas LSH (num_perm debe ser múltiplo); con 36/12 un par con
+                Jaccard 0.75 es candidato con ~99.9% de probabilidad, uno con 0.3 con ~28%
+            seed (int): Semilla de las permutaciones (firmas reproducibles)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.blocking_key = blocking_key or default_blocking_key
+        self.feature_key = feature_key or default_feature_key
+        self.tokenizer = tokenizer or default_tokenizer
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+        self._stats = {"products": 0, "blocks": 0, "comparisons": 0, "matches": 0}
+
+    @staticmethod
+    def _token_hash(token):
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def signature(self, tokens):
+        """
+        Firma MinHash de un conjunto de palabras
+
+        Returns:
+            tuple | None: num_perm mínimos (None si no hay palabras)
+        """
+        hashes = [self._token_hash(token) for token in set(tokens)]
+        if not hashes:
+            return None
+
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in hashes)
+            for a, b in self._permutations
+        )
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [
+            (band, signature[band * rows:(band + 1) * rows])
+            for band in range(self.bands)
+        ]
+
+    def cluster(self, products, is_same):
+        """
+        Agrupa productos equivalentes
+
+        Sólo se llama a is_same con pares del mismo bloque, con características compatibles
+        y que comparten una banda LSH; nunca con pares que ya quedaron en el mismo grupo
+
+        Args:
+            products (list): Documentos de productos
+            is_same (callable): (producto1, producto2) -> bool
+
+        Returns:
+            list: Grupos de índices de products, ordenados por su primer índice
+        """
+        parent = list(range(len(products)))
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        # 1. Bloques por clave exacta
+        blocks = defaultdict(list)
+        for index, product in enumerate(products):
+            blocks[self.blocking_key(product)].append(index)
+
+        features = {}
+        signature_cache = {}
+        comparisons = 0
+        matches = 0
+
+        for members in blocks.values():
+            if len(members) < 2:
+                continue
+
+            # 2. Buckets LSH dentro del bloque
+            buckets = defaultdict(list)
+            for index in members:
+                features[index] = self.feature_key(products[index])
+                tokens = frozenset(self.tokenizer(products[index]))
+                if tokens not in signature_cache:
+                    signature_cache[tokens] = self.signature(tokens)
+                signature = signature_cache[tokens]
+                if signature is None:
+                    continue
+                for band_key in self._band_keys(signature):
+                    buckets[band_key].append(index)
+
+            # 3. Comparar cada producto sólo con un representante de cada grupo del bucket
+            for bucket in buckets.values():
+                if len(bucket) < 2:
+                    continue
+
+                representatives = []
+                for index in bucket:
+                    root = find(index)
+                    for representative in representatives:
+                        if find(representative) == root:
+                            break
+                        if not features_compatible(features[representative], features[index]):
+                            continue
+                        comparisons += 1
+                        if is_same(products[representative], products[index]):
+                            parent[root] = find(representative)
+                            matches += 1
+                            break
+                    else:
+                        representatives.append(index)
+
+        groups = defaultdict(list)
+        for index in range(len(products)):
+            groups[find(index)].append(index)
+
+        self._stats["products"] += len(products)
+        self._stats["blocks"] += len(blocks)
+        self._stats["comparisons"] += comparisons
+        self._stats["matches"] += matches
+
+        return sorted(groups.values(), key=lambda group: group[0])
+
+    def get_stats(self):
+        """Productos procesados, bloques y comparaciones realizadas"""
+        return dict(self._stats)
+